@@ -1,6 +1,6 @@
 {
     "name": "Product Blueprint Manager",
-    "version": "17.0.7.1.3",
+    "version": "17.0.7.2.1",
     "category": "Manufacturing",
     "summary": (
         "Gestione planos de productos y genere documentos de forma dinámica. "
@@ -21,13 +21,18 @@
     "data": [
         "security/ir.model.access.csv",
         "reports/report_paperformat.xml",
+        "data/ir_config_parameter_data.xml",
         "data/blueprint_report_data.xml",
+        "data/render_cache_data.xml",
+        "data/render_queue_data.xml",
         "views/sale_order_views.xml",
         "views/product_views.xml",
+        "views/render_job_views.xml",
         "views/menu.xml",
+        "wizards/product_blueprint_import_views.xml",
         "reports/sale_order_report.xml",
         "reports/purchase_order_report.xml",
-        "reports/blueprint_report.xml",
+        "reports/blueprint_pdf_page.xml",
     ],
     "installable": True,
     "application": True,
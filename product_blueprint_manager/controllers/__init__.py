@@ -0,0 +1 @@
+from . import blueprint_preview
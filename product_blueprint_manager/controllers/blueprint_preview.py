@@ -0,0 +1,107 @@
+import json
+import logging
+import time
+
+from werkzeug.exceptions import BadRequest, NotFound
+
+from odoo import http
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+# El SVG procede de archivos subidos por usuarios: se sirve sin scripts ni
+# recursos externos.
+PREVIEW_HEADERS = [
+    ("Content-Type", "image/svg+xml; charset=utf-8"),
+    ("Content-Security-Policy", "default-src 'none'; style-src 'unsafe-inline'"),
+    ("X-Content-Type-Options", "nosniff"),
+]
+
+
+class BlueprintPreviewController(http.Controller):
+    @http.route(
+        "/product_blueprint_manager/preview/<int:template_id>/<string:type_blueprint>",
+        type="http",
+        auth="user",
+        methods=["GET"],
+    )
+    def blueprint_preview(
+        self,
+        template_id,
+        type_blueprint,
+        attribute_values="",
+        custom_values="{}",
+        **kwargs,
+    ):
+        """
+        Vista previa del plano evaluado para el configurador, como SVG.
+
+        Args:
+            template_id (int): Plantilla de producto.
+            type_blueprint (str): Tipo de plano.
+            attribute_values (str): IDs de los valores de atributo de plantilla
+                seleccionados, separados por comas.
+            custom_values (str): JSON {id de valor de atributo de plantilla:
+                valor personalizado}.
+
+        La respuesta lleva un ETag fuerte calculado a partir de las entradas:
+        si coincide con ``If-None-Match`` se responde 304 sin evaluar nada.
+        El presupuesto de tiempo (``product_blueprint_manager.preview_budget_ms``)
+        se aplica a la petición completa: si se supera, la vista previa se
+        devuelve igualmente y el exceso queda registrado en el log, ya que
+        reintentar repetiría el mismo trabajo.
+        """
+        start = time.monotonic()
+        template = request.env["product.template"].browse(template_id).exists()
+        if not template:
+            raise NotFound()
+        try:
+            value_ids = [
+                int(value_id) for value_id in attribute_values.split(",") if value_id
+            ]
+            custom = {
+                int(key): value for key, value in json.loads(custom_values).items()
+            }
+        except (ValueError, AttributeError) as e:
+            raise BadRequest("Parámetros de vista previa no válidos") from e
+
+        template_values = (
+            request.env["product.template.attribute.value"]
+            .browse(value_ids + list(custom))
+            .exists()
+            .filtered(lambda value: value.product_tmpl_id == template)
+        )
+        preview = template._prepare_blueprint_preview(
+            type_blueprint,
+            template_values,
+            {
+                value: custom[value.id]
+                for value in template_values
+                if value.id in custom
+            },
+        )
+        if not preview:
+            raise NotFound()
+
+        headers = [
+            ("ETag", f'"{preview["etag"]}"'),
+            ("Cache-Control", "private, no-cache"),
+        ]
+        if request.httprequest.if_none_match.contains(preview["etag"]):
+            return request.make_response("", headers=headers, status=304)
+
+        svg = template._render_blueprint_preview(preview)
+        elapsed = time.monotonic() - start
+        budget = template._get_blueprint_preview_budget()
+        if elapsed > budget:
+            _logger.warning(
+                f"[Blueprint][Preview] Plano '{preview['blueprint'].name}' de la "
+                f"plantilla {template_id} en {elapsed:.3f} s, por encima del "
+                f"presupuesto de {budget:.3f} s"
+            )
+        else:
+            _logger.debug(
+                f"[Blueprint][Preview] Plano '{preview['blueprint'].name}' en "
+                f"{elapsed:.3f} s"
+            )
+        return request.make_response(svg, headers=headers + PREVIEW_HEADERS)
@@ -0,0 +1,10 @@
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """Recompila las plantillas de renderizado a partir del SVG optimizado."""
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    blueprints = env["product.blueprint"].search([])
+    env.add_to_compute(blueprints._fields["optimized_file"], blueprints)
+    env.add_to_compute(blueprints._fields["render_template"], blueprints)
+    env.flush_all()
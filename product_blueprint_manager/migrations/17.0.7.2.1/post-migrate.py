@@ -0,0 +1,13 @@
+from odoo import SUPERUSER_ID, api
+
+
+def migrate(cr, version):
+    """
+    Regenera las copias optimizadas, que redondeaban las transformaciones con
+    la precisión de las coordenadas, y sus plantillas de renderizado.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    blueprints = env["product.blueprint"].search([])
+    env.add_to_compute(blueprints._fields["optimized_file"], blueprints)
+    env.add_to_compute(blueprints._fields["render_template"], blueprints)
+    env.flush_all()
@@ -1,7 +1,11 @@
 from . import (
+    ir_actions_report,
+    ir_attachment,
     product_blueprint,
     product_blueprint_formula,
     product_blueprint_formula_name,
+    product_blueprint_render_cache,
+    product_blueprint_render_job,
     product_hooks,
     product_template,
     sale_order,
@@ -0,0 +1,48 @@
+import logging
+
+from odoo import models
+
+_logger = logging.getLogger(__name__)
+
+# Informes de planos que pueden generarse como PDF vectorial, por tipo.
+BLUEPRINT_PDF_REPORTS = {
+    "product_blueprint_manager.report_sale_order_blueprint": "manufacturing",
+    "product_blueprint_manager.report_purchase_order_blueprint": "purchase",
+}
+
+
+class IrActionsReport(models.Model):
+    _inherit = "ir.actions.report"
+
+    def _get_blueprint_pdf_engine(self):
+        """
+        Motor de los informes de planos: ``wkhtmltopdf`` (plantillas QWeb con
+        la cabecera de la compañía, por defecto) o ``cairosvg`` (PDF
+        vectorial, opcional).
+        """
+        return (
+            self.env["ir.config_parameter"]
+            .sudo()
+            .get_param("product_blueprint_manager.pdf_engine", "wkhtmltopdf")
+        )
+
+    def _render_qweb_pdf(self, report_ref, res_ids=None, data=None):
+        report = self._get_report(report_ref)
+        type_blueprint = BLUEPRINT_PDF_REPORTS.get(report.report_name)
+        # Los informes que guardan o reutilizan adjuntos siguen el camino
+        # estándar, que es el que gestiona ``attachment``/``attachment_use``.
+        if (
+            type_blueprint
+            and res_ids
+            and not report.attachment
+            and self._get_blueprint_pdf_engine() == "cairosvg"
+        ):
+            _logger.debug(
+                f"[Blueprint][PDF] Generando '{report.report_name}' con cairosvg"
+            )
+            orders = self.env["sale.order"].browse(res_ids)
+            return (
+                orders._render_blueprint_pdf(type_blueprint, report.get_paperformat()),
+                "pdf",
+            )
+        return super()._render_qweb_pdf(report_ref, res_ids=res_ids, data=data)
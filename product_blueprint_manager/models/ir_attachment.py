@@ -0,0 +1,15 @@
+from odoo import fields, models
+
+
+class IrAttachment(models.Model):
+    _inherit = "ir.attachment"
+
+    blueprint_fingerprint = fields.Char(
+        "Huella del Plano",
+        readonly=True,
+        copy=False,
+        help=(
+            "Huella de las entradas con las que se generó el plano evaluado; "
+            "si no cambian, el adjunto se reutiliza."
+        ),
+    )
@@ -1,11 +1,27 @@
 import base64
+import hashlib
 import logging
 
-from lxml import etree
-
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
 
+from ..tools.render_cache import hash_values
+from ..tools.svg_formulas import (
+    extract_formulas,
+    formula_name_from_node,
+    style_from_node,
+)
+from ..tools.svg_optimize import optimize_svg
+from ..tools.svg_template import (
+    TEMPLATE_VERSION,
+    build_slot_index,
+    compile_svg_template,
+    dumps_template,
+    loads_template,
+    render_slot_index,
+    slot_index_cache,
+)
+
 _logger = logging.getLogger(__name__)
 
 
@@ -62,128 +78,298 @@ class ProductBlueprint(models.Model):
         ),
     )
 
-    def _extract_svg_formulas(self):
-        """Busca fórmulas en el SVG y las registra si son nuevas."""
+    render_mode = fields.Selection(
+        [
+            ("vector", "Vectorial (SVG)"),
+            ("png", "Imagen (PNG)"),
+        ],
+        string="Formato en Informes",
+        default="vector",
+        required=True,
+        help=(
+            "Vectorial incrusta el SVG evaluado en el informe sin rasterizarlo. "
+            "PNG lo convierte a imagen con CairoSVG, útil si el motor PDF no "
+            "representa bien el SVG."
+        ),
+    )
+
+    file_checksum = fields.Char(
+        "Checksum del Archivo",
+        readonly=True,
+        copy=False,
+        help="Checksum del SVG con el que se extrajeron las fórmulas por última vez.",
+    )
+
+    optimized_file = fields.Binary(
+        "Archivo Optimizado",
+        compute="_compute_optimized_file",
+        store=True,
+        attachment=True,
+        # No es de solo lectura para que ``create`` conserve el valor que ya
+        # trae (p. ej. la importación masiva) en lugar de recalcularlo.
+        readonly=False,
+        copy=False,
+        help=(
+            "Copia ligera del SVG usada para renderizar: sin metadatos ni "
+            "contenido de editores, sin definiciones sin uso y con las "
+            "coordenadas redondeadas. El archivo original se conserva para "
+            "descargarlo."
+        ),
+    )
+
+    render_template = fields.Text(
+        "Plantilla de Renderizado",
+        compute="_compute_render_template",
+        store=True,
+        readonly=False,
+        copy=False,
+        prefetch=False,
+        help=(
+            "SVG precompilado en fragmentos y huecos de fórmula. Permite "
+            "renderizar los planos evaluados sin volver a analizar el XML."
+        ),
+    )
+
+    def _get_svg_precision(self):
+        """Decimales con los que se redondean las coordenadas del SVG."""
+        try:
+            return int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("product_blueprint_manager.svg_precision", 3)
+            )
+        except ValueError:
+            _logger.warning(
+                "[Blueprint] Parámetro de precisión del SVG no válido, se usan "
+                "3 decimales."
+            )
+            return 3
+
+    @api.depends("file")
+    def _compute_optimized_file(self):
+        """
+        Optimiza el SVG en streaming leyéndolo desde su adjunto, sin
+        decodificar el base64 ni construir el árbol completo. Los planos sin
+        adjunto todavía (registros nuevos) se optimizan desde el valor en
+        caché.
+        """
+        precision = self._get_svg_precision()
+        attachments = self._get_file_attachments()
         for blueprint in self:
-            if not blueprint.file:
-                _logger.warning(
-                    f"[Blueprint] El plano '{blueprint.name}' "
-                    "no tiene archivo SVG adjunto."
-                )
+            attachment = attachments.get(blueprint.id)
+            if attachment:
+                source = self._open_file_stream(attachment)
+            elif blueprint.file:
+                source = base64.b64decode(blueprint.file)
+            else:
+                blueprint.optimized_file = False
                 continue
-
             try:
-                content = base64.b64decode(blueprint.file)
-                tree = etree.fromstring(
-                    content, parser=etree.XMLParser(remove_blank_text=True)
+                blueprint.optimized_file = base64.b64encode(
+                    optimize_svg(source, precision)
                 )
+            except Exception:
+                _logger.exception(
+                    "[Blueprint] No se pudo optimizar el SVG del plano "
+                    f"'{blueprint.name}', se renderiza con el original."
+                )
+                blueprint.optimized_file = blueprint.file
 
-                formula_nodes = tree.xpath("//*[@class='odoo-formula']")
-                _logger.debug(
-                    "[Blueprint] Se encontraron "
-                    f"{len(formula_nodes)} nodos con clase 'odoo-formula'"
+    def _get_render_file(self):
+        """SVG con el que se renderiza: la copia optimizada o el original."""
+        self.ensure_one()
+        return self.optimized_file or self.file
+
+    @api.depends("optimized_file")
+    def _compute_render_template(self):
+        for blueprint in self:
+            render_file = blueprint._get_render_file()
+            if not render_file:
+                blueprint.render_template = False
+                continue
+            try:
+                template = compile_svg_template(
+                    base64.b64decode(render_file),
+                    blueprint._extract_formula_name_from_node,
+                )
+                blueprint.render_template = dumps_template(template)
+            except Exception:
+                _logger.exception(
+                    "[Blueprint] No se pudo precompilar el SVG del plano "
+                    f"'{blueprint.name}'"
+                )
+                blueprint.render_template = False
+
+    def _get_render_template(self):
+        """Devuelve la plantilla precompilada, compilándola al vuelo si falta."""
+        self.ensure_one()
+        template = loads_template(self.render_template)
+        if template is None:
+            _logger.warning(
+                f"[Blueprint] El plano '{self.name}' no tiene plantilla "
+                "precompilada vigente, se compila al vuelo."
+            )
+            template = compile_svg_template(
+                base64.b64decode(self._get_render_file()),
+                self._extract_formula_name_from_node,
+            )
+        return template
+
+    def _get_formula_styles(self):
+        """Estilos configurados en las fórmulas, indexados por ID de nodo SVG."""
+        self.ensure_one()
+        styles = {}
+        for formula in self.formula_ids:
+            if formula.name:
+                styles.setdefault(
+                    formula.name.svg_element_id,
+                    (formula.fill_color, formula.font_size),
                 )
+        return styles
 
-                for node in formula_nodes:
-                    formula_name = self._extract_formula_name_from_node(node)
-                    element_id = node.get("id")
+    def _get_slot_index(self):
+        """
+        Índice de renderizado del plano (ID de nodo → estilo y etiqueta
+        final), cacheado por revisión del plano y de sus estilos para no
+        volver a cargar la plantilla ni recorrer las fórmulas en cada línea.
 
-                    _logger.debug(
-                        "[Blueprint] Nodo analizado - fórmula: "
-                        f"'{formula_name}' ID nodo: '{element_id}'"
-                    )
-                    if not formula_name:
-                        _logger.info(
-                            "[Blueprint] Nodo omitido - no se pudo "
-                            "determinar un nombre de fórmula"
-                        )
-                        continue
-                    if not element_id:
-                        _logger.warning(
-                            "[Blueprint] Nodo sin ID detectado. "
-                            f"Se omite fórmula '{formula_name}'"
-                        )
-                        continue
+        La clave solo usa campos ya cargados del registro: el checksum del
+        SVG y ``write_date``, que cambia al regenerar la plantilla.
+        """
+        self.ensure_one()
+        key = (
+            self.id,
+            self.file_checksum,
+            self.write_date,
+            TEMPLATE_VERSION,
+            self._get_render_revision(),
+        )
+        index = slot_index_cache.get(key)
+        if index is None:
+            index = build_slot_index(
+                self._get_render_template(), self._get_formula_styles()
+            )
+            slot_index_cache.put(key, index)
+        return index
 
-                    (
-                        fill_color,
-                        font_size,
-                        font_family,
-                    ) = self._extract_style_from_node_or_children(node)
-                    _logger.debug(
-                        "[Blueprint] Estilos detectados para '"
-                        f"{formula_name}': "
-                        f"fill={fill_color}, size={font_size}, "
-                        f"font={font_family}"
-                    )
+    def _render_evaluated_svg(self, evaluated_values):
+        """
+        Renderiza el plano con los valores evaluados empalmándolos en la
+        plantilla precompilada, sin analizar el XML.
 
-                    existing = self.env["product.blueprint.formula.name"].search(
-                        [
-                            ("name", "=", formula_name),
-                            ("svg_element_id", "=", element_id),
-                            ("blueprint_id", "=", blueprint.id),
-                        ],
-                        limit=1,
-                    )
+        Args:
+            evaluated_values (dict): {nombre de fórmula: valor evaluado}.
 
-                    if not existing:
-                        _logger.info(
-                            "[Blueprint] Creando nueva fórmula: '"
-                            f"{formula_name}' "
-                            f"con ID='{element_id}', "
-                            f"color={fill_color}, tamaño={font_size}"
-                        )
-                        self.env["product.blueprint.formula.name"].create(
-                            {
-                                "name": formula_name,
-                                "svg_element_id": element_id,
-                                "blueprint_id": blueprint.id,
-                                "fill_color": fill_color,
-                                "font_size": font_size,
-                            }
-                        )
-                    else:
+        Returns:
+            str: SVG evaluado.
+        """
+        self.ensure_one()
+        return render_slot_index(self._get_slot_index(), evaluated_values)
+
+    def _extract_svg_formulas(self):
+        """
+        Busca fórmulas en el SVG y las registra si son nuevas.
+
+        Las etiquetas existentes de cada plano se leen en una sola consulta y
+        las nuevas se crean en un único ``create`` por lotes. Las etiquetas
+        archivadas que vuelven a aparecer en el SVG se reactivan.
+
+        El SVG se lee en streaming desde el adjunto (ver
+        ``extract_formulas``), sin decodificar el base64 ni construir el
+        árbol completo, para acotar la memoria con exportaciones CAD grandes.
+
+        Returns:
+            recordset: Etiquetas (``product.blueprint.formula.name``) activas
+            que ya no aparecen en el nuevo SVG, para archivarlas en bloque.
+        """
+        FormulaName = self.env["product.blueprint.formula.name"].with_context(
+            active_test=False
+        )
+        vals_to_create = []
+        to_reactivate = FormulaName
+        disappeared = FormulaName
+        attachments = self._get_file_attachments()
+
+        for blueprint in self:
+            attachment = attachments.get(blueprint.id)
+            if not attachment:
+                _logger.warning(
+                    f"[Blueprint] El plano '{blueprint.name}' "
+                    "no tiene archivo SVG adjunto."
+                )
+                continue
+
+            try:
+                existing = {
+                    (name.name, name.svg_element_id): name
+                    for name in FormulaName.search(
+                        [("blueprint_id", "=", blueprint.id)]
+                    )
+                }
+                seen = set()
+
+                for formula in extract_formulas(
+                    self._open_file_stream(attachment),
+                    self._extract_formula_name_from_node,
+                ):
+                    formula_name = formula["name"]
+                    element_id = formula["svg_element_id"]
+                    key = (formula_name, element_id)
+                    seen.add(key)
+
+                    if key in existing:
                         _logger.debug(
                             "[Blueprint] Fórmula ya existente: '"
                             f"{formula_name}' "
                             f"con ID='{element_id}', se omite creación."
                         )
+                        if not existing[key].active:
+                            to_reactivate |= existing[key]
+                        continue
+
+                    _logger.info(
+                        "[Blueprint] Creando nueva fórmula: '"
+                        f"{formula_name}' "
+                        f"con ID='{element_id}', "
+                        f"color={formula['fill_color']}, "
+                        f"tamaño={formula['font_size']}"
+                    )
+                    vals_to_create.append(
+                        {
+                            "name": formula_name,
+                            "svg_element_id": element_id,
+                            "blueprint_id": blueprint.id,
+                            "fill_color": formula["fill_color"],
+                            "font_size": formula["font_size"],
+                        }
+                    )
+
+                for key, name in existing.items():
+                    if key not in seen and name.active:
+                        disappeared |= name
 
             except Exception as e:
                 _logger.exception("[Blueprint] Error al procesar el archivo SVG")
                 raise UserError(f"Error al procesar el archivo SVG: {e}") from e
 
+        if vals_to_create:
+            FormulaName.create(vals_to_create)
+        if to_reactivate:
+            to_reactivate.write({"active": True})
+        if disappeared:
+            _logger.info(
+                "[Blueprint] Etiquetas que ya no aparecen en el SVG: "
+                f"{disappeared.mapped('name')}"
+            )
+        return disappeared
+
     def _extract_formula_name_from_node(self, node):
         """
         Intenta determinar el nombre visual de la fórmula desde
         diferentes fuentes visibles,
         incluyendo nodos anidados como <tspan>.
         """
-        candidates = [
-            node.text,
-            node.get("aria-label"),
-            node.get("aria-text"),
-        ]
-
-        for child in node.iterdescendants():
-            if child.text:
-                candidates.append(child.text)
-            if child.get("aria-label"):
-                candidates.append(child.get("aria-label"))
-            if child.get("aria-text"):
-                candidates.append(child.get("aria-text"))
-
-        for candidate in candidates:
-            if candidate and candidate.strip():
-                cleaned = candidate.replace("{{", "").replace("}}", "").strip()
-                _logger.debug(f"[Blueprint] Texto de fórmula encontrado: '{cleaned}'")
-                return cleaned
-
-        _logger.debug(
-            "[Blueprint] No se encontró texto visible en el nodo "
-            "ni en sus descendientes."
-        )
-        return None
+        return formula_name_from_node(node)
 
     def _extract_style_from_node_or_children(self, node):
         """
@@ -191,52 +377,97 @@ class ProductBlueprint(models.Model):
         o sus hijos. Si no están definidos como atributos directos, intenta
         extraerlos del atributo 'style'.
         """
-
-        def extract_from_style(style_str):
-            style_map = {}
-            for part in style_str.split(";"):
-                if ":" in part:
-                    key, val = part.split(":", 1)
-                    style_map[key.strip()] = val.strip()
-            return (
-                style_map.get("fill"),
-                style_map.get("font-size"),
-                style_map.get("font-family"),
+        return style_from_node(node)
+
+    def _get_file_attachments(self):
+        """Adjuntos que almacenan los SVG de los planos: {id: ir.attachment}."""
+        attachments = (
+            self.env["ir.attachment"]
+            .sudo()
+            .search(
+                [
+                    ("res_model", "=", self._name),
+                    ("res_field", "=", "file"),
+                    ("res_id", "in", self.ids),
+                ]
             )
+        )
+        return {attachment.res_id: attachment for attachment in attachments}
 
-        fill = node.get("fill")
-        size = node.get("font-size")
-        family = node.get("font-family")
-
-        if not fill or not size or not family:
-            style_attr = node.get("style")
-            if style_attr:
-                fill_style, size_style, family_style = extract_from_style(style_attr)
-                fill = fill or fill_style
-                size = size or size_style
-                family = family or family_style
-
-        for child in node.iterdescendants():
-            if not fill or not size or not family:
-                style_attr = child.get("style")
-                if style_attr:
-                    fill_style, size_style, family_style = extract_from_style(
-                        style_attr
-                    )
-                    fill = fill or fill_style
-                    size = size or size_style
-                    family = family or family_style
-
-            fill = fill or child.get("fill")
-            size = size or child.get("font-size")
-            family = family or child.get("font-family")
+    @api.model
+    def _open_file_stream(self, attachment):
+        """
+        Fuente del SVG para analizarlo en streaming: la ruta en el filestore
+        si el adjunto está en disco, o su contenido en ``bytes`` si está
+        guardado en la base de datos.
+        """
+        if attachment.store_fname:
+            return attachment._full_path(attachment.store_fname)
+        return attachment.raw or b""
+
+    def _read_file_checksums(self):
+        """Checksums de los adjuntos que almacenan los SVG: {id: checksum}."""
+        return {
+            res_id: attachment.checksum
+            for res_id, attachment in self._get_file_attachments().items()
+        }
+
+    def _get_file_checksum(self):
+        """Checksum del SVG del plano, guardado o leído del adjunto."""
+        self.ensure_one()
+        return self.file_checksum or self._read_file_checksums().get(self.id) or ""
+
+    def _get_render_revision(self):
+        """
+        Huella de la configuración de fórmulas y estilos que influye en el
+        renderizado (etiqueta, nodo SVG, color y tamaño de fuente).
+        """
+        self.ensure_one()
+        signature = sorted(
+            (
+                formula.name.svg_element_id or "",
+                formula.name.name or "",
+                formula.fill_color or "",
+                formula.font_size or "",
+            )
+            for formula in self.formula_ids
+            if formula.name
+        )
+        return hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()
 
-        _logger.debug(
-            f"[Blueprint] Estilos finales extraídos: fill={fill}, "
-            f"font-size={size}, font-family={family}"
+    def _applies_to_values(self, template_values):
+        """
+        Comprueba el atributo condicional del plano contra los valores de
+        atributo de plantilla seleccionados.
+        """
+        self.ensure_one()
+        if not self.attribute_filter_id:
+            return True
+        value_names = set(self.attribute_value_ids.mapped("name"))
+        return any(
+            value.name in value_names
+            for value in template_values
+            if value.attribute_id == self.attribute_filter_id
         )
 
-        return (fill or "#000000", size or "12px", family or "Arial")
+    def _get_input_fingerprint(self):
+        """
+        Huella de todo lo que el plano aporta al renderizado de una línea:
+        archivo SVG, etiquetas y estilos, y expresiones de las fórmulas.
+        """
+        self.ensure_one()
+        expressions = sorted(
+            (formula.name.name or "", formula.formula_expression or "")
+            for formula in self.formula_ids
+            if formula.name
+        )
+        return hash_values(
+            [
+                self._get_file_checksum(),
+                self._get_render_revision(),
+                expressions,
+            ]
+        )
 
     @api.constrains("name", "product_id")
     def _check_unique_name_for_product(self):
@@ -258,23 +489,69 @@ class ProductBlueprint(models.Model):
                     _("El nombre del plano debe ser único para cada producto.")
                 )
 
+    def _extract_svg_formulas_if_changed(self):
+        """
+        Extrae las fórmulas solo de los planos cuyo SVG ha cambiado desde la
+        última extracción, comparando el checksum del adjunto.
+        """
+        checksums = self._read_file_checksums()
+        for blueprint in self:
+            checksum = checksums.get(blueprint.id) or False
+            if checksum and checksum == blueprint.file_checksum:
+                _logger.debug(
+                    f"[Blueprint] SVG sin cambios en '{blueprint.name}', "
+                    "se omite la extracción de fórmulas."
+                )
+                continue
+            disappeared = blueprint._extract_svg_formulas()
+            if disappeared:
+                disappeared.write({"active": False})
+            blueprint.file_checksum = checksum
+
+    def _purge_render_cache(self):
+        """Vacía la caché compartida de planos evaluados de estos planos."""
+        entries = (
+            self.env["product.blueprint.render.cache"]
+            .sudo()
+            .search([("blueprint_id", "in", self.ids)])
+        )
+        if entries:
+            _logger.info(
+                f"[Blueprint][Cache] Vaciando {len(entries)} entradas de la "
+                f"caché de {', '.join(self.mapped('name'))}"
+            )
+            entries.unlink()
+
+    def action_purge_render_cache(self):
+        self._purge_render_cache()
+
     @api.model_create_multi
     def create(self, vals_list):
         blueprints = super().create(vals_list)
         for blueprint in blueprints:
             _logger.info(f"[Blueprint] Creado blueprint '{blueprint.name}'")
-            _logger.debug(
-                "[Blueprint] Intentando extraer fórmulas "
-                "inmediatamente después de la creación..."
-            )
-            blueprint._extract_svg_formulas()
+        _logger.debug(
+            "[Blueprint] Intentando extraer fórmulas "
+            "inmediatamente después de la creación..."
+        )
+        blueprints._extract_svg_formulas_if_changed()
         return blueprints
 
     def write(self, vals):
-        _logger.info(f"[Blueprint] Modificación del blueprint '{self.name}'")
-        result = super().write(vals)
-        _logger.debug(
-            "[Blueprint] Intentando extraer fórmulas después de la " "modificación..."
+        _logger.info(
+            f"[Blueprint] Modificación del blueprint '{', '.join(self.mapped('name'))}'"
         )
-        self._extract_svg_formulas()
+        result = super().write(vals)
+        if "file" in vals:
+            _logger.debug(
+                "[Blueprint] Intentando extraer fórmulas después de la "
+                "modificación..."
+            )
+            self._extract_svg_formulas_if_changed()
+            # Las entradas anteriores ya no se pueden reutilizar.
+            self._purge_render_cache()
         return result
+
+    def unlink(self):
+        self._purge_render_cache()
+        return super().unlink()
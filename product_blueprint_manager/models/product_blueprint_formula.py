@@ -2,6 +2,8 @@ import logging
 
 from odoo import api, fields, models
 
+from ..tools.formula_engine import formula_cache, invalidate_formulas
+
 _logger = logging.getLogger(__name__)
 
 
@@ -143,6 +145,8 @@ class ProductBlueprintFormula(models.Model):
                 rec.name.name if rec.name else "-",
             )
             _logger.debug("[Blueprint][Formula] Valores en write: %s", vals)
+        if "formula_expression" in vals:
+            invalidate_formulas(self.mapped("formula_expression"))
         return super().write(vals)
 
     def unlink(self):
@@ -152,8 +156,14 @@ class ProductBlueprintFormula(models.Model):
                 rec.name.name if rec.name else "-",
                 rec.blueprint_id.id,
             )
+        invalidate_formulas(self.mapped("formula_expression"))
         return super().unlink()
 
+    @api.model
+    def get_formula_cache_stats(self):
+        """Aciertos, fallos y tamaño de la caché de fórmulas compiladas."""
+        return formula_cache.stats()
+
     _sql_constraints = [
         (
             "unique_formula_per_blueprint",
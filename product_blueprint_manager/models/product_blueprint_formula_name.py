@@ -27,6 +27,10 @@ class ProductBlueprintFormulaName(models.Model):
         string="ID de nodo SVG",
         help="ID del elemento SVG que contiene esta fórmula.",
     )
+    active = fields.Boolean(
+        default=True,
+        help="Se archiva cuando la etiqueta deja de aparecer en el SVG del plano.",
+    )
 
     _sql_constraints = [
         (
@@ -0,0 +1,271 @@
+import base64
+import logging
+import os
+import time
+
+import psycopg2
+
+from odoo import api, fields, models
+from odoo.tools import config
+
+from ..tools.render_cache import FilestoreRenderCache, render_cache, render_key_digest
+
+_logger = logging.getLogger(__name__)
+
+# Los archivos sueltos (PNG sin SVG, temporales) se borran pasado este
+# margen, para no tocar los que otro proceso está escribiendo.
+ORPHAN_GRACE_SECONDS = 3600
+
+
+class ProductBlueprintRenderCache(models.Model):
+    """
+    Índice de la caché de planos evaluados compartida entre workers.
+
+    Los SVG/PNG se guardan en disco junto al filestore (ver
+    ``FilestoreRenderCache``) y esta tabla registra qué hay guardado, de qué
+    plano y cuánto ocupa, para poder expulsar entradas por tamaño y vaciar la
+    caché de un plano. Las lecturas van directas a disco, sin consultar ni
+    escribir en la base de datos, y los renderizados de solo lectura
+    (informes, vista previa) tampoco registran sus entradas: la tarea de
+    expulsión las incorpora al índice con el plano guardado junto a sus
+    archivos.
+    """
+
+    _name = "product.blueprint.render.cache"
+    _description = "Caché Compartida de Planos Evaluados"
+
+    key = fields.Char("Clave", required=True, index=True, readonly=True)
+    blueprint_id = fields.Many2one(
+        "product.blueprint",
+        string="Plano",
+        ondelete="cascade",
+        index=True,
+        readonly=True,
+    )
+    svg_size = fields.Integer("Tamaño SVG (bytes)", readonly=True)
+    png_size = fields.Integer("Tamaño PNG (bytes)", readonly=True)
+
+    _sql_constraints = [
+        ("key_unique", "unique(key)", "Cada entrada de la caché debe ser única."),
+    ]
+
+    @api.model
+    def _get_store(self):
+        return FilestoreRenderCache(
+            os.path.join(
+                config["data_dir"], "blueprint_render_cache", self.env.cr.dbname
+            )
+        )
+
+    @api.model
+    def _get_max_bytes(self):
+        """Tamaño máximo de la caché en disco, en bytes."""
+        try:
+            max_mb = float(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("product_blueprint_manager.render_cache_max_mb", 1024)
+            )
+        except ValueError:
+            _logger.warning(
+                "[Blueprint][Cache] Tamaño máximo de la caché no válido, se "
+                "usan 1024 MB."
+            )
+            max_mb = 1024
+        return int(max_mb * 1024 * 1024)
+
+    @api.model
+    def _cache_get(self, render_key, need_png=True):
+        """
+        Busca un plano evaluado en la caché del proceso y, si no está (o le
+        falta el PNG y ``need_png`` es verdadero), en la caché compartida en
+        disco.
+
+        Args:
+            render_key (tuple): Clave de ``make_render_key``.
+            need_png (bool): El llamador necesita el PNG. Con False, una
+                entrada del proceso sin PNG basta y no se toca el disco.
+
+        Returns:
+            dict: ``{"svg": str, "png_base64": str | None}`` o None.
+        """
+        cached = render_cache.get(render_key)
+        if cached and (cached["png_base64"] is not None or not need_png):
+            return cached
+        store = self._get_store()
+        digest = render_key_digest(render_key)
+        try:
+            if cached:
+                # Otro worker puede haber rasterizado ya el plano.
+                stored = {"svg": cached["svg"], "png": store.get_png(digest)}
+            else:
+                stored = store.get(digest)
+        except OSError as e:
+            _logger.warning(f"[Blueprint][Cache] No se pudo leer la caché: {e}")
+            return cached
+        if stored is None or (cached and stored["png"] is None):
+            return cached
+        value = {
+            "svg": stored["svg"],
+            "png_base64": (
+                base64.b64encode(stored["png"]).decode("utf-8")
+                if stored["png"] is not None
+                else None
+            ),
+        }
+        render_cache.put(render_key, value)
+        return value
+
+    @api.model
+    def _cache_put(self, render_key, value, blueprint_id=False, index=True):
+        """
+        Guarda un plano evaluado en la caché del proceso y en la compartida,
+        y lo registra en el índice.
+
+        Args:
+            render_key (tuple): Clave de ``make_render_key``.
+            value (dict): ``{"svg": str, "png_base64": str | None}``.
+            blueprint_id (int): Plano al que pertenece la entrada.
+            index (bool): Registrar la entrada en el índice. Con False solo
+                se escribe en disco, sin tocar la base de datos.
+        """
+        render_cache.put(render_key, value)
+        digest = render_key_digest(render_key)
+        png = base64.b64decode(value["png_base64"]) if value["png_base64"] else None
+        try:
+            sizes = self._get_store().put(digest, value["svg"], png, blueprint_id)
+        except OSError as e:
+            _logger.warning(f"[Blueprint][Cache] No se pudo escribir la caché: {e}")
+            return
+        if index:
+            self._index_entry(digest, blueprint_id, sizes)
+
+    @api.model
+    def _index_render_keys(self, blueprint_by_key):
+        """
+        Registra en el índice las entradas ya guardadas en disco.
+
+        Args:
+            blueprint_by_key (dict): {clave de renderizado: id de plano}.
+        """
+        store = self._get_store()
+        for render_key, blueprint_id in blueprint_by_key.items():
+            digest = render_key_digest(render_key)
+            sizes = store.sizes(digest)
+            if sizes["svg"]:
+                self._index_entry(digest, blueprint_id, sizes)
+
+    @api.model
+    def _index_entry(self, digest, blueprint_id, sizes):
+        """Registra o actualiza la entrada en el índice, sin bloquear."""
+        query = """
+            INSERT INTO product_blueprint_render_cache
+                (key, blueprint_id, svg_size, png_size,
+                 create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s,
+                    %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+            ON CONFLICT (key) DO UPDATE
+                SET blueprint_id = COALESCE(
+                        EXCLUDED.blueprint_id,
+                        product_blueprint_render_cache.blueprint_id
+                    ),
+                    svg_size = EXCLUDED.svg_size,
+                    png_size = EXCLUDED.png_size,
+                    write_date = EXCLUDED.write_date
+        """
+        params = (
+            digest,
+            blueprint_id or None,
+            sizes["svg"],
+            sizes["png"],
+            self.env.uid,
+            self.env.uid,
+        )
+        try:
+            with self.env.cr.savepoint(flush=False):
+                self.env.cr.execute(query, params)
+        except (psycopg2.IntegrityError, psycopg2.OperationalError) as e:
+            # Otro worker ha registrado la misma entrada a la vez; los
+            # archivos ya están en disco, así que basta con la suya.
+            _logger.debug(
+                f"[Blueprint][Cache] Entrada {digest} ya registrada por otro "
+                f"proceso ({e.__class__.__name__})"
+            )
+
+    def unlink(self):
+        store = self._get_store()
+        for entry in self:
+            try:
+                store.delete(entry.key)
+            except OSError as e:
+                _logger.warning(
+                    f"[Blueprint][Cache] No se pudo borrar la entrada {entry.key}: {e}"
+                )
+        return super().unlink()
+
+    @api.model
+    def _cron_evict(self):
+        """
+        Incorpora al índice, con su plano, las entradas guardadas por
+        renderizados de solo lectura (y borra las de planos que ya no
+        existen), expulsa las menos usadas hasta respetar el tamaño máximo,
+        quita del índice las que ya no están en disco y borra los archivos
+        sueltos.
+        """
+        store = self._get_store()
+        max_bytes = self._get_max_bytes()
+        known = set(self.sudo().search([]).mapped("key"))
+        blueprint_ids = set(self.env["product.blueprint"].sudo().search([]).ids)
+        grace = time.time() - ORPHAN_GRACE_SECONDS
+        adopted = orphans = 0
+        for digest, path, mtime in store.iter_files():
+            if digest in known:
+                continue
+            if path.endswith(".svg"):
+                owner = store.owner(digest)
+                if owner and owner not in blueprint_ids:
+                    # El plano se borró después de renderizar la entrada.
+                    try:
+                        store.delete(digest)
+                        orphans += 1
+                    except OSError:
+                        pass
+                    continue
+                self.sudo()._index_entry(digest, owner or False, store.sizes(digest))
+                known.add(digest)
+                adopted += 1
+            elif mtime < grace and not os.path.exists(store.path(digest, "svg")):
+                try:
+                    os.unlink(path)
+                    orphans += 1
+                except OSError:
+                    continue
+
+        entries = self.sudo().search_read([], ["key", "svg_size", "png_size"])
+
+        missing_ids = []
+        live = []
+        for entry in entries:
+            last_access = store.last_access(entry["key"])
+            if last_access is None:
+                missing_ids.append(entry["id"])
+                continue
+            live.append(
+                (last_access, entry["id"], entry["svg_size"] + entry["png_size"])
+            )
+
+        total = sum(size for _last_access, _id, size in live)
+        evict_ids = []
+        for _last_access, entry_id, size in sorted(live):
+            if total <= max_bytes:
+                break
+            evict_ids.append(entry_id)
+            total -= size
+        self.sudo().browse(missing_ids + evict_ids).unlink()
+
+        _logger.info(
+            f"[Blueprint][Cache] Incorporadas {adopted} entradas, expulsadas "
+            f"{len(evict_ids)}, {len(missing_ids)} sin archivos y {orphans} "
+            "archivos huérfanos. "
+            f"Tamaño actual: {total} bytes de {max_bytes}."
+        )
@@ -0,0 +1,234 @@
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# Espera antes del primer reintento; se duplica en cada intento fallido.
+RETRY_DELAY = timedelta(minutes=5)
+
+
+class ProductBlueprintRenderJob(models.Model):
+    """
+    Cola de prerenderizado de planos.
+
+    Cada trabajo prepara los planos de un tipo para un pedido confirmado
+    (caché compartida, con los PNG ya rasterizados) y los emite al taller
+    como adjuntos de sus líneas, de modo que al imprimir solo haya que montar
+    el informe. Una tarea
+    programada procesa la cola por lotes y reintenta los trabajos fallidos
+    con una espera creciente entre intentos.
+    """
+
+    _name = "product.blueprint.render.job"
+    _description = "Cola de Prerenderizado de Planos"
+    _order = "id"
+
+    order_id = fields.Many2one(
+        "sale.order",
+        string="Pedido",
+        required=True,
+        ondelete="cascade",
+        index=True,
+        readonly=True,
+    )
+    type_blueprint = fields.Selection(
+        [
+            ("manufacturing", "Orden de Fabricación"),
+            ("purchase", "Orden de Compra"),
+        ],
+        string="Tipo de Plano",
+        required=True,
+        readonly=True,
+    )
+    state = fields.Selection(
+        [
+            ("pending", "Pendiente"),
+            ("done", "Listo"),
+            ("failed", "Fallido"),
+        ],
+        string="Estado",
+        default="pending",
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    attempts = fields.Integer("Intentos", readonly=True)
+    last_error = fields.Text("Último Error", readonly=True)
+    date_done = fields.Datetime("Fecha de Finalización", readonly=True)
+    date_next_attempt = fields.Datetime(
+        "Próximo Intento",
+        readonly=True,
+        index=True,
+        help="Los trabajos fallidos no se reintentan antes de esta fecha.",
+    )
+
+    _sql_constraints = [
+        (
+            "unique_order_type",
+            "unique(order_id, type_blueprint)",
+            "Solo puede haber un trabajo por pedido y tipo de plano.",
+        )
+    ]
+
+    @api.model
+    def _enqueue(self, orders):
+        """
+        Encola (o vuelve a poner en pendiente) el prerenderizado de los tipos
+        de plano que usan los productos de cada pedido.
+        """
+        existing = {
+            (job.order_id.id, job.type_blueprint): job
+            for job in self.search([("order_id", "in", orders.ids)])
+        }
+        to_reset = self.browse()
+        vals_list = []
+        for order in orders:
+            blueprints = order.order_line.product_id.product_tmpl_id.blueprint_ids
+            for type_blueprint in set(blueprints.mapped("type_blueprint")):
+                job = existing.get((order.id, type_blueprint))
+                if job:
+                    if job.state != "pending" or job.attempts:
+                        to_reset |= job
+                    continue
+                vals_list.append(
+                    {"order_id": order.id, "type_blueprint": type_blueprint}
+                )
+        if to_reset:
+            to_reset.write(
+                {
+                    "state": "pending",
+                    "attempts": 0,
+                    "last_error": False,
+                    "date_done": False,
+                    "date_next_attempt": False,
+                }
+            )
+        if vals_list:
+            self.create(vals_list)
+        if to_reset or vals_list:
+            _logger.debug(
+                f"[Blueprint][Queue] Encolados {len(to_reset) + len(vals_list)} "
+                "trabajos de prerenderizado"
+            )
+            cron = self.env.ref(
+                "product_blueprint_manager.ir_cron_blueprint_render_queue",
+                raise_if_not_found=False,
+            )
+            if cron:
+                cron._trigger()
+
+    @api.model
+    def _get_batch_size(self):
+        try:
+            return max(
+                int(
+                    self.env["ir.config_parameter"]
+                    .sudo()
+                    .get_param("product_blueprint_manager.render_queue_batch_size", 10)
+                ),
+                1,
+            )
+        except ValueError:
+            return 10
+
+    @api.model
+    def _get_due_domain(self, now):
+        """Trabajos pendientes cuyo próximo intento ya ha llegado."""
+        return [
+            ("state", "=", "pending"),
+            "|",
+            ("date_next_attempt", "=", False),
+            ("date_next_attempt", "<=", now),
+        ]
+
+    @api.model
+    def _get_retry_date(self, attempts, now):
+        """Fecha del siguiente intento tras ``attempts`` intentos fallidos."""
+        return now + RETRY_DELAY * 2 ** (attempts - 1)
+
+    def _run(self):
+        """Prerenderiza los planos del trabajo y los adjunta a sus líneas."""
+        self.ensure_one()
+        self.order_id._get_evaluated_blueprints_by_line(
+            self.type_blueprint, persist=True
+        )
+
+    @api.model
+    def _cron_process_queue(self):
+        """
+        Procesa un lote de trabajos pendientes, con un commit tras cada uno.
+        Cada trabajo se bloquea con ``SKIP LOCKED`` para que dos ejecuciones
+        simultáneas no lo procesen a la vez; los que fallan se reintentan
+        hasta ``MAX_ATTEMPTS`` veces, cada vez con el doble de espera
+        (``RETRY_DELAY``).
+        """
+        auto_commit = not getattr(threading.current_thread(), "testing", False)
+        now = fields.Datetime.now()
+        jobs = self.search(self._get_due_domain(now), limit=self._get_batch_size())
+        processed = 0
+        for job in jobs:
+            self.env.cr.execute(
+                """
+                SELECT id FROM product_blueprint_render_job
+                WHERE id = %s AND state = 'pending'
+                  AND (date_next_attempt IS NULL OR date_next_attempt <= %s)
+                FOR UPDATE SKIP LOCKED
+                """,
+                (job.id, now),
+            )
+            if not self.env.cr.fetchone():
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    job._run()
+            except Exception as e:
+                attempts = job.attempts + 1
+                _logger.exception(
+                    f"[Blueprint][Queue] Error prerenderizando planos "
+                    f"'{job.type_blueprint}' del pedido {job.order_id.name} "
+                    f"(intento {attempts})"
+                )
+                failed = attempts >= MAX_ATTEMPTS
+                job.write(
+                    {
+                        "attempts": attempts,
+                        "state": "failed" if failed else "pending",
+                        "last_error": str(e),
+                        "date_next_attempt": (
+                            False if failed else self._get_retry_date(attempts, now)
+                        ),
+                    }
+                )
+            else:
+                job.write(
+                    {
+                        "state": "done",
+                        "date_done": fields.Datetime.now(),
+                        "date_next_attempt": False,
+                    }
+                )
+            processed += 1
+            if auto_commit:
+                self.env.cr.commit()
+
+        # Solo se relanza la tarea de inmediato si quedan trabajos listos;
+        # los que esperan a reintentarse se programan para su fecha.
+        cron = self.env.ref("product_blueprint_manager.ir_cron_blueprint_render_queue")
+        remaining = self.search_count(self._get_due_domain(now))
+        if remaining:
+            cron._trigger()
+        waiting = self.search(
+            [("state", "=", "pending"), ("date_next_attempt", ">", now)],
+            order="date_next_attempt",
+            limit=1,
+        )
+        if waiting:
+            cron._trigger(at=waiting.date_next_attempt)
+        _logger.info(
+            f"[Blueprint][Queue] Procesados {processed} trabajos, "
+            f"{remaining} pendientes."
+        )
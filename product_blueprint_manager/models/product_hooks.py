@@ -17,42 +17,126 @@ class ProductBlueprintHook(models.AbstractModel):
         - Si no es is_custom, pero el atributo tiene un is_custom
           (como mmAltura), asignamos el valor estándar como entero.
         """
+        return self.get_attribute_values_for_blueprint_batch(sale_order_line).get(
+            sale_order_line.id, {}
+        )
+
+    def get_attribute_values_for_blueprint_batch(self, sale_order_lines):
+        """
+        Variante por lotes de ``get_attribute_values_for_blueprint``.
+
+        Precarga de una vez los valores personalizados, los valores de
+        atributo de plantilla y la correspondencia atributo → variable
+        personalizada de todas las líneas, en lugar de consultarlos línea a
+        línea.
+
+        Args:
+            sale_order_lines (recordset): Líneas de uno o varios pedidos.
+
+        Returns:
+            dict: {id de línea: {variable: valor}}
+        """
+        lines = sale_order_lines
+        # 🔹 Precarga en bloque de todo lo que se lee después por línea
+        custom_values = lines.mapped("product_custom_attribute_value_ids")
+        custom_values.mapped("custom_product_template_attribute_value_id.is_custom")
+        template_values = lines.mapped(
+            "product_template_attribute_value_ids"
+        ) | lines.mapped("product_no_variant_attribute_value_ids")
+        template_values.mapped("is_custom")
+
+        variable_by_attribute = self._get_variable_by_attribute(template_values)
+        return {
+            line.id: self._get_line_attribute_values(line, variable_by_attribute)
+            for line in lines
+        }
+
+    def get_attribute_values_for_blueprint_preview(
+        self, template_values, custom_values
+    ):
+        """
+        Variables de las fórmulas para una configuración que aún no es una
+        línea de pedido (vista previa del configurador).
+
+        Args:
+            template_values (recordset): Valores de atributo de plantilla
+                seleccionados (``product.template.attribute.value``).
+            custom_values (dict): {valor de atributo de plantilla: valor
+                personalizado introducido}.
+
+        Returns:
+            dict: {variable: valor}
+        """
+        return self._get_attribute_values(
+            custom_values.items(),
+            template_values,
+            self._get_variable_by_attribute(template_values),
+        )
+
+    def _get_variable_by_attribute(self, template_values):
+        """Nombre de variable de cada atributo: su primer valor is_custom."""
+        variable_by_attribute = {}
+        for value in self.env["product.attribute.value"].search(
+            [
+                ("attribute_id", "in", template_values.attribute_id.ids),
+                ("is_custom", "=", True),
+            ]
+        ):
+            variable_by_attribute.setdefault(value.attribute_id.id, value.name)
+        return variable_by_attribute
+
+    def _get_line_attribute_values(self, sale_order_line, variable_by_attribute):
+        return self._get_attribute_values(
+            [
+                (val.custom_product_template_attribute_value_id, val.custom_value)
+                for val in sale_order_line.product_custom_attribute_value_ids
+            ],
+            sale_order_line.product_template_attribute_value_ids
+            + sale_order_line.product_no_variant_attribute_value_ids,
+            variable_by_attribute,
+        )
+
+    def _get_attribute_values(
+        self, custom_values, template_values, variable_by_attribute
+    ):
+        """
+        Args:
+            custom_values (list): Pares (valor de atributo de plantilla,
+                valor personalizado).
+            template_values (recordset): Valores de atributo de plantilla
+                seleccionados.
+            variable_by_attribute (dict): {id de atributo: variable}.
+        """
         result = {}
 
         # 🔹 Atributos personalizados (mmA, mmB, mmAltura)
-        for val in sale_order_line.product_custom_attribute_value_ids:
-            attr_value = val.custom_product_template_attribute_value_id
+        for attr_value, custom_value in custom_values:
             if attr_value and attr_value.is_custom:
                 var_name = attr_value.name
-                if val.custom_value is not None:
+                if custom_value is not None:
                     try:
-                        result[var_name] = int(val.custom_value)
+                        result[var_name] = int(custom_value)
                         _logger.debug(
                             "[Blueprint][HOOK] Personalizado: "
-                            f"{var_name} = {int(val.custom_value)}"
+                            f"{var_name} = {int(custom_value)}"
                         )
                     except Exception:
                         _logger.warning(
                             "[Blueprint][HOOK] Valor no numérico en "
-                            f"custom: {val.custom_value}"
+                            f"custom: {custom_value}"
                         )
 
         # 🔹 Valores estándar, proyectados solo si el atributo tiene
         #    is_custom relacionado
-        standard_values = (
-            sale_order_line.product_template_attribute_value_ids
-            + sale_order_line.product_no_variant_attribute_value_ids
-        ).filtered(lambda v: not v.is_custom)
+        standard_values = template_values.filtered(lambda v: not v.is_custom)
 
         for val in standard_values:
-            attr = val.attribute_id
-            custom_vals = attr.value_ids.filtered(lambda v: v.is_custom)
-            if not custom_vals:
+            var_name = variable_by_attribute.get(val.attribute_id.id)
+            if not var_name:
                 # este atributo no tiene variable de fórmula
                 # (ej: Color, Vidrio...)
                 continue
 
-            var_name = custom_vals[0].name
             if var_name in result:
                 continue  # ya se ha definido manualmente
 
@@ -2,6 +2,9 @@ import logging
 
 from odoo import fields, models
 
+from ..tools.render_cache import hash_values
+from ..tools.svg_template import TEMPLATE_VERSION
+
 _logger = logging.getLogger(__name__)
 
 
@@ -20,6 +23,80 @@ class ProductTemplate(models.Model):
         "product.blueprint.formula", "product_id", string="Fórmulas"
     )
 
+    def _get_blueprint_preview_budget(self):
+        """
+        Presupuesto (segundos) para generar una vista previa de plano; las
+        que lo superan se registran en el log.
+        """
+        try:
+            budget_ms = float(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("product_blueprint_manager.preview_budget_ms", 250)
+            )
+        except ValueError:
+            budget_ms = 250
+        return budget_ms / 1000
+
+    def _prepare_blueprint_preview(
+        self, type_blueprint, template_values, custom_values
+    ):
+        """
+        Selecciona el plano que se previsualiza para una configuración del
+        configurador y calcula sus variables, sin evaluar ni renderizar nada.
+
+        Args:
+            type_blueprint (str): Tipo de plano.
+            template_values (recordset): Valores de atributo de plantilla
+                seleccionados.
+            custom_values (dict): {valor de atributo de plantilla: valor
+                personalizado}.
+
+        Returns:
+            dict: ``blueprint``, ``variables`` y ``etag`` (huella de las
+            entradas del renderizado), o None si ningún plano aplica.
+        """
+        self.ensure_one()
+        blueprint = self.blueprint_ids.filtered(
+            lambda b: b.type_blueprint == type_blueprint
+            and b._applies_to_values(template_values)
+        )[:1]
+        if not blueprint:
+            return None
+        attribute_values = self.env[
+            "product.blueprint.hook"
+        ].get_attribute_values_for_blueprint_preview(template_values, custom_values)
+        variables = self.env["sale.order.line"]._map_formula_variables(
+            self, attribute_values
+        )
+        return {
+            "blueprint": blueprint,
+            "variables": variables,
+            "etag": hash_values(
+                [
+                    TEMPLATE_VERSION,
+                    blueprint.id,
+                    blueprint._get_input_fingerprint(),
+                    variables,
+                ]
+            ),
+        }
+
+    def _render_blueprint_preview(self, preview):
+        """
+        SVG evaluado de una vista previa de ``_prepare_blueprint_preview``,
+        generado con el mismo proceso que los informes y sin escribir en la
+        base de datos.
+        """
+        SaleOrderLine = self.env["sale.order.line"]
+        evaluated_values = SaleOrderLine._evaluate_blueprint_formulas(
+            preview["blueprint"], preview["variables"]
+        )
+        result = SaleOrderLine._generate_evaluated_blueprint_svg(
+            preview["blueprint"], evaluated_values, rasterize=False
+        )
+        return str(result["svg_markup"])
+
     def get_custom_attribute_values(self, sale_order_line=None):
         """
         Obtiene los valores de atributos personalizados para una línea de
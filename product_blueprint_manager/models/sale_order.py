@@ -1,9 +1,32 @@
+import io
 import logging
+from collections import defaultdict
 
-from odoo import models
+from markupsafe import Markup
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from odoo.tools.misc import format_date
+from odoo.tools.pdf import PdfFileReader, PdfFileWriter
+
+from ..tools.pdf_pages import (
+    drawing_definition,
+    drawing_reference,
+    fit_svg,
+    svg_pages_to_pdf,
+)
+from ..tools.rasterize import RasterizeTimeoutError, rasterize_svgs
 
 _logger = logging.getLogger(__name__)
 
+# Atributos de la línea que se muestran en la cabecera de los planos.
+BLUEPRINT_REPORT_ATTRIBUTES = ("Color", "Altura", "Vidrio")
+
+# Medidas (mm) de la cabecera de las páginas PDF de planos.
+PDF_TITLE_HEIGHT = 8
+PDF_LINE_HEIGHT = 4.5
+PDF_HEADER_GAP = 6
+
 
 class SaleOrder(models.Model):
     """Extensión del modelo sale.order para la impresión del
@@ -11,6 +34,45 @@ class SaleOrder(models.Model):
 
     _inherit = "sale.order"
 
+    blueprint_render_job_ids = fields.One2many(
+        "product.blueprint.render.job", "order_id", string="Prerenderizado de Planos"
+    )
+    blueprint_render_state = fields.Selection(
+        [
+            ("none", "Sin Planos"),
+            ("pending", "En Cola"),
+            ("ready", "Listos"),
+            ("failed", "Con Errores"),
+        ],
+        string="Planos",
+        compute="_compute_blueprint_render_state",
+        help="Estado del prerenderizado de los planos del pedido confirmado.",
+    )
+
+    @api.depends("blueprint_render_job_ids.state")
+    def _compute_blueprint_render_state(self):
+        for order in self:
+            states = set(order.blueprint_render_job_ids.mapped("state"))
+            if not states:
+                order.blueprint_render_state = "none"
+            elif "failed" in states:
+                order.blueprint_render_state = "failed"
+            elif "pending" in states:
+                order.blueprint_render_state = "pending"
+            else:
+                order.blueprint_render_state = "ready"
+
+    def action_confirm(self):
+        result = super().action_confirm()
+        self._enqueue_blueprint_render()
+        return result
+
+    def _enqueue_blueprint_render(self):
+        """Encola el prerenderizado de los planos de los pedidos confirmados."""
+        orders = self.filtered(lambda order: order.state == "sale")
+        if orders:
+            self.env["product.blueprint.render.job"].sudo()._enqueue(orders)
+
     def action_print_blueprint(self):
         """
         Acción para imprimir el reporte de blueprints.
@@ -36,6 +98,337 @@ class SaleOrder(models.Model):
             "product_blueprint_manager.action_report_purchase_order_blueprint"
         ).report_action(self)
 
+    def _get_evaluated_blueprints_by_line(
+        self, type_blueprint="manufacturing", rasterize=True, persist=False
+    ):
+        """
+        Evalúa una única vez los planos de todas las líneas de los pedidos,
+        para que el informe los reciba ya calculados en su contexto.
+
+        Salvo con ``persist``, no escribe en la base de datos: los informes y
+        la vista previa no crean adjuntos ni bloquean registros.
+
+        Las líneas con la misma configuración (mismo plano y mismos valores
+        evaluados), aunque sean de pedidos distintos, comparten un único
+        dibujo: se genera y rasteriza una sola vez.
+
+        Los planos en modo PNG se rasterizan en lote al final, en un pool de
+        procesos si el parámetro ``product_blueprint_manager.raster_workers``
+        es mayor que 1, o en serie en caso contrario. Los planos vectoriales
+        no se rasterizan.
+
+        Args:
+            type_blueprint (str): Tipo de plano a evaluar.
+            rasterize (bool): Rasterizar los planos en modo PNG. El informe
+                en PDF vectorial no necesita los PNG.
+            persist (bool): Adjuntar los planos evaluados a sus líneas
+                (emisión al taller).
+
+        Returns:
+            dict: {id de línea: lista de planos evaluados}
+        """
+        # Cada fórmula se evalúa una sola vez para todas las líneas.
+        evaluated_values = self.order_line._batch_evaluate_blueprint_formulas(
+            type_blueprint
+        )
+        evaluated_blueprints = {}
+        drawings = {}
+        for order in self:
+            _logger.debug(
+                f"[Blueprint] Evaluando planos de tipo '{type_blueprint}' "
+                f"para el pedido {order.name}"
+            )
+            for line in order.order_line:
+                evaluated_blueprints[line.id] = line._render_evaluated_blueprints(
+                    type_blueprint=type_blueprint,
+                    rasterize=False,
+                    evaluated_values_by_blueprint=evaluated_values.get(line.id),
+                    drawings=drawings,
+                )
+
+        pending = defaultdict(list)
+        for blueprints in evaluated_blueprints.values():
+            for blueprint in blueprints:
+                if blueprint["render_mode"] == "png" and "png_base64" not in blueprint:
+                    pending[blueprint["render_key"]].append(blueprint)
+        if rasterize and pending:
+            self._rasterize_evaluated_blueprints(
+                [group[0] for group in pending.values()]
+            )
+            for group in pending.values():
+                for blueprint in group[1:]:
+                    blueprint["png_base64"] = group[0]["png_base64"]
+        if persist:
+            for line in self.order_line:
+                line._store_evaluated_blueprints(
+                    type_blueprint, evaluated_blueprints.get(line.id, [])
+                )
+        _logger.debug(
+            f"[Blueprint] {len(drawings)} dibujos distintos para "
+            f"{sum(map(len, evaluated_blueprints.values()))} planos evaluados"
+        )
+        return evaluated_blueprints
+
+    def _get_blueprint_report_drawings(self, evaluated_blueprints):
+        """
+        Dibujos distintos de cada pedido para las plantillas QWeb: cada uno se
+        define una sola vez en el documento del pedido y sus líneas lo
+        muestran con un ``<use>``, en lugar de repetir el SVG o el PNG
+        completo en cada línea.
+
+        Args:
+            evaluated_blueprints (dict): Resultado de
+                ``_get_evaluated_blueprints_by_line``.
+
+        Returns:
+            dict: {id de pedido: {clave de renderizado: {"definition": SVG
+            que define el dibujo, "reference": SVG que lo muestra}}}
+        """
+        shared = {}
+        drawings_by_order = {}
+        for order in self:
+            drawings = drawings_by_order[order.id] = {}
+            for line in order.order_line:
+                for blueprint in evaluated_blueprints.get(line.id, []):
+                    render_key = blueprint["render_key"]
+                    if render_key in drawings:
+                        continue
+                    if render_key not in shared:
+                        element_id = f"blueprint-drawing-{len(shared)}"
+                        if blueprint["render_mode"] == "vector":
+                            definition, view_box = drawing_definition(
+                                element_id, svg_markup=str(blueprint["markup"])
+                            )
+                        else:
+                            definition, view_box = drawing_definition(
+                                element_id, png_base64=blueprint["png_base64"]
+                            )
+                        shared[render_key] = {
+                            "definition": Markup(definition),
+                            "reference": Markup(
+                                drawing_reference(element_id, view_box)
+                            ),
+                        }
+                    drawings[render_key] = shared[render_key]
+        return drawings_by_order
+
+    def _get_raster_settings(self):
+        """Número de procesos y tiempo máximo por trabajo para rasterizar."""
+        params = self.env["ir.config_parameter"].sudo()
+        try:
+            workers = int(
+                params.get_param("product_blueprint_manager.raster_workers", 0)
+            )
+            timeout = float(
+                params.get_param("product_blueprint_manager.raster_timeout", 120)
+            )
+        except ValueError:
+            _logger.warning(
+                "[Blueprint][Raster] Parámetros de rasterizado no válidos, "
+                "se rasteriza en serie."
+            )
+            workers, timeout = 0, None
+        return workers, timeout or None
+
+    def _rasterize_evaluated_blueprints(self, evaluated_blueprints):
+        """
+        Rasteriza en lote los planos evaluados que aún no tienen PNG y guarda
+        el resultado en la caché de renderizado.
+        """
+        workers, timeout = self._get_raster_settings()
+        try:
+            pngs = rasterize_svgs(
+                [str(blueprint["markup"]) for blueprint in evaluated_blueprints],
+                workers=workers,
+                timeout=timeout,
+            )
+        except RasterizeTimeoutError as e:
+            _logger.error(f"[Blueprint][Raster] {e}")
+            raise UserError(
+                _(
+                    "El rasterizado de los planos ha superado el tiempo máximo "
+                    "de %s segundos.",
+                    timeout,
+                )
+            ) from e
+
+        RenderCache = self.env["product.blueprint.render.cache"]
+        for blueprint, png_base64 in zip(evaluated_blueprints, pngs):
+            blueprint["png_base64"] = png_base64
+            RenderCache._cache_put(
+                blueprint["render_key"],
+                {"svg": str(blueprint["markup"]), "png_base64": png_base64},
+                blueprint["blueprint_id"],
+                index=False,
+            )
+
+    def _prepare_blueprint_pdf_header(self, line, blueprint, type_blueprint):
+        """
+        Textos de la cabecera de una página PDF de plano, con la misma
+        información que los informes QWeb.
+
+        Returns:
+            dict: ``title`` y las columnas ``left`` y ``right`` (listas de
+            líneas de texto).
+        """
+        self.ensure_one()
+        date_order = format_date(self.env, self.date_order)
+        blueprint_label = _("Plano: %s", blueprint["blueprint_name"])
+        if type_blueprint == "purchase":
+            company = self.company_id
+            return {
+                "title": _("Plano Orden de Compra"),
+                "left": [company.name]
+                + (company.partner_id.contact_address or "").splitlines(),
+                "right": [
+                    _("Referencia de Pedido: %s", self.name),
+                    _("Fecha: %s", date_order),
+                    blueprint_label,
+                ],
+            }
+
+        attributes = [
+            (
+                value.custom_product_template_attribute_value_id.attribute_id.name,
+                value.name,
+            )
+            for value in line.product_custom_attribute_value_ids
+        ] + [
+            (value.attribute_id.name, value.name)
+            for value in line.product_no_variant_attribute_value_ids
+        ]
+        partner = self.partner_id
+        return {
+            "title": _("Planos: %s", self.name),
+            "left": [date_order, line.product_id.name, blueprint_label]
+            + [
+                f"{name}: {value}"
+                for name, value in attributes
+                if name in BLUEPRINT_REPORT_ATTRIBUTES
+            ],
+            "right": [
+                partner.name,
+                ", ".join(filter(None, [partner.street, partner.street2])),
+                ", ".join(
+                    filter(None, [partner.zip, partner.city, partner.state_id.name])
+                ),
+                " / ".join(filter(None, [partner.phone, partner.mobile])),
+            ],
+        }
+
+    def _render_blueprint_pdf(self, type_blueprint, paperformat):
+        """
+        Genera el informe de planos como PDF vectorial, sin pasar por
+        wkhtmltopdf: cada plano evaluado se coloca en una página SVG con su
+        cabecera (plantilla QWeb), cairosvg la convierte en una página PDF y
+        las páginas se unen con la librería PDF de Odoo.
+
+        Cada dibujo distinto se encaja en la página una sola vez, y las
+        páginas idénticas (líneas iguales de un mismo pedido) se convierten
+        una vez y comparten su contenido en el PDF final.
+
+        Args:
+            type_blueprint (str): Tipo de plano a imprimir.
+            paperformat (report.paperformat): Formato de página del informe.
+
+        Returns:
+            bytes: Contenido del PDF.
+        """
+        evaluated_blueprints = self._get_evaluated_blueprints_by_line(
+            type_blueprint, rasterize=False
+        )
+        page_width = paperformat.print_page_width
+        page_height = paperformat.print_page_height
+        content_width = page_width - paperformat.margin_left - paperformat.margin_right
+
+        fitted_drawings = {}
+        # {SVG de la página: posición en ``pages``}, en orden de aparición.
+        pages = {}
+        page_sequence = []
+        for order in self:
+            order = order.with_context(lang=order.partner_id.lang)
+            for line in order.order_line:
+                for blueprint in evaluated_blueprints.get(line.id, []):
+                    header = order._prepare_blueprint_pdf_header(
+                        line, blueprint, type_blueprint
+                    )
+                    header["left"] = list(filter(None, header["left"]))
+                    header["right"] = list(filter(None, header["right"]))
+                    drawing_top = (
+                        paperformat.margin_top
+                        + PDF_TITLE_HEIGHT
+                        + max(len(header["left"]), len(header["right"]))
+                        * PDF_LINE_HEIGHT
+                        + PDF_HEADER_GAP
+                    )
+                    drawing_key = (blueprint["render_key"], drawing_top)
+                    if drawing_key not in fitted_drawings:
+                        fitted_drawings[drawing_key] = Markup(
+                            fit_svg(
+                                str(blueprint["markup"]),
+                                paperformat.margin_left,
+                                drawing_top,
+                                content_width,
+                                page_height - paperformat.margin_bottom - drawing_top,
+                            )
+                        )
+                    page = str(
+                        order.env["ir.qweb"]._render(
+                            "product_blueprint_manager.report_blueprint_pdf_page",
+                            {
+                                "header": header,
+                                "drawing": fitted_drawings[drawing_key],
+                                "page_width": page_width,
+                                "page_height": page_height,
+                                "margin_left": paperformat.margin_left,
+                                "column_x": paperformat.margin_left + content_width / 2,
+                                "header_top": paperformat.margin_top,
+                                "title_height": PDF_TITLE_HEIGHT,
+                                "line_height": PDF_LINE_HEIGHT,
+                            },
+                        )
+                    )
+                    page_sequence.append(pages.setdefault(page, len(pages)))
+
+        if not pages:
+            raise UserError(_("No hay planos que imprimir en los pedidos."))
+
+        workers, timeout = self._get_raster_settings()
+        try:
+            pdf_pages = svg_pages_to_pdf(list(pages), workers=workers, timeout=timeout)
+        except RasterizeTimeoutError as e:
+            _logger.error(f"[Blueprint][PDF] {e}")
+            raise UserError(
+                _(
+                    "La conversión a PDF de los planos ha superado el tiempo "
+                    "máximo de %s segundos.",
+                    timeout,
+                )
+            ) from e
+        _logger.debug(
+            f"[Blueprint][PDF] {len(page_sequence)} páginas de planos "
+            f"'{type_blueprint}' ({len(pdf_pages)} distintas, "
+            f"{len(fitted_drawings)} dibujos) para los pedidos "
+            f"{self.mapped('name')}"
+        )
+        return self._merge_blueprint_pdf_pages(pdf_pages, page_sequence)
+
+    def _merge_blueprint_pdf_pages(self, pdf_pages, page_sequence):
+        """
+        Une las páginas PDF en el orden de ``page_sequence`` (posiciones en
+        ``pdf_pages``). Una página repetida se lee una sola vez, de modo que
+        sus copias referencian el mismo contenido en el PDF resultante.
+        """
+        readers = [PdfFileReader(io.BytesIO(pdf), strict=False) for pdf in pdf_pages]
+        writer = PdfFileWriter()
+        for index in page_sequence:
+            reader = readers[index]
+            for page_number in range(reader.getNumPages()):
+                writer.addPage(reader.getPage(page_number))
+        with io.BytesIO() as buffer:
+            writer.write(buffer)
+            return buffer.getvalue()
+
     def _get_report_base_filename(self):
         """
         Sobreescribe el nombre base del reporte para el nuevo informe de
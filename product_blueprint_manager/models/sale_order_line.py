@@ -1,18 +1,29 @@
-import ast
 import base64
+import functools
 import logging
-import math
+from collections import defaultdict
 
-import cairosvg
-from lxml import etree
 from markupsafe import Markup
 
 from odoo import _, api, fields, models
 from odoo.exceptions import ValidationError
 
+from ..tools.formula_engine import evaluate_formula, evaluate_formula_batch
+from ..tools.rasterize import EvaluatedBlueprint, svg_to_png_base64
+from ..tools.render_cache import hash_values, make_render_key
+from ..tools.svg_template import format_value
+
 _logger = logging.getLogger(__name__)
 
 
+# Campos de la línea de los que dependen sus planos evaluados.
+BLUEPRINT_INPUT_FIELDS = {
+    "product_id",
+    "product_custom_attribute_value_ids",
+    "product_no_variant_attribute_value_ids",
+}
+
+
 class SaleOrderLine(models.Model):
     _inherit = "sale.order.line"
 
@@ -24,44 +35,86 @@ class SaleOrderLine(models.Model):
         "ir.attachment", string="Blueprint Attachment"
     )
 
+    blueprint_attachment_ids = fields.One2many(
+        "ir.attachment",
+        "res_id",
+        string="Planos Evaluados",
+        domain=[
+            ("res_model", "=", "sale.order.line"),
+            ("name", "=like", "blueprint_%_evaluated.svg"),
+        ],
+    )
+
+    blueprint_fingerprint = fields.Char(
+        compute="_compute_blueprint_fingerprint",
+        help=(
+            "Huella de las entradas de la línea que afectan a sus planos: "
+            "plantilla de producto y valores de atributos para las fórmulas."
+        ),
+    )
+
     @api.depends("product_id", "product_custom_attribute_value_ids")
     def _compute_blueprint_custom_values(self):
         hook = self.env["product.blueprint.hook"]
+        values_by_line = hook.get_attribute_values_for_blueprint_batch(self)
         for line in self:
             _logger.debug(
                 f"[Blueprint] Capturando valores para la línea de pedido {line.id}"
             )
-            blueprint_custom_values = hook.get_attribute_values_for_blueprint(line)
-            line.blueprint_custom_values = str(blueprint_custom_values)
-
-    def _extract_formula_name_from_svg_element(self, elem):
-        candidates = [
-            elem.text,
-            elem.get("aria-label"),
-            elem.get("aria-text"),
-        ]
-        for child in elem.iterdescendants():
-            if child.text:
-                candidates.append(child.text)
-            if child.get("aria-label"):
-                candidates.append(child.get("aria-label"))
-            if child.get("aria-text"):
-                candidates.append(child.get("aria-text"))
-
-        for candidate in candidates:
-            if candidate and candidate.strip():
-                cleaned = candidate.replace("{{", "").replace("}}", "").strip()
-                _logger.debug(
-                    f"[Blueprint] Nombre de fórmula detectado en SVG: '{cleaned}'"
-                )
-                return cleaned
+            line.blueprint_custom_values = str(values_by_line[line.id])
 
-        _logger.debug(
-            "[Blueprint] No se pudo determinar un nombre de fórmula para un nodo SVG."
-        )
-        return None
+    @api.depends(
+        "product_id",
+        "product_custom_attribute_value_ids",
+        "product_no_variant_attribute_value_ids",
+    )
+    def _compute_blueprint_fingerprint(self):
+        hook = self.env["product.blueprint.hook"]
+        values_by_line = hook.get_attribute_values_for_blueprint_batch(self)
+        for line in self:
+            line.blueprint_fingerprint = hash_values(
+                {
+                    "product_tmpl_id": line.product_id.product_tmpl_id.id,
+                    "attribute_values": values_by_line[line.id],
+                }
+            )
 
-    def _generate_evaluated_blueprint_svg(self, blueprint, evaluated_variables):
+    @api.model_create_multi
+    def create(self, vals_list):
+        lines = super().create(vals_list)
+        lines.order_id._enqueue_blueprint_render()
+        return lines
+
+    def write(self, vals):
+        result = super().write(vals)
+        if BLUEPRINT_INPUT_FIELDS.intersection(vals):
+            self.order_id._enqueue_blueprint_render()
+        return result
+
+    def _get_blueprint_attachment_name(self, blueprint):
+        return f"blueprint_{blueprint.id}_line_{self.id}_evaluated.svg"
+
+    def _generate_evaluated_blueprint_svg(
+        self,
+        blueprint,
+        evaluated_variables,
+        rasterize=True,
+        drawings=None,
+    ):
+        """
+        Genera el SVG evaluado del plano y, si ``rasterize`` es verdadero, lo
+        convierte a PNG. Con ``rasterize=False`` el PNG solo se devuelve si ya
+        estaba en caché, para que quien llama pueda rasterizar varios planos
+        en lote.
+
+        No escribe en la base de datos: el resultado solo se guarda en la
+        caché de renderizado. Para adjuntarlo a la línea, ver
+        ``_store_evaluated_blueprints``.
+
+        ``drawings`` ({clave de renderizado: dibujo}) se comparte entre las
+        líneas de un mismo informe: las que tienen el mismo plano y los mismos
+        valores reutilizan el dibujo ya generado, sin consultar la caché.
+        """
         _logger.debug(
             f"[Blueprint] Generando SVG evaluado para el blueprint '{blueprint.name}'"
         )
@@ -70,212 +123,80 @@ class SaleOrderLine(models.Model):
             raise ValidationError(_("No hay archivo SVG en el blueprint."))
 
         try:
-            svg_data = base64.b64decode(blueprint.file)
-            root = etree.fromstring(svg_data)
-
-            style_element = etree.Element("style")
-            style_element.text = """
-                .formula-eval-error {
-                    font-style: italic;
-                    text-decoration: underline;
-                }
-            """
-            root.insert(0, style_element)
-
-            nsmap = {"svg": root.nsmap.get(None, "http://www.w3.org/2000/svg")}
-            _logger.debug(f"[Blueprint] Espacios de nombres detectados: {nsmap}")
-
-            elements = root.xpath(
-                ".//*[@class and contains(@class, 'odoo-formula')]", namespaces=nsmap
-            )
-            _logger.debug(
-                f"[Blueprint] Se encontraron {len(elements)} elementos con fórmulas."
-            )
-
-            for elem in elements:
-                formula_name = self._extract_formula_name_from_svg_element(elem)
-                elem_id = elem.get("id", "sin ID")
-
-                if formula_name in evaluated_variables:
-                    evaluated_value = evaluated_variables[formula_name]
-                    try:
-                        rounded_value = str(round(float(evaluated_value)))
-                    except ValueError:
-                        rounded_value = str(evaluated_value)
-
-                    if rounded_value.lower() != "error":
-                        _logger.debug(
-                            f"[Blueprint] Sustituyendo '{formula_name}' →\
-                                  '{rounded_value}' en ID={elem_id}"
-                        )
-
-                        # === 🔧 NUEVA LÓGICA DE ESTILOS ===
-                        # 1. Extraer estilo original
-                        style = elem.get("style", "")
-                        font_size = None
-                        fill_color = None
-                        _logger.debug(
-                            f"[Blueprint][STYLE] Nodo ID={elem_id}\
-                                  fórmula='{formula_name}' - style='{style}'"
-                        )
-
-                        for attr in style.split(";"):
-                            if "font-size" in attr:
-                                font_size = attr.split(":")[1].strip()
-                            elif "fill" in attr:
-                                fill_color = attr.split(":")[1].strip()
-
-                        # 2. Complementar con atributos directos si faltan
-                        if not fill_color and elem.get("fill"):
-                            fill_color = elem.get("fill")
-                            _logger.debug(
-                                f"[Blueprint][STYLE] Nodo ID={elem_id}\
-                                      fill directo='{fill_color}'"
-                            )
-                        if not font_size and elem.get("font-size"):
-                            font_size = elem.get("font-size")
-                            _logger.debug(
-                                f"[Blueprint][STYLE] Nodo ID={elem_id} font-size\
-                                      directo='{font_size}'"
-                            )
-
-                        # 3. Aplicar estilos desde la fórmula (si están definidos)
-                        formula_filtered = blueprint.formula_ids.filtered(
-                            lambda f, elem_id=elem_id: f.name
-                            and f.name.svg_element_id == elem_id
-                        )
-                        if not formula_filtered:
-                            _logger.warning(
-                                f"[Blueprint] No se encontró fórmula con ID\
-                                      SVG '{elem_id}' para '{formula_name}'"
-                            )
-                        formula_obj = formula_filtered[0] if formula_filtered else None
-                        if formula_obj:
-                            _logger.debug(
-                                f"[Blueprint] Usando estilo configurado para\
-                                      '{formula_name}': fill={formula_obj.fill_color},\
-                                        font_size={formula_obj.font_size}"
-                            )
-                            font_size = formula_obj.font_size or font_size
-                            fill_color = formula_obj.fill_color or fill_color
-
-                        # 4. Defaults si siguen vacíos
-                        font_size = font_size or "12px"
-                        fill_color = fill_color or "#000000"
-
-                        final_style = f"fill:{fill_color}; font-size:{font_size};"
-                        _logger.debug(
-                            f"[Blueprint][STYLE] Nodo ID={elem_id} estilo aplicado\
-                                  final='{final_style}'"
-                        )
-
-                        transform = elem.get("transform", "")
-                        x = elem.get("x", "0")
-                        y = elem.get("y", "0")
-                        if elem.tag.endswith("path") and "d" in elem.attrib:
-                            try:
-                                path_commands = elem.attrib["d"].split(" ")
-                                x = (
-                                    path_commands[1].split(",")[0]
-                                    if len(path_commands) > 1
-                                    else "0"
-                                )
-                                y = (
-                                    path_commands[1].split(",")[1]
-                                    if len(path_commands) > 1
-                                    else "0"
-                                )
-                            except Exception:
-                                _logger.debug(
-                                    f"[Blueprint] No se pudo obtener la posición\
-                                          de {elem_id}, usando (0,0)"
-                                )
-
-                        text_element = etree.Element(
-                            "text",
-                            {
-                                "x": x,
-                                "y": y,
-                                "style": final_style,
-                                "transform": transform,
-                            },
-                        )
-                        text_element.text = rounded_value
-                        elem.getparent().replace(elem, text_element)
+            cache_key = self._get_blueprint_render_key(blueprint, evaluated_variables)
+            drawing = drawings.get(cache_key) if drawings is not None else None
+            if drawing is None or (drawing["png_base64"] is None and rasterize):
+                drawing = self._get_blueprint_drawing(
+                    blueprint, evaluated_variables, cache_key, rasterize
+                )
+                if drawings is not None:
+                    drawings[cache_key] = drawing
+            else:
+                _logger.debug(
+                    f"[Blueprint] Dibujo compartido con otra línea para "
+                    f"'{blueprint.name}'"
+                )
 
-                    else:
-                        _logger.warning(
-                            f"[Blueprint] Valor de fórmula '{formula_name}' es 'error'.\
-                                  No se reemplaza. Se marca el nodo."
-                        )
+            return {
+                "svg_markup": drawing["svg_markup"],
+                "png_base64": drawing["png_base64"],
+                "render_key": cache_key,
+            }
 
-                        existing_class = elem.get("class", "")
-                        elem.set(
-                            "class", f"{existing_class} formula-eval-error".strip()
-                        )
+        except Exception as e:
+            _logger.exception("[Blueprint] Error en la evaluación del plano")
+            raise ValidationError(f"Error procesando el SVG: {e}") from e
 
-                        x = elem.get("x", "0")
-                        y = elem.get("y", "0")
-                        try:
-                            x_float = float(x)
-                            y_float = float(y)
-                        except Exception:
-                            x_float = 0
-                            y_float = 0
-
-                        warning_text = etree.Element(
-                            "text",
-                            {
-                                "x": str(x_float + 10),
-                                "y": str(y_float),
-                                "fill": "red",
-                                "font-size": "10px",
-                                "font-weight": "bold",
-                            },
-                        )
-                        warning_text.text = "!"
-                        elem.getparent().append(warning_text)
-                else:
-                    _logger.debug(
-                        f"[Blueprint] No hay fórmula configurada para '{formula_name}'\
-                            , se mantiene sin cambios en el SVG."
-                    )
-
-            new_svg_data = etree.tostring(
-                root, pretty_print=True, encoding="utf-8"
-            ).decode("utf-8")
-
-            # Guardar adjunto SVG
-            attachment = self.env["ir.attachment"].create(
-                {
-                    "name": f"blueprint_{blueprint.id}_line_{self.id}_evaluated.svg",
-                    "type": "binary",
-                    "datas": base64.b64encode(new_svg_data.encode("utf-8")),
-                    "res_model": "sale.order.line",
-                    "res_id": self.id,
-                    "mimetype": "image/svg+xml",
-                }
-            )
+    @api.model
+    def _get_blueprint_render_key(self, blueprint, evaluated_variables):
+        """Clave de renderizado del plano para los valores evaluados."""
+        # El SVG solo depende del valor ya redondeado de cada fórmula
+        return make_render_key(
+            blueprint._get_file_checksum(),
+            blueprint._get_render_revision(),
+            {k: format_value(v) for k, v in evaluated_variables.items()},
+        )
 
-            # Convertir a PNG
-            png_output = cairosvg.svg2png(bytestring=new_svg_data.encode("utf-8"))
-            png_base64 = base64.b64encode(png_output).decode("utf-8")
+    def _get_blueprint_drawing(
+        self, blueprint, evaluated_variables, cache_key, rasterize
+    ):
+        """
+        SVG evaluado (y PNG, si ya está rasterizado o ``rasterize`` es
+        verdadero) del plano, desde la caché de renderizado o generándolo.
 
+        Returns:
+            dict: ``svg_markup`` (Markup) y ``png_base64`` (str o None).
+        """
+        RenderCache = self.env["product.blueprint.render.cache"]
+        cached = RenderCache._cache_get(cache_key, need_png=rasterize)
+        if cached:
             _logger.debug(
-                f"[Blueprint] Adjunto creado: ID={attachment.id}, Nombre=\
-                    {attachment.name}, Res_model={attachment.res_model},\
-                          Res_id={attachment.res_id}"
+                f"[Blueprint] Render reutilizado desde caché para '{blueprint.name}'"
             )
+            new_svg_data = cached["svg"]
+            png_base64 = cached["png_base64"]
+        else:
+            new_svg_data = self._render_evaluated_blueprint_svg(
+                blueprint, evaluated_variables
+            )
+            png_base64 = None
+        if png_base64 is None and rasterize:
+            png_base64 = svg_to_png_base64(new_svg_data)
+        if not cached or cached["png_base64"] != png_base64:
+            RenderCache._cache_put(
+                cache_key,
+                {"svg": new_svg_data, "png_base64": png_base64},
+                blueprint.id,
+                index=False,
+            )
+        return {"svg_markup": Markup(new_svg_data), "png_base64": png_base64}
 
-            return {
-                "attachment_id": attachment.id,
-                "svg_markup": Markup(new_svg_data),
-                "png_base64": png_base64,
-            }
-
-        except Exception as e:
-            _logger.exception("[Blueprint] Error en la evaluación del plano")
-            raise ValidationError(f"Error procesando el SVG: {e}") from e
+    def _render_evaluated_blueprint_svg(self, blueprint, evaluated_variables):
+        """
+        Sustituye los nodos ``odoo-formula`` del SVG del plano por los valores
+        evaluados y devuelve el SVG resultante como texto.
+        """
+        return blueprint._render_evaluated_svg(evaluated_variables)
 
     def safe_evaluate_formula(self, expression, variables):
         """
@@ -295,17 +216,8 @@ class SaleOrderLine(models.Model):
         )
 
         try:
-            # Crear entorno seguro con funciones matemáticas permitidas
-            allowed_names = {
-                k: v for k, v in math.__dict__.items() if not k.startswith("__")
-            }
-            allowed_names.update(variables)
-
-            # Analizar la expresión de forma segura
-            tree = ast.parse(expression, mode="eval")
-            compiled = compile(tree, "<string>", "eval")
-
-            result = eval(compiled, {"__builtins__": {}}, allowed_names)
+            # Código compilado en caché y espacio de nombres de math precalculado
+            result = evaluate_formula(expression, variables)
 
             _logger.debug(f"[Blueprint] Resultado de la evaluación: {result}")
             return str(result)
@@ -314,13 +226,15 @@ class SaleOrderLine(models.Model):
             _logger.exception(f"[Blueprint] Error al evaluar la fórmula '{expression}'")
             return "Error"
 
-    def _get_evaluated_variables(self, sale_order_line):
+    def _get_evaluated_variables(self, sale_order_line, attribute_values=None):
         """
         Devuelve un diccionario con los nombres de las variables personalizadas
         y sus valores correspondientes.
 
         Args:
             sale_order_line (recordset): La línea de pedido de venta.
+            attribute_values (dict, optional): Valores del hook ya calculados
+                para la línea (p. ej. en lote).
 
         Returns:
             dict: Un diccionario con las variables evaluadas.
@@ -330,12 +244,11 @@ class SaleOrderLine(models.Model):
                   de venta ID: {sale_order_line.id}"
         )
 
-        hook = self.env["product.blueprint.hook"]
-        attribute_values = hook.get_attribute_values_for_blueprint(sale_order_line)
+        if attribute_values is None:
+            hook = self.env["product.blueprint.hook"]
+            attribute_values = hook.get_attribute_values_for_blueprint(sale_order_line)
         _logger.debug(f"[Blueprint] Atributos capturados: {attribute_values}")
 
-        variable_mapping = {}
-
         if (
             not sale_order_line.product_id
             or not sale_order_line.product_id.product_tmpl_id
@@ -346,7 +259,18 @@ class SaleOrderLine(models.Model):
             )
             return {}
 
-        for formula in sale_order_line.product_id.product_tmpl_id.formula_ids:
+        return self._map_formula_variables(
+            sale_order_line.product_id.product_tmpl_id, attribute_values
+        )
+
+    @api.model
+    def _map_formula_variables(self, product_template, attribute_values):
+        """
+        Variables que usan las fórmulas de la plantilla, tomadas de los
+        valores de atributo (numéricas siempre que sea posible).
+        """
+        variable_mapping = {}
+        for formula in product_template.formula_ids:
             if not formula.formula_expression or not formula.available_attributes:
                 continue
 
@@ -364,78 +288,195 @@ class SaleOrderLine(models.Model):
 
         return variable_mapping
 
-    def _get_evaluated_blueprint(self, type_blueprint="manufacturing"):
+    def _blueprint_applies(self, blueprint):
+        """Comprueba el atributo condicional del plano contra la línea."""
+        self.ensure_one()
+        if not blueprint.attribute_filter_id:
+            return True
+
+        blueprint_value_names = blueprint.attribute_value_ids.mapped("name")
+        selected_names = []
+
+        for v in self.product_custom_attribute_value_ids:
+            if (
+                v.custom_product_template_attribute_value_id
+                and v.custom_product_template_attribute_value_id.attribute_id
+                == blueprint.attribute_filter_id
+            ):
+                selected_names.append(v.name)
+        for v in self.product_no_variant_attribute_value_ids:
+            if v.attribute_id == blueprint.attribute_filter_id:
+                selected_names.append(v.name)
+        for v in self.product_template_attribute_value_ids:
+            if v.attribute_id == blueprint.attribute_filter_id:
+                selected_names.append(v.name)
+
+        return any(name in blueprint_value_names for name in selected_names)
+
+    def _evaluate_blueprint_formulas(self, blueprint, variables):
+        """Evalúa las fórmulas del plano: {nombre de fórmula: valor}."""
+        evaluated_values = {}
+        for formula in blueprint.formula_ids:
+            if formula.name and formula.formula_expression:
+                formula_key = formula.name.name
+                evaluated_values[formula_key] = self.safe_evaluate_formula(
+                    formula.formula_expression, variables
+                )
+        return evaluated_values
+
+    def _batch_evaluate_blueprint_formulas(self, type_blueprint="manufacturing"):
+        """
+        Evalúa las fórmulas de los planos de todas las líneas agrupando por
+        plano, de forma que cada expresión se evalúa una sola vez sobre las
+        columnas de variables de todas sus líneas (vectorizada con NumPy
+        cuando es posible).
+
+        Returns:
+            dict: {id de línea: {id de plano: {nombre de fórmula: valor}}}
+        """
+        hook = self.env["product.blueprint.hook"]
+        attribute_values = hook.get_attribute_values_for_blueprint_batch(self)
+        rows_by_blueprint = defaultdict(list)
+        for line in self:
+            if not line.product_id:
+                continue
+            blueprints = line.product_id.product_tmpl_id.blueprint_ids.filtered(
+                lambda b, line=line: b.type_blueprint == type_blueprint
+                and line._blueprint_applies(b)
+            )
+            if not blueprints:
+                continue
+            variables = line._get_evaluated_variables(
+                line, attribute_values=attribute_values[line.id]
+            )
+            for blueprint in blueprints:
+                rows_by_blueprint[blueprint].append((line, variables))
+
+        evaluated = defaultdict(dict)
+        for blueprint, rows in rows_by_blueprint.items():
+            names = set().union(*(variables for _line, variables in rows))
+            columns = {
+                name: [variables.get(name) for _line, variables in rows]
+                for name in names
+            }
+            values_by_row = [{} for _row in rows]
+            for formula in blueprint.formula_ids:
+                if not formula.name or not formula.formula_expression:
+                    continue
+                results = evaluate_formula_batch(
+                    formula.formula_expression, columns, len(rows)
+                )
+                for values, value in zip(values_by_row, results):
+                    values[formula.name.name] = str(value)
+            for (line, _variables), values in zip(rows, values_by_row):
+                evaluated[line.id][blueprint.id] = values
+        return evaluated
+
+    def _get_evaluated_blueprint(
+        self,
+        type_blueprint="manufacturing",
+        rasterize=True,
+        evaluated_values_by_blueprint=None,
+        drawings=None,
+    ):
+        """
+        Genera los planos evaluados de la línea para el tipo indicado y los
+        adjunta a la línea (``_render_evaluated_blueprints`` seguido de
+        ``_store_evaluated_blueprints``).
+
+        Returns:
+            list: Planos evaluados (``EvaluatedBlueprint``).
+        """
+        self.ensure_one()
+        evaluated_svgs = self._render_evaluated_blueprints(
+            type_blueprint=type_blueprint,
+            rasterize=rasterize,
+            evaluated_values_by_blueprint=evaluated_values_by_blueprint,
+            drawings=drawings,
+        )
+        self._store_evaluated_blueprints(type_blueprint, evaluated_svgs)
+        return evaluated_svgs
+
+    def _render_evaluated_blueprints(
+        self,
+        type_blueprint="manufacturing",
+        rasterize=True,
+        evaluated_values_by_blueprint=None,
+        drawings=None,
+    ):
+        """
+        Genera en memoria los planos evaluados de la línea para el tipo
+        indicado, sin escribir en la base de datos: no crea ni borra adjuntos
+        ni registra entradas en el índice de la caché. Es lo que usan los
+        informes y la vista previa, de modo que varias impresiones del mismo
+        pedido no se bloquean entre sí.
+
+        Args:
+            type_blueprint (str): Tipo de plano.
+            rasterize (bool): Rasterizar ya los planos en modo PNG.
+            evaluated_values_by_blueprint (dict, optional): Valores ya
+                evaluados en lote, {id de plano: {nombre de fórmula: valor}}.
+            drawings (dict, optional): Dibujos ya generados para otras líneas
+                del mismo informe, por clave de renderizado.
+
+        Returns:
+            list: Planos evaluados (``EvaluatedBlueprint``).
+        """
         self.ensure_one()
         _logger.info(
             f"[Blueprint] Generando planos evaluados para línea {self.id}\
                   (Producto: {self.product_id.name})"
         )
 
-        old_attachments = self.env["ir.attachment"].search(
-            [
-                ("res_model", "=", "sale.order.line"),
-                ("res_id", "=", self.id),
-                ("name", "ilike", f"blueprint_%_line_{self.id}_evaluated.svg"),
-            ]
-        )
-        if old_attachments:
-            _logger.debug(
-                f"[Blueprint] Se eliminarán {len(old_attachments)} adjuntos antiguos"
-            )
-            old_attachments.unlink()
-
-        if not self.product_id or not self.product_id.product_tmpl_id.blueprint_ids:
+        blueprints = self.product_id.product_tmpl_id.blueprint_ids
+        if not self.product_id or not blueprints:
             _logger.warning(
                 f"[Blueprint] No hay blueprints para el producto {self.product_id.name}"
             )
             return []
 
         evaluated_svgs = []
+        variables = None
+        RenderCache = self.env["product.blueprint.render.cache"]
 
-        for blueprint in self.product_id.product_tmpl_id.blueprint_ids:
+        for blueprint in blueprints:
             if blueprint.type_blueprint != type_blueprint:
                 continue
-
-            if blueprint.attribute_filter_id:
-                blueprint_value_names = blueprint.attribute_value_ids.mapped("name")
-                selected_names = []
-
-                for v in self.product_custom_attribute_value_ids:
-                    if (
-                        v.custom_product_template_attribute_value_id
-                        and v.custom_product_template_attribute_value_id.attribute_id
-                        == blueprint.attribute_filter_id
-                    ):
-                        selected_names.append(v.name)
-                for v in self.product_no_variant_attribute_value_ids:
-                    if v.attribute_id == blueprint.attribute_filter_id:
-                        selected_names.append(v.name)
-                for v in self.product_template_attribute_value_ids:
-                    if v.attribute_id == blueprint.attribute_filter_id:
-                        selected_names.append(v.name)
-
-                if not any(name in blueprint_value_names for name in selected_names):
-                    continue
+            if not self._blueprint_applies(blueprint):
+                continue
 
             _logger.debug(f"[Blueprint] Evaluando plano: {blueprint.name}")
-            variables = self._get_evaluated_variables(self)
-            evaluated_values = {}
-            for formula in blueprint.formula_ids:
-                if formula.name and formula.formula_expression:
-                    formula_key = formula.name.name
-                    evaluated_values[formula_key] = self.safe_evaluate_formula(
-                        formula.formula_expression, variables
-                    )
-
-            result = self._generate_evaluated_blueprint_svg(blueprint, evaluated_values)
-            evaluated_svgs.append(
-                {
-                    "attachment_id": result["attachment_id"],
-                    "markup": result["svg_markup"],
-                    "png_base64": result["png_base64"],
-                    "blueprint_name": blueprint.name,
-                }
+            if evaluated_values_by_blueprint and (
+                blueprint.id in evaluated_values_by_blueprint
+            ):
+                evaluated_values = evaluated_values_by_blueprint[blueprint.id]
+            else:
+                if variables is None:
+                    variables = self._get_evaluated_variables(self)
+                evaluated_values = self._evaluate_blueprint_formulas(
+                    blueprint, variables
+                )
+
+            # En modo vectorial el PNG no se genera salvo que alguien lo pida.
+            result = self._generate_evaluated_blueprint_svg(
+                blueprint,
+                evaluated_values,
+                rasterize=rasterize and blueprint.render_mode == "png",
+                drawings=drawings,
+            )
+            evaluated_blueprint = EvaluatedBlueprint(
+                markup=result["svg_markup"],
+                render_key=result["render_key"],
+                render_mode=blueprint.render_mode,
+                blueprint_id=blueprint.id,
+                blueprint_name=blueprint.name,
             )
+            evaluated_blueprint.store = functools.partial(
+                RenderCache._cache_put, blueprint_id=blueprint.id, index=False
+            )
+            if result["png_base64"] is not None:
+                evaluated_blueprint["png_base64"] = result["png_base64"]
+            evaluated_svgs.append(evaluated_blueprint)
 
         if not evaluated_svgs:
             _logger.warning(
@@ -443,3 +484,94 @@ class SaleOrderLine(models.Model):
             )
 
         return evaluated_svgs
+
+    def _store_evaluated_blueprints(self, type_blueprint, evaluated_blueprints):
+        """
+        Persiste los planos evaluados de la línea: los adjunta como SVG
+        (reutilizando los adjuntos cuyas entradas no han cambiado), borra los
+        que ya no aplican y registra sus entradas en el índice de la caché.
+
+        Es el paso explícito de emisión de los planos al taller; renderizar
+        no escribe nada en la base de datos.
+
+        Args:
+            type_blueprint (str): Tipo de los planos evaluados.
+            evaluated_blueprints (list): Resultado de
+                ``_render_evaluated_blueprints``; cada plano recibe su
+                ``attachment_id``.
+        """
+        self.ensure_one()
+        # Adjuntos previos de la línea, por nombre, salvo los de planos de
+        # otro tipo. Los que no se reutilicen (entradas cambiadas, plano ya no
+        # aplicable o de otro producto) se borran al final.
+        blueprints = self.product_id.product_tmpl_id.blueprint_ids
+        other_type_names = {
+            self._get_blueprint_attachment_name(b)
+            for b in blueprints
+            if b.type_blueprint != type_blueprint
+        }
+        old_attachments = {
+            attachment.name: attachment
+            for attachment in self.blueprint_attachment_ids
+            if attachment.name not in other_type_names
+        }
+        stale_attachments = self.env["ir.attachment"]
+
+        Blueprint = self.env["product.blueprint"]
+        vals_list = []
+        pending = []
+        for evaluated_blueprint in evaluated_blueprints:
+            blueprint = Blueprint.browse(evaluated_blueprint["blueprint_id"])
+            fingerprint = hash_values(
+                [self.blueprint_fingerprint, blueprint._get_input_fingerprint()]
+            )
+            name = self._get_blueprint_attachment_name(blueprint)
+            attachment = old_attachments.pop(name, None)
+            if attachment and attachment.blueprint_fingerprint != fingerprint:
+                stale_attachments |= attachment
+                attachment = None
+            if attachment:
+                _logger.debug(
+                    f"[Blueprint] Entradas sin cambios, se reutiliza el adjunto "
+                    f"ID={attachment.id} ({attachment.name})"
+                )
+                evaluated_blueprint["attachment_id"] = attachment.id
+                continue
+            vals_list.append(
+                {
+                    "name": name,
+                    "type": "binary",
+                    "datas": base64.b64encode(
+                        str(evaluated_blueprint["markup"]).encode("utf-8")
+                    ),
+                    "res_model": "sale.order.line",
+                    "res_id": self.id,
+                    "mimetype": "image/svg+xml",
+                    "blueprint_fingerprint": fingerprint,
+                }
+            )
+            pending.append(evaluated_blueprint)
+
+        if vals_list:
+            attachments = self.env["ir.attachment"].create(vals_list)
+            for evaluated_blueprint, attachment in zip(pending, attachments):
+                evaluated_blueprint["attachment_id"] = attachment.id
+            _logger.debug(
+                f"[Blueprint] Adjuntos creados para la línea {self.id}: "
+                f"{attachments.ids}"
+            )
+
+        for attachment in old_attachments.values():
+            stale_attachments |= attachment
+        if stale_attachments:
+            _logger.debug(
+                f"[Blueprint] Se eliminarán {len(stale_attachments)} adjuntos antiguos"
+            )
+            stale_attachments.unlink()
+
+        self.env["product.blueprint.render.cache"]._index_render_keys(
+            {
+                evaluated_blueprint["render_key"]: evaluated_blueprint["blueprint_id"]
+                for evaluated_blueprint in evaluated_blueprints
+            }
+        )
@@ -0,0 +1 @@
+from . import report_purchase_order_blueprint, report_sale_order_blueprint
@@ -11,16 +11,20 @@ class ReportPurchaseOrderBlueprint(models.AbstractModel):
 
     def _get_report_values(self, docids, data=None):
         orders = self.env["sale.order"].browse(docids)
-        for order in orders:
-            _logger.debug(f"[Blueprint][Purchase] Procesando orden {order.name}")
-            for line in order.order_line:
-                _logger.debug(
-                    f"[Blueprint][Purchase] Línea {line.id} - Producto:\
-                          {line.product_id.name}"
-                )
-                line._get_evaluated_blueprint(type_blueprint="purchase")
+        _logger.debug(
+            f"[Blueprint][Purchase] Procesando órdenes {orders.mapped('name')}"
+        )
+        # Los planos se evalúan una sola vez por línea y se pasan a la
+        # plantilla, que ya no debe volver a llamar a _get_evaluated_blueprint.
+        evaluated_blueprints = orders._get_evaluated_blueprints_by_line(
+            type_blueprint="purchase"
+        )
         return {
             "doc_ids": docids,
             "doc_model": "sale.order",
             "docs": orders,
+            "evaluated_blueprints": evaluated_blueprints,
+            "blueprint_drawings": orders._get_blueprint_report_drawings(
+                evaluated_blueprints
+            ),
         }
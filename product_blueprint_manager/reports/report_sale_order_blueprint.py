@@ -11,16 +11,16 @@ class ReportBlueprintAutoGenerate(models.AbstractModel):
 
     def _get_report_values(self, docids, data=None):
         orders = self.env["sale.order"].browse(docids)
-        for order in orders:
-            _logger.debug(f"[Blueprint][Auto] Procesando orden {order.name}")
-            for line in order.order_line:
-                _logger.debug(
-                    f"[Blueprint][Auto] Línea {line.id} - Producto:\
-                          {line.product_id.name}"
-                )
-                line._get_evaluated_blueprint()
+        _logger.debug(f"[Blueprint][Auto] Procesando órdenes {orders.mapped('name')}")
+        # Los planos se evalúan una sola vez por línea y se pasan a la
+        # plantilla, que ya no debe volver a llamar a _get_evaluated_blueprint.
+        evaluated_blueprints = orders._get_evaluated_blueprints_by_line()
         return {
             "doc_ids": docids,
             "doc_model": "sale.order",
             "docs": orders,
+            "evaluated_blueprints": evaluated_blueprints,
+            "blueprint_drawings": orders._get_blueprint_report_drawings(
+                evaluated_blueprints
+            ),
         }
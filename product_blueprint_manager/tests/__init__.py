@@ -0,0 +1,7 @@
+from . import test_blueprint_import
+from . import test_blueprint_preview
+from . import test_blueprint_report
+from . import test_formula_engine
+from . import test_render_cache
+from . import test_render_queue
+from . import test_svg_stream
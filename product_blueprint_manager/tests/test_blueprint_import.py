@@ -0,0 +1,96 @@
+import base64
+import io
+import os
+import zipfile
+from unittest.mock import patch
+
+from odoo.tests import TransactionCase
+
+from ..models import product_blueprint
+
+SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="100" height="50">'
+    b'<text id="ancho" x="10.123456" y="20" class="odoo-formula">Ancho</text>'
+    b'<rect x="0.123456" y="1" width="10" height="5"/>'
+    b"</svg>"
+)
+
+
+class TestBlueprintImport(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.template = cls.env["product.template"].create(
+            {"name": "Mampara", "default_code": "MAM-001"}
+        )
+
+    def _create_wizard(self, **vals):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr(
+                "manifest.csv",
+                "file,product,name\n"
+                "frontal.svg,MAM-001,Frontal\n"
+                "corte.svg,MAM-001,Corte\n",
+            )
+            archive.writestr("frontal.svg", SVG)
+            archive.writestr("corte.svg", SVG)
+        return self.env["product.blueprint.import"].create(
+            {"zip_file": base64.b64encode(buffer.getvalue()), **vals}
+        )
+
+    def test_default_workers_come_from_parameter(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "product_blueprint_manager.import_workers", 2
+        )
+        max_workers = min(2, os.cpu_count() or 1)
+        wizard = self._create_wizard()
+        self.assertEqual(wizard.workers, max_workers)
+        wizard.workers = 64
+        self.assertEqual(wizard._get_parse_settings()[0], max_workers)
+
+    def test_create_keeps_given_derivatives(self):
+        blueprint = self.env["product.blueprint"].create(
+            {
+                "name": "Frontal",
+                "product_id": self.template.id,
+                "file": base64.b64encode(SVG),
+                "optimized_file": base64.b64encode(b"<svg/>"),
+                "render_template": '{"version":0}',
+            }
+        )
+        self.env.flush_all()
+        blueprint.invalidate_recordset()
+        self.assertEqual(base64.b64decode(blueprint.optimized_file), b"<svg/>")
+        self.assertEqual(blueprint.render_template, '{"version":0}')
+
+    def test_parsed_derivatives_are_not_recomputed(self):
+        wizard = self._create_wizard(workers=1)
+        with patch.object(
+            product_blueprint,
+            "optimize_svg",
+            wraps=product_blueprint.optimize_svg,
+        ) as optimize, patch.object(
+            product_blueprint,
+            "compile_svg_template",
+            wraps=product_blueprint.compile_svg_template,
+        ) as compile_template:
+            wizard.action_import()
+            self.env.flush_all()
+        optimize.assert_not_called()
+        compile_template.assert_not_called()
+        self.assertEqual(wizard.imported_count, 2)
+
+        blueprints = self.env["product.blueprint"].search(
+            [("product_id", "=", self.template.id)]
+        )
+        self.assertEqual(len(blueprints), 2)
+        for blueprint in blueprints:
+            self.assertIn(b'x="0.123"', base64.b64decode(blueprint.optimized_file))
+            self.assertTrue(blueprint.render_template)
+            self.assertEqual(
+                self.env["product.blueprint.formula.name"]
+                .search([("blueprint_id", "=", blueprint.id)])
+                .mapped("name"),
+                ["Ancho"],
+            )
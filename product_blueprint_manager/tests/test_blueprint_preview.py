@@ -0,0 +1,74 @@
+import base64
+
+from odoo.tests import HttpCase, tagged
+
+SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="100" height="50">'
+    b'<text id="ancho" x="10" y="20" class="odoo-formula">Ancho</text>'
+    b"</svg>"
+)
+
+
+@tagged("post_install", "-at_install")
+class TestBlueprintPreview(HttpCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.template = cls.env["product.template"].create({"name": "Mampara"})
+        cls.blueprint = cls.env["product.blueprint"].create(
+            {
+                "name": "Frontal",
+                "product_id": cls.template.id,
+                "file": base64.b64encode(SVG),
+                "type_blueprint": "manufacturing",
+            }
+        )
+        cls.url = f"/product_blueprint_manager/preview/{cls.template.id}/manufacturing"
+
+    def setUp(self):
+        super().setUp()
+        self.authenticate("admin", "admin")
+
+    def test_preview_returns_svg_with_etag(self):
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["ETag"])
+        self.assertIn("image/svg+xml", response.headers["Content-Type"])
+        self.assertIn("nosniff", response.headers["X-Content-Type-Options"])
+        self.assertIn(b"<svg", response.content)
+
+    def test_matching_etag_returns_304(self):
+        etag = self.url_open(self.url).headers["ETag"]
+        response = self.url_open(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertFalse(response.content)
+
+    def test_stale_etag_returns_new_preview(self):
+        etag = self.url_open(self.url).headers["ETag"]
+        formula_name = self.env["product.blueprint.formula.name"].search(
+            [("blueprint_id", "=", self.blueprint.id)], limit=1
+        )
+        self.env["product.blueprint.formula"].create(
+            {
+                "name": formula_name.id,
+                "formula_expression": "2 * 3",
+                "product_id": self.template.id,
+                "blueprint_id": self.blueprint.id,
+            }
+        )
+        response = self.url_open(self.url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_over_budget_preview_is_still_served(self):
+        self.env["ir.config_parameter"].sudo().set_param(
+            "product_blueprint_manager.preview_budget_ms", 0
+        )
+        response = self.url_open(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"<svg", response.content)
+
+    def test_unknown_template_returns_404(self):
+        response = self.url_open("/product_blueprint_manager/preview/0/manufacturing")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,58 @@
+import base64
+
+from odoo import fields
+from odoo.tests import TransactionCase
+
+SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="100" height="50">'
+    b'<text id="ancho" x="10" y="20" class="odoo-formula">Ancho</text>'
+    b"</svg>"
+)
+
+
+class TestBlueprintReport(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.product = cls.env["product.product"].create(
+            {"name": "Mampara", "list_price": 100.0}
+        )
+        cls.env["product.blueprint"].create(
+            {
+                "name": "Frontal",
+                "product_id": cls.product.product_tmpl_id.id,
+                "file": base64.b64encode(SVG),
+                "type_blueprint": "manufacturing",
+            }
+        )
+        cls.order = cls.env["sale.order"].create(
+            {
+                "partner_id": cls.env["res.partner"].create({"name": "Cliente"}).id,
+                "order_line": [
+                    fields.Command.create(
+                        {"product_id": cls.product.id, "product_uom_qty": 1}
+                    )
+                    for _index in range(3)
+                ],
+            }
+        )
+
+    def test_identical_lines_share_one_drawing(self):
+        values = self.env[
+            "report.product_blueprint_manager.report_sale_order_blueprint"
+        ]._get_report_values(self.order.ids)
+        drawings = values["blueprint_drawings"][self.order.id]
+        self.assertEqual(len(drawings), 1)
+        drawing = next(iter(drawings.values()))
+        self.assertIn('id="blueprint-drawing-0"', drawing["definition"])
+        self.assertIn('viewBox="0 0 100.0 50.0"', drawing["definition"])
+        self.assertIn("#blueprint-drawing-0", drawing["reference"])
+
+    def test_report_defines_each_drawing_once(self):
+        html, _format = self.env["ir.actions.report"]._render_qweb_html(
+            "product_blueprint_manager.action_report_sale_order_blueprint",
+            self.order.ids,
+        )
+        html = html.decode()
+        self.assertEqual(html.count('id="blueprint-drawing-0"'), 1)
+        self.assertEqual(html.count('xlink:href="#blueprint-drawing-0"'), 3)
@@ -0,0 +1,73 @@
+from odoo.tests import TransactionCase
+
+from ..tools.formula_engine import (
+    MATH_NAMESPACE,
+    compile_formula,
+    evaluate_formula,
+    evaluate_formula_batch,
+    formula_cache,
+)
+
+
+class TestFormulaEngine(TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.line_model = self.env["sale.order.line"]
+        formula_cache.clear()
+
+    def test_evaluate_with_math_functions(self):
+        result = self.line_model.safe_evaluate_formula(
+            "ceil(mmA / 50) * 50 + sqrt(mmB)", {"mmA": 1210, "mmB": 16}
+        )
+        self.assertEqual(float(result), 1254.0)
+
+    def test_invalid_formula_returns_error(self):
+        self.assertEqual(
+            self.line_model.safe_evaluate_formula("mmA *", {"mmA": 1}), "Error"
+        )
+        self.assertEqual(
+            self.line_model.safe_evaluate_formula("open('x')", {}),
+            "Error",
+            "Las fórmulas no deben tener acceso a __builtins__",
+        )
+
+    def test_compiled_code_is_cached(self):
+        before = formula_cache.stats()
+        code = compile_formula("mmA * 2")
+        self.assertIs(compile_formula("mmA * 2"), code)
+        after = formula_cache.stats()
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+    def test_math_namespace_is_immutable(self):
+        with self.assertRaises(TypeError):
+            MATH_NAMESPACE["mmA"] = 1
+
+    def test_batch_matches_scalar_evaluation(self):
+        columns = {
+            "e": [1, 2.5, None, 3],
+            "mmA": [1210, 2**53 + 1, 980, 10**20],
+            "pi": [None, None, None, None],
+        }
+        size = 4
+        for expression in (
+            "e * 2",
+            "mmA + 1",
+            "ceil(mmA / 50) * 50 + e",
+            "pi * 2",
+            "mmA * e",
+        ):
+            rows = [
+                {
+                    name: column[i]
+                    for name, column in columns.items()
+                    if column[i] is not None
+                }
+                for i in range(size)
+            ]
+            expected = [evaluate_formula(expression, row) for row in rows]
+            self.assertEqual(
+                evaluate_formula_batch(expression, columns, size),
+                expected,
+                expression,
+            )
@@ -0,0 +1,70 @@
+import base64
+import os
+
+from odoo.tests import TransactionCase
+
+from ..tools.render_cache import make_render_key, render_key_digest
+
+SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="100" height="50">'
+    b'<text id="ancho" x="10" y="20" class="odoo-formula">Ancho</text>'
+    b"</svg>"
+)
+
+
+class TestRenderCache(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.RenderCache = cls.env["product.blueprint.render.cache"]
+        cls.blueprint = cls.env["product.blueprint"].create(
+            {
+                "name": "Frontal",
+                "product_id": cls.env["product.template"]
+                .create({"name": "Mampara"})
+                .id,
+                "file": base64.b64encode(SVG),
+                "type_blueprint": "manufacturing",
+            }
+        )
+
+    def _put_unindexed(self, values, blueprint_id):
+        render_key = make_render_key("checksum", "revision", values)
+        self.RenderCache._cache_put(
+            render_key,
+            {"svg": SVG.decode(), "png_base64": None},
+            blueprint_id,
+            index=False,
+        )
+        return render_key_digest(render_key)
+
+    def _entry(self, digest):
+        return self.RenderCache.search([("key", "=", digest)])
+
+    def test_evict_adopts_read_only_renders_with_their_blueprint(self):
+        digest = self._put_unindexed({"Ancho": 1210}, self.blueprint.id)
+        self.assertFalse(self._entry(digest))
+        self.RenderCache._cron_evict()
+        self.assertEqual(self._entry(digest).blueprint_id, self.blueprint)
+
+        store = self.RenderCache._get_store()
+        self.blueprint._purge_render_cache()
+        self.assertFalse(self._entry(digest))
+        self.assertFalse(os.path.exists(store.path(digest, "svg")))
+        self.assertFalse(os.path.exists(store.path(digest, store.OWNER_EXTENSION)))
+
+    def test_evict_deletes_renders_of_removed_blueprints(self):
+        blueprint = self.env["product.blueprint"].create(
+            {
+                "name": "Trasero",
+                "product_id": self.blueprint.product_id.id,
+                "file": base64.b64encode(SVG),
+                "type_blueprint": "manufacturing",
+            }
+        )
+        digest = self._put_unindexed({"Ancho": 980}, blueprint.id)
+        blueprint.unlink()
+        self.RenderCache._cron_evict()
+        self.assertFalse(self._entry(digest))
+        store = self.RenderCache._get_store()
+        self.assertFalse(os.path.exists(store.path(digest, "svg")))
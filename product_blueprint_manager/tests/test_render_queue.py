@@ -0,0 +1,134 @@
+import base64
+from datetime import timedelta
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import TransactionCase
+
+from ..models.product_blueprint_render_job import MAX_ATTEMPTS, RETRY_DELAY
+
+SVG = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="100" height="50">'
+    b'<text id="ancho" x="10" y="20" class="odoo-formula">Ancho</text>'
+    b"</svg>"
+)
+
+
+class TestRenderQueue(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.Job = cls.env["product.blueprint.render.job"]
+        cls.product = cls.env["product.product"].create(
+            {"name": "Mampara", "list_price": 100.0}
+        )
+        cls.env["product.blueprint"].create(
+            {
+                "name": "Frontal",
+                "product_id": cls.product.product_tmpl_id.id,
+                "file": base64.b64encode(SVG),
+                "type_blueprint": "manufacturing",
+            }
+        )
+        cls.partner = cls.env["res.partner"].create({"name": "Cliente"})
+
+    def _create_order(self):
+        return self.env["sale.order"].create(
+            {
+                "partner_id": self.partner.id,
+                "order_line": [
+                    fields.Command.create(
+                        {"product_id": self.product.id, "product_uom_qty": 1}
+                    )
+                ],
+            }
+        )
+
+    def _patch_run(self, **kwargs):
+        return patch.object(type(self.Job), "_run", autospec=True, **kwargs)
+
+    def test_confirm_enqueues_one_job_per_type(self):
+        order = self._create_order()
+        self.assertFalse(order.blueprint_render_job_ids)
+        order.action_confirm()
+        job = order.blueprint_render_job_ids
+        self.assertEqual(len(job), 1)
+        self.assertEqual(job.type_blueprint, "manufacturing")
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(order.blueprint_render_state, "pending")
+
+    def test_line_input_change_requeues_done_job(self):
+        order = self._create_order()
+        order.action_confirm()
+        job = order.blueprint_render_job_ids
+        job.write({"state": "done", "attempts": 1})
+        order.order_line.write({"product_uom_qty": 2})
+        self.assertEqual(job.state, "done", "La cantidad no afecta a los planos")
+        order.order_line.write({"product_id": self.product.id})
+        self.assertEqual(job.state, "pending")
+        self.assertEqual(job.attempts, 0)
+
+    def test_cron_renders_and_attaches_blueprints(self):
+        order = self._create_order()
+        order.action_confirm()
+        self.Job._cron_process_queue()
+        job = order.blueprint_render_job_ids
+        self.assertEqual(job.state, "done")
+        self.assertTrue(job.date_done)
+        self.assertEqual(len(order.order_line.blueprint_attachment_ids), 1)
+        self.assertEqual(order.blueprint_render_state, "ready")
+
+    def test_failed_job_waits_before_retrying(self):
+        order = self._create_order()
+        order.action_confirm()
+        job = order.blueprint_render_job_ids
+        with self._patch_run(side_effect=ValueError("boom")) as run:
+            self.Job._cron_process_queue()
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(job.state, "pending")
+            self.assertEqual(job.attempts, 1)
+            self.assertEqual(job.last_error, "boom")
+            self.assertGreater(job.date_next_attempt, fields.Datetime.now())
+
+            # Sin esperar, el trabajo no se vuelve a intentar.
+            self.Job._cron_process_queue()
+            self.assertEqual(run.call_count, 1)
+            self.assertEqual(job.attempts, 1)
+
+    def test_retry_delay_doubles_until_failed(self):
+        order = self._create_order()
+        order.action_confirm()
+        job = order.blueprint_render_job_ids
+        delays = []
+        with self._patch_run(side_effect=ValueError("boom")):
+            for _attempt in range(MAX_ATTEMPTS):
+                before = fields.Datetime.now()
+                self.Job._cron_process_queue()
+                if job.date_next_attempt:
+                    delays.append(job.date_next_attempt - before)
+                    # Se adelanta el reintento para no esperar en el test.
+                    job.date_next_attempt = before - timedelta(seconds=1)
+        self.assertEqual(job.state, "failed")
+        self.assertEqual(job.attempts, MAX_ATTEMPTS)
+        self.assertFalse(job.date_next_attempt)
+        self.assertEqual(len(delays), MAX_ATTEMPTS - 1)
+        for attempt, delay in enumerate(delays, start=1):
+            self.assertAlmostEqual(
+                delay.total_seconds(),
+                (RETRY_DELAY * 2 ** (attempt - 1)).total_seconds(),
+                delta=5,
+            )
+
+    def test_requeue_clears_retry_date(self):
+        order = self._create_order()
+        order.action_confirm()
+        job = order.blueprint_render_job_ids
+        job.write(
+            {
+                "attempts": 1,
+                "date_next_attempt": fields.Datetime.now() + timedelta(hours=1),
+            }
+        )
+        self.Job._enqueue(order)
+        self.assertEqual(job.attempts, 0)
+        self.assertFalse(job.date_next_attempt)
@@ -0,0 +1,78 @@
+import base64
+import os
+import tempfile
+
+from odoo.tests import TransactionCase
+
+from ..tools.svg_formulas import formula_name_from_node
+from ..tools.svg_optimize import optimize_svg
+from ..tools.svg_template import compile_svg_template, render_svg_template
+
+SVG = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- Exportado desde un editor -->
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"
+     xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape"
+     width="100" height="50">
+  <metadata id="metadata"><title>Plano</title></metadata>
+  <defs>
+    <linearGradient id="usado" xlink:href="#base"/>
+    <linearGradient id="base"/>
+    <linearGradient id="suelto" xlink:href="#solo_suelto"/>
+    <linearGradient id="solo_suelto"/>
+  </defs>
+  <g inkscape:label="Capa">
+    <rect x="0.123456" y="1" width="10" height="5" fill="url(#usado)"
+          transform="translate(1.23456789,0)"/>
+    <text id="ancho" x="10.123456" y="20" class="odoo-formula">Ancho</text>
+  </g>
+</svg>
+"""
+
+
+class TestSvgStream(TransactionCase):
+    def test_optimize_strips_unused_content(self):
+        optimized = optimize_svg(SVG, 3)
+        self.assertTrue(optimized.startswith(b"<?xml"))
+        for removed in (b"metadata", b"inkscape", b"suelto", b"<!--", b"\n  "):
+            self.assertNotIn(removed, optimized)
+        for kept in (b'id="usado"', b'id="base"', b'x="0.123"'):
+            self.assertIn(kept, optimized)
+        self.assertIn(b"translate(1.23457,0)", optimized)
+        self.assertIn(b'x="10.123456"', optimized, "Las fórmulas no se redondean")
+
+    def test_file_and_bytes_give_the_same_result(self):
+        with tempfile.NamedTemporaryFile(suffix=".svg", delete=False) as svg_file:
+            svg_file.write(SVG)
+        self.addCleanup(os.unlink, svg_file.name)
+        self.assertEqual(optimize_svg(svg_file.name, 3), optimize_svg(SVG, 3))
+        self.assertEqual(
+            compile_svg_template(svg_file.name, formula_name_from_node),
+            compile_svg_template(SVG, formula_name_from_node),
+        )
+
+    def test_template_renders_evaluated_values(self):
+        template = compile_svg_template(optimize_svg(SVG, 3), formula_name_from_node)
+        self.assertEqual(len(template["slots"]), 1)
+        self.assertEqual(template["slots"][0]["name"], "Ancho")
+        rendered = render_svg_template(template, {"Ancho": "1210.4"}, {})
+        self.assertIn(">1210</text>", rendered)
+        self.assertIn("formula-eval-error", rendered, "Incluye el estilo de error")
+        self.assertIn(
+            "formula-eval-error",
+            render_svg_template(template, {"Ancho": "Error"}, {}),
+        )
+
+    def test_blueprint_renders_from_streamed_derivatives(self):
+        template = self.env["product.template"].create({"name": "Mampara"})
+        blueprint = self.env["product.blueprint"].create(
+            {
+                "name": "Frontal",
+                "product_id": template.id,
+                "file": base64.b64encode(SVG),
+            }
+        )
+        self.assertEqual(
+            base64.b64decode(blueprint.optimized_file), optimize_svg(SVG, 3)
+        )
+        self.assertTrue(blueprint.render_template)
+        self.assertIn(">25</text>", blueprint._render_evaluated_svg({"Ancho": 25}))
@@ -0,0 +1,12 @@
+from . import (
+    formula_engine,
+    pdf_pages,
+    process_pool,
+    rasterize,
+    render_cache,
+    standalone,
+    svg_formulas,
+    svg_optimize,
+    svg_stream,
+    svg_template,
+)
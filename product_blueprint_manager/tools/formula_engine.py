@@ -0,0 +1,238 @@
+import ast
+import functools
+import logging
+import math
+from types import MappingProxyType
+
+from .render_cache import BoundedLRUCache
+
+_logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+except ImportError:
+    _logger.debug("[Blueprint] NumPy no disponible, sin evaluación vectorizada.")
+    np = None
+
+# Funciones y constantes de ``math`` disponibles en las fórmulas. Se construye
+# una sola vez y no se puede modificar.
+MATH_NAMESPACE = MappingProxyType(
+    {k: v for k, v in math.__dict__.items() if not k.startswith("__")}
+)
+_EVAL_GLOBALS = {"__builtins__": {}, **MATH_NAMESPACE}
+
+# Código compilado de las fórmulas, indexado por el texto de la expresión.
+formula_cache = BoundedLRUCache("blueprint_formula", max_entries=4096)
+
+
+def compile_formula(expression):
+    """Devuelve el código compilado de la expresión, usando la caché."""
+    code = formula_cache.get(expression)
+    if code is None:
+        tree = ast.parse(expression, mode="eval")
+        code = compile(tree, "<string>", "eval")
+        formula_cache.put(expression, code)
+    return code
+
+
+def evaluate_formula(expression, variables):
+    """
+    Evalúa la expresión con las funciones de ``math`` y las variables dadas,
+    sin acceso a ``__builtins__``. Las variables tienen prioridad sobre los
+    nombres de ``math``.
+    """
+    return eval(compile_formula(expression), _EVAL_GLOBALS, dict(variables))
+
+
+def invalidate_formulas(expressions):
+    """Descarta de la caché el código compilado de las expresiones dadas."""
+    for expression in expressions:
+        if expression:
+            formula_cache.pop(expression)
+
+
+# --- Evaluación vectorizada -------------------------------------------------
+
+if np is not None:
+    NUMPY_NAMESPACE = MappingProxyType(
+        {
+            "ceil": np.ceil,
+            "floor": np.floor,
+            "trunc": np.trunc,
+            "fabs": np.fabs,
+            "sqrt": np.sqrt,
+            "exp": np.exp,
+            "expm1": np.expm1,
+            "log": lambda x, base=None: (
+                np.log(x) if base is None else np.log(x) / np.log(base)
+            ),
+            "log10": np.log10,
+            "log2": np.log2,
+            "log1p": np.log1p,
+            "pow": np.power,
+            "hypot": np.hypot,
+            "fmod": np.fmod,
+            "copysign": np.copysign,
+            "sin": np.sin,
+            "cos": np.cos,
+            "tan": np.tan,
+            "asin": np.arcsin,
+            "acos": np.arccos,
+            "atan": np.arctan,
+            "atan2": np.arctan2,
+            "sinh": np.sinh,
+            "cosh": np.cosh,
+            "tanh": np.tanh,
+            "asinh": np.arcsinh,
+            "acosh": np.arccosh,
+            "atanh": np.arctanh,
+            "degrees": np.degrees,
+            "radians": np.radians,
+            "pi": math.pi,
+            "e": math.e,
+            "tau": math.tau,
+        }
+    )
+    _NUMPY_GLOBALS = {"__builtins__": {}, **NUMPY_NAMESPACE}
+else:
+    NUMPY_NAMESPACE = MappingProxyType({})
+    _NUMPY_GLOBALS = {}
+
+# Mayor entero que ``float64`` representa sin perder precisión.
+MAX_SAFE_INTEGER = 2**53
+
+_VECTOR_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Load,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.UAdd,
+    ast.USub,
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _vector_names(expression):
+    """
+    Nombres que usa la expresión si solo contiene aritmética y llamadas a
+    funciones con equivalente en NumPy: ``(nombres, funciones llamadas)``, o
+    ``None`` si no se puede vectorizar.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError:
+        return None
+    names = set()
+    functions = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            names.add(node.id)
+        elif isinstance(node, ast.Call):
+            if (
+                not isinstance(node.func, ast.Name)
+                or node.func.id not in NUMPY_NAMESPACE
+                or node.keywords
+            ):
+                return None
+            functions.add(node.func.id)
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                return None
+        elif not isinstance(node, _VECTOR_NODES):
+            return None
+    return frozenset(names - functions), frozenset(functions)
+
+
+def _is_float_safe(value):
+    """El valor se representa sin pérdida en una columna ``float64``."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return abs(value) <= MAX_SAFE_INTEGER
+    return isinstance(value, float)
+
+
+def _evaluate_row(expression, columns, index):
+    variables = {
+        name: column[index]
+        for name, column in columns.items()
+        if column[index] is not None
+    }
+    try:
+        return evaluate_formula(expression, variables)
+    except Exception:
+        _logger.debug(
+            f"[Blueprint] Error al evaluar '{expression}' en la fila {index}",
+            exc_info=True,
+        )
+        return "Error"
+
+
+def evaluate_formula_batch(expression, columns, size):
+    """
+    Evalúa una misma expresión para ``size`` filas de variables.
+
+    Si NumPy está disponible y la expresión solo usa aritmética y funciones
+    de ``math`` con equivalente en NumPy, se evalúa una única vez sobre
+    columnas ``float64``. Las variables de las filas tienen prioridad sobre
+    las constantes (``e``, ``pi``...), como en :func:`evaluate_formula`. Las
+    filas con valores ausentes o no numéricos, con números que ``float64`` no
+    representa con exactitud o cuyo resultado no es finito se reevalúan en
+    escalar para conservar su semántica. En cualquier otro caso se evalúa
+    fila a fila.
+
+    Args:
+        expression (str): Expresión de la fórmula.
+        columns (dict): {nombre de variable: secuencia de ``size`` valores};
+            ``None`` indica que la fila no define esa variable.
+        size (int): Número de filas.
+
+    Returns:
+        list: Resultado por fila, o ``"Error"`` si la fila no se pudo evaluar.
+    """
+    names = _vector_names(expression) if np is not None else None
+    if names is None:
+        return [_evaluate_row(expression, columns, i) for i in range(size)]
+    variables, functions = names
+    # Las variables de las líneas tienen prioridad sobre las constantes de
+    # NumPy, como en la evaluación escalar; si una variable oculta una
+    # función o falta algún nombre, se evalúa en escalar.
+    if functions & columns.keys() or not variables <= (
+        columns.keys() | NUMPY_NAMESPACE.keys()
+    ):
+        return [_evaluate_row(expression, columns, i) for i in range(size)]
+
+    arrays = {}
+    invalid = np.zeros(size, dtype=bool)
+    for name in variables & columns.keys():
+        values = np.full(size, np.nan)
+        for i, value in enumerate(columns[name]):
+            if _is_float_safe(value):
+                values[i] = value
+            else:
+                invalid[i] = True
+        arrays[name] = values
+
+    try:
+        with np.errstate(all="ignore"):
+            result = eval(compile_formula(expression), _NUMPY_GLOBALS, arrays)
+        result = np.broadcast_to(np.asarray(result, dtype=float), (size,))
+    except Exception:
+        _logger.debug(
+            f"[Blueprint] No se pudo vectorizar '{expression}', se evalúa en escalar",
+            exc_info=True,
+        )
+        return [_evaluate_row(expression, columns, i) for i in range(size)]
+
+    invalid |= ~np.isfinite(result) | (np.abs(result) > MAX_SAFE_INTEGER)
+    output = result.tolist()
+    for i in np.flatnonzero(invalid):
+        output[i] = _evaluate_row(expression, columns, int(i))
+    return output
@@ -0,0 +1,152 @@
+import base64
+import logging
+import re
+import struct
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import cairosvg
+from lxml import etree
+
+from .process_pool import map_in_process_pool
+from .rasterize import RasterizeTimeoutError
+
+_logger = logging.getLogger(__name__)
+
+_LENGTH_RE = re.compile(r"^\s*([-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?)")
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _length(value):
+    """Valor numérico de una longitud SVG (``"210mm"`` → 210.0), o None."""
+    match = _LENGTH_RE.match(value or "")
+    return float(match.group(1)) if match else None
+
+
+def fit_svg(svg_markup, x, y, width, height):
+    """
+    Coloca un SVG dentro de la caja indicada de otro SVG, escalado para
+    caber en ella conservando sus proporciones.
+
+    Si el SVG no tiene ``viewBox``, se deduce de su ``width``/``height``
+    para que pueda escalarse.
+
+    Returns:
+        str: SVG anidable en una página.
+    """
+    root = etree.fromstring(
+        svg_markup.encode("utf-8"),
+        parser=etree.XMLParser(huge_tree=True, resolve_entities=False),
+    )
+    if not root.get("viewBox"):
+        original_width = _length(root.get("width"))
+        original_height = _length(root.get("height"))
+        if original_width and original_height:
+            root.set("viewBox", f"0 0 {original_width} {original_height}")
+    root.set("x", str(x))
+    root.set("y", str(y))
+    root.set("width", str(width))
+    root.set("height", str(height))
+    root.set("preserveAspectRatio", "xMidYMin meet")
+    return etree.tostring(root, encoding="unicode")
+
+
+def _png_size(png_base64):
+    """Ancho y alto de un PNG en base64, leídos de su cabecera, o None."""
+    header = base64.b64decode(png_base64[:32])
+    if not header.startswith(PNG_SIGNATURE) or len(header) < 24:
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def drawing_definition(element_id, svg_markup=None, png_base64=None):
+    """
+    Dibujo de un plano preparado para definirse una sola vez en un documento
+    HTML (dentro de ``<defs>``) y mostrarse en cada línea con
+    ``drawing_reference``: un ``<svg>`` con el ID indicado y ``viewBox``, sin
+    tamaño propio. Los planos PNG se envuelven en un ``<image>``, de modo que
+    todas sus referencias comparten la misma imagen.
+
+    Args:
+        element_id (str): ID del dibujo en el documento.
+        svg_markup (str): SVG evaluado (planos vectoriales).
+        png_base64 (str): PNG en base64 (planos rasterizados).
+
+    Returns:
+        tuple: (SVG de la definición, ``viewBox`` o None si no se conoce).
+    """
+    if png_base64 is not None:
+        size = _png_size(png_base64)
+        root = etree.Element(
+            f"{{{SVG_NS}}}svg", nsmap={None: SVG_NS, "xlink": XLINK_NS}
+        )
+        image = etree.SubElement(root, f"{{{SVG_NS}}}image")
+        image.set(f"{{{XLINK_NS}}}href", f"data:image/png;base64,{png_base64}")
+        image.set("width", "100%")
+        image.set("height", "100%")
+        if size:
+            root.set("viewBox", f"0 0 {size[0]} {size[1]}")
+    else:
+        root = etree.fromstring(
+            svg_markup.encode("utf-8"),
+            parser=etree.XMLParser(huge_tree=True, resolve_entities=False),
+        )
+        if not root.get("viewBox"):
+            original_width = _length(root.get("width"))
+            original_height = _length(root.get("height"))
+            if original_width and original_height:
+                root.set("viewBox", f"0 0 {original_width} {original_height}")
+        for name in ("width", "height", "x", "y"):
+            root.attrib.pop(name, None)
+    root.set("id", element_id)
+    return etree.tostring(root, encoding="unicode"), root.get("viewBox")
+
+
+def drawing_reference(element_id, view_box=None):
+    """
+    SVG que muestra un dibujo definido con ``drawing_definition``, con sus
+    proporciones si se conoce su ``viewBox``.
+
+    Returns:
+        str: SVG con un ``<use>`` del dibujo.
+    """
+    root = etree.Element(f"{{{SVG_NS}}}svg", nsmap={None: SVG_NS, "xlink": XLINK_NS})
+    use = etree.SubElement(root, f"{{{SVG_NS}}}use")
+    use.set(f"{{{XLINK_NS}}}href", f"#{element_id}")
+    values = [_length(value) for value in (view_box or "").replace(",", " ").split()]
+    if len(values) == 4 and None not in values:
+        width, height = values[2], values[3]
+        root.set("viewBox", f"0 0 {width} {height}")
+        use.set("width", str(width))
+        use.set("height", str(height))
+    else:
+        use.set("width", "100%")
+        use.set("height", "100%")
+    return etree.tostring(root, encoding="unicode")
+
+
+def svg_pages_to_pdf(svg_pages, workers=0, timeout=None):
+    """
+    Convierte páginas SVG completas en PDF vectoriales, una por página,
+    repartiendo el trabajo en un pool de procesos si ``workers`` > 1.
+
+    Returns:
+        list: Contenido PDF (bytes) de cada página, en el mismo orden.
+
+    Raises:
+        RasterizeTimeoutError: Si alguna página supera ``timeout``.
+    """
+    try:
+        # Los procesos hijos arrancan con "spawn" y solo importan cairosvg.
+        return map_in_process_pool(
+            cairosvg.svg2pdf,
+            [page.encode("utf-8") for page in svg_pages],
+            workers=workers,
+            timeout=timeout,
+        )
+    except FuturesTimeoutError as e:
+        raise RasterizeTimeoutError(
+            f"La conversión a PDF de un plano superó {timeout} segundos"
+        ) from e
@@ -0,0 +1,120 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+_logger = logging.getLogger(__name__)
+
+# Un pool por proceso, método de arranque e inicializador, reutilizado entre
+# informes para no pagar el arranque de los procesos hijos en cada impresión.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(workers, pool_key):
+    """Devuelve el pool del proceso actual, creándolo si hace falta."""
+    start_method, initializer, initargs = pool_key
+    with _pools_lock:
+        entry = _pools.get(pool_key)
+        if entry and entry[0] == os.getpid() and entry[1] == workers:
+            return entry[2]
+        if entry:
+            # Pool heredado de otro proceso o de otro tamaño.
+            _discard_pool(pool_key, entry[2])
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=initializer,
+            initargs=initargs,
+        )
+        _pools[pool_key] = (os.getpid(), workers, executor)
+        return executor
+
+
+def _discard_pool(pool_key, executor, terminate=False):
+    """
+    Retira un pool de la caché y lo cierra. Con ``terminate`` se matan sus
+    procesos, para que un trabajo colgado no siga consumiendo CPU y memoria
+    fuera de los límites del worker de Odoo.
+    """
+    entry = _pools.get(pool_key)
+    if entry and entry[2] is executor:
+        del _pools[pool_key]
+    if terminate:
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def map_in_process_pool(
+    func,
+    items,
+    workers=0,
+    timeout=None,
+    start_method="spawn",
+    initializer=None,
+    initargs=(),
+):
+    """
+    Aplica ``func`` a cada elemento de ``items`` y devuelve los resultados en
+    el mismo orden.
+
+    Con ``workers`` > 1 y más de un elemento, los trabajos se reparten en un
+    pool de procesos acotado, que se reutiliza en las siguientes llamadas del
+    mismo proceso; en otro caso, o si el pool no se puede crear, se ejecutan
+    en serie en el proceso actual.
+
+    Con ``start_method="spawn"`` los procesos hijos no heredan los hilos ni los
+    cursores del worker de Odoo, pero ``func`` debe poder importarse sin
+    Odoo (ver ``standalone``).
+
+    Args:
+        func (callable): Función a nivel de módulo (serializable con pickle).
+        items (list): Argumento de cada llamada.
+        workers (int): Número máximo de procesos (0 o 1 desactiva el pool).
+        timeout (float): Segundos máximos de espera por trabajo.
+        start_method (str): Método de arranque de ``multiprocessing``.
+        initializer (callable): Función que ejecuta cada proceso al arrancar.
+        initargs (tuple): Argumentos de ``initializer``.
+
+    Returns:
+        list: Resultados de ``func``.
+
+    Raises:
+        concurrent.futures.TimeoutError: Si algún trabajo supera ``timeout``.
+            Los procesos del pool se terminan antes de propagar el error.
+    """
+    if workers <= 1 or len(items) < 2:
+        return [func(item) for item in items]
+
+    pool_key = (start_method, initializer, tuple(initargs))
+    try:
+        executor = _get_pool(workers, pool_key)
+    except (OSError, ValueError) as e:
+        _logger.warning(
+            f"[Blueprint] No se pudo crear el pool de procesos ({e}), "
+            "se procesa en serie."
+        )
+        return [func(item) for item in items]
+
+    _logger.debug(
+        f"[Blueprint] Procesando {len(items)} trabajos con hasta {workers} procesos"
+    )
+    futures = []
+    try:
+        futures.extend(executor.submit(func, item) for item in items)
+        return [future.result(timeout=timeout) for future in futures]
+    except FuturesTimeoutError:
+        with _pools_lock:
+            _discard_pool(pool_key, executor, terminate=True)
+        raise
+    except BrokenProcessPool:
+        with _pools_lock:
+            _discard_pool(pool_key, executor)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
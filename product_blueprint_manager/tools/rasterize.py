@@ -0,0 +1,73 @@
+import base64
+import logging
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import cairosvg
+
+from .process_pool import map_in_process_pool
+from .render_cache import render_cache
+
+_logger = logging.getLogger(__name__)
+
+
+class RasterizeTimeoutError(Exception):
+    """Un trabajo de rasterizado superó el tiempo máximo configurado."""
+
+
+def svg_to_png_base64(svg_markup):
+    """Rasteriza un SVG (texto) y devuelve el PNG codificado en base64."""
+    png_output = cairosvg.svg2png(bytestring=svg_markup.encode("utf-8"))
+    return base64.b64encode(png_output).decode("utf-8")
+
+
+class EvaluatedBlueprint(dict):
+    """
+    Plano evaluado tal y como lo reciben los informes. Si no trae
+    ``png_base64``, el PNG se rasteriza solo cuando alguien lo pide y se
+    guarda con ``store`` (por defecto, en la caché del proceso).
+    """
+
+    store = staticmethod(render_cache.put)
+
+    def __missing__(self, key):
+        if key != "png_base64":
+            raise KeyError(key)
+        svg_markup = str(self["markup"])
+        png_base64 = svg_to_png_base64(svg_markup)
+        self[key] = png_base64
+        self.store(self["render_key"], {"svg": svg_markup, "png_base64": png_base64})
+        return png_base64
+
+
+def rasterize_svgs(svg_markups, workers=0, timeout=None):
+    """
+    Rasteriza una lista de SVG y devuelve sus PNG en base64, en el mismo orden.
+
+    Con ``workers`` > 1 y más de un SVG, los trabajos se reparten en un pool de
+    procesos acotado para aprovechar todos los núcleos; en otro caso, o si el
+    pool no se puede crear, se rasteriza en serie en el proceso actual.
+
+    Args:
+        svg_markups (list): SVG evaluados como texto.
+        workers (int): Número máximo de procesos (0 o 1 desactiva el pool).
+        timeout (float): Segundos máximos de espera por trabajo.
+
+    Returns:
+        list: PNG en base64.
+
+    Raises:
+        RasterizeTimeoutError: Si algún trabajo supera ``timeout``.
+    """
+    try:
+        # Los procesos hijos arrancan con "spawn" y solo importan cairosvg.
+        pngs = map_in_process_pool(
+            cairosvg.svg2png,
+            [markup.encode("utf-8") for markup in svg_markups],
+            workers=workers,
+            timeout=timeout,
+        )
+    except FuturesTimeoutError as e:
+        raise RasterizeTimeoutError(
+            f"El rasterizado de un plano superó {timeout} segundos"
+        ) from e
+    return [base64.b64encode(png).decode("utf-8") for png in pngs]
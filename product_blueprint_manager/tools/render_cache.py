@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+_logger = logging.getLogger(__name__)
+
+
+class BoundedLRUCache:
+    """
+    Caché LRU en memoria, segura entre hilos, acotada por número de entradas
+    y, opcionalmente, por el tamaño total en bytes de los valores guardados.
+
+    Lleva contadores de aciertos, fallos y expulsiones para poder revisar
+    su eficacia desde los logs o desde un shell.
+    """
+
+    def __init__(self, name, max_entries=256, max_bytes=None):
+        self.name = name
+        self.max_entries = max(int(max_entries), 1)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = 0
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _sizeof(value):
+        """Tamaño aproximado de un valor: suma de longitudes de str/bytes."""
+        if isinstance(value, (str, bytes)):
+            return len(value)
+        if isinstance(value, dict):
+            return sum(len(v) for v in value.values() if isinstance(v, (str, bytes)))
+        return 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key][1]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self._sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self._size -= self._data.pop(key)[0]
+            if self.max_bytes and size > self.max_bytes:
+                _logger.debug(
+                    f"[Blueprint][Cache] Entrada de {size} bytes excede el "
+                    f"límite de '{self.name}', no se guarda."
+                )
+                return
+            self._data[key] = (size, value)
+            self._size += size
+            while len(self._data) > self.max_entries or (
+                self.max_bytes and self._size > self.max_bytes
+            ):
+                old_size, _value = self._data.popitem(last=False)[1]
+                self._size -= old_size
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            if entry is None:
+                return default
+            self._size -= entry[0]
+            return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def stats(self):
+        """Devuelve un diccionario con el estado actual de la caché."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._data),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+def hash_values(values):
+    """Hash canónico (independiente del orden) de un diccionario de valores."""
+    payload = json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def make_render_key(file_checksum, revision, values):
+    """Clave de la caché de renderizado: (checksum SVG, revisión, hash valores)."""
+    return (file_checksum or "", revision or "", hash_values(values))
+
+
+def render_key_digest(render_key):
+    """Identificador en texto de una clave de renderizado, apto para rutas."""
+    return hash_values(list(render_key))
+
+
+class FilestoreRenderCache:
+    """
+    Caché en disco de planos evaluados, compartida por todos los workers y
+    que sobrevive a los reinicios.
+
+    Cada entrada se guarda como ``<raíz>/<ab>/<digest>.svg`` y, si ya se ha
+    rasterizado, ``<digest>.png``. Junto a ellos, ``<digest>.owner`` guarda el
+    ID del plano al que pertenece la entrada, para poder registrarla en el
+    índice aunque se haya escrito sin él. Las escrituras son atómicas (archivo
+    temporal en el mismo directorio + ``os.replace``), de modo que un lector
+    nunca ve un archivo a medias. Cada acierto actualiza la fecha de
+    modificación de los archivos, que sirve de orden LRU al expulsar.
+    """
+
+    EXTENSIONS = ("svg", "png")
+    OWNER_EXTENSION = "owner"
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, digest, extension):
+        return os.path.join(self.root, digest[:2], f"{digest}.{extension}")
+
+    def _read(self, path):
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _write(self, path, data):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, digest):
+        """
+        Devuelve ``{"svg": str, "png": bytes | None}`` o None si no existe.
+        """
+        svg = self._read(self.path(digest, "svg"))
+        if svg is None:
+            return None
+        return {"svg": svg.decode("utf-8"), "png": self.get_png(digest)}
+
+    def get_png(self, digest):
+        """PNG de la entrada, o None si aún no se ha rasterizado."""
+        return self._read(self.path(digest, "png"))
+
+    def put(self, digest, svg, png=None, owner=None):
+        """
+        Guarda el SVG y, si se reciben, el PNG y el ID del plano al que
+        pertenece. Devuelve los tamaños.
+        """
+        if owner:
+            self._write(self.path(digest, self.OWNER_EXTENSION), str(owner).encode())
+        self._write(self.path(digest, "svg"), svg.encode("utf-8"))
+        if png is not None:
+            self._write(self.path(digest, "png"), png)
+        return self.sizes(digest)
+
+    def owner(self, digest):
+        """ID del plano al que pertenece la entrada, o None si no se conoce."""
+        try:
+            with open(self.path(digest, self.OWNER_EXTENSION), "rb") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def sizes(self, digest):
+        """Tamaño en bytes de cada archivo de la entrada (0 si no existe)."""
+        sizes = {}
+        for extension in self.EXTENSIONS:
+            try:
+                sizes[extension] = os.path.getsize(self.path(digest, extension))
+            except OSError:
+                sizes[extension] = 0
+        return sizes
+
+    def last_access(self, digest):
+        """Fecha (timestamp) del último acceso, o None si no hay SVG."""
+        try:
+            return os.path.getmtime(self.path(digest, "svg"))
+        except OSError:
+            return None
+
+    def delete(self, digest):
+        for extension in self.EXTENSIONS + (self.OWNER_EXTENSION,):
+            try:
+                os.unlink(self.path(digest, extension))
+            except FileNotFoundError:
+                pass
+
+    def iter_files(self):
+        """Recorre los archivos de la caché: (digest, ruta, fecha de modif.)."""
+        if not os.path.isdir(self.root):
+            return
+        for directory, _dirs, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    mtime = os.path.getmtime(path)
+                except OSError:
+                    continue
+                yield name.split(".", 1)[0], path, mtime
+
+
+# Caché de planos evaluados (SVG + PNG) compartida por todo el proceso.
+render_cache = BoundedLRUCache(
+    "blueprint_render", max_entries=512, max_bytes=128 * 1024 * 1024
+)
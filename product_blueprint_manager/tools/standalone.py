@@ -0,0 +1,44 @@
+"""
+Carga el paquete ``tools`` del módulo como paquete independiente de Odoo,
+con el nombre ``STANDALONE_PACKAGE``.
+
+Los procesos hijos arrancados con "spawn" no tienen configurada la ruta de
+addons, así que no pueden importar ``odoo.addons.product_blueprint_manager``.
+Las funciones que se reparten en el pool se toman de este paquete
+independiente (que solo depende de lxml y cairosvg) y cada hijo lo carga al
+arrancar con ``STANDALONE_INITIALIZER``, que solo usa la biblioteca estándar.
+"""
+
+import importlib.util
+import os
+import runpy
+import sys
+
+STANDALONE_PACKAGE = "_product_blueprint_manager_tools"
+
+
+def load_standalone_tools():
+    """Devuelve el paquete independiente, cargándolo si hace falta."""
+    package = sys.modules.get(STANDALONE_PACKAGE)
+    if package is None:
+        directory = os.path.dirname(os.path.abspath(__file__))
+        spec = importlib.util.spec_from_file_location(
+            STANDALONE_PACKAGE,
+            os.path.join(directory, "__init__.py"),
+            submodule_search_locations=[directory],
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[STANDALONE_PACKAGE] = package
+        try:
+            spec.loader.exec_module(package)
+        except BaseException:
+            del sys.modules[STANDALONE_PACKAGE]
+            raise
+    return package
+
+
+# Inicializador de los procesos hijos: ejecuta este archivo con runpy.
+STANDALONE_INITIALIZER = (runpy.run_path, (os.path.abspath(__file__),))
+
+if __name__ == "<run_path>":
+    load_standalone_tools()
@@ -0,0 +1,189 @@
+import hashlib
+import io
+import logging
+import time
+
+from .svg_optimize import optimize_svg
+from .svg_stream import iter_formula_nodes
+from .svg_template import compile_svg_template, dumps_template
+
+_logger = logging.getLogger(__name__)
+
+
+def formula_name_from_node(node):
+    """
+    Intenta determinar el nombre visual de la fórmula desde
+    diferentes fuentes visibles,
+    incluyendo nodos anidados como <tspan>.
+    """
+    candidates = [
+        node.text,
+        node.get("aria-label"),
+        node.get("aria-text"),
+    ]
+
+    for child in node.iterdescendants():
+        if child.text:
+            candidates.append(child.text)
+        if child.get("aria-label"):
+            candidates.append(child.get("aria-label"))
+        if child.get("aria-text"):
+            candidates.append(child.get("aria-text"))
+
+    for candidate in candidates:
+        if candidate and candidate.strip():
+            cleaned = candidate.replace("{{", "").replace("}}", "").strip()
+            _logger.debug(f"[Blueprint] Texto de fórmula encontrado: '{cleaned}'")
+            return cleaned
+
+    _logger.debug(
+        "[Blueprint] No se encontró texto visible en el nodo ni en sus descendientes."
+    )
+    return None
+
+
+def _style_from_attribute(style_str):
+    style_map = {}
+    for part in style_str.split(";"):
+        if ":" in part:
+            key, val = part.split(":", 1)
+            style_map[key.strip()] = val.strip()
+    return (
+        style_map.get("fill"),
+        style_map.get("font-size"),
+        style_map.get("font-family"),
+    )
+
+
+def style_from_node(node):
+    """
+    Busca atributos de estilo como fill, font-size y font-family en el nodo
+    o sus hijos. Si no están definidos como atributos directos, intenta
+    extraerlos del atributo 'style'.
+    """
+    fill = node.get("fill")
+    size = node.get("font-size")
+    family = node.get("font-family")
+
+    if not fill or not size or not family:
+        style_attr = node.get("style")
+        if style_attr:
+            fill_style, size_style, family_style = _style_from_attribute(style_attr)
+            fill = fill or fill_style
+            size = size or size_style
+            family = family or family_style
+
+    for child in node.iterdescendants():
+        if not fill or not size or not family:
+            style_attr = child.get("style")
+            if style_attr:
+                fill_style, size_style, family_style = _style_from_attribute(style_attr)
+                fill = fill or fill_style
+                size = size or size_style
+                family = family or family_style
+
+        fill = fill or child.get("fill")
+        size = size or child.get("font-size")
+        family = family or child.get("font-family")
+
+    _logger.debug(
+        f"[Blueprint] Estilos finales extraídos: fill={fill}, "
+        f"font-size={size}, font-family={family}"
+    )
+
+    return (fill or "#000000", size or "12px", family or "Arial")
+
+
+def extract_formulas(source, name_getter=formula_name_from_node):
+    """
+    Etiquetas de fórmula de un SVG, leído en streaming.
+
+    Se omiten los nodos sin nombre o sin ID y las etiquetas repetidas
+    (mismo nombre e ID de nodo).
+
+    Args:
+        source: Contenido en ``bytes``, ruta del archivo u objeto tipo
+            archivo abierto en binario.
+        name_getter (callable): Devuelve el nombre de fórmula de un nodo.
+
+    Returns:
+        list: Diccionarios con ``name``, ``svg_element_id``, ``fill_color``,
+        ``font_size`` y ``font_family``, en orden de documento.
+    """
+    formulas = []
+    seen = set()
+    node_count = 0
+    for node in iter_formula_nodes(source):
+        node_count += 1
+        formula_name = name_getter(node)
+        element_id = node.get("id")
+
+        _logger.debug(
+            "[Blueprint] Nodo analizado - fórmula: "
+            f"'{formula_name}' ID nodo: '{element_id}'"
+        )
+        if not formula_name:
+            _logger.info(
+                "[Blueprint] Nodo omitido - no se pudo "
+                "determinar un nombre de fórmula"
+            )
+            continue
+        if not element_id:
+            _logger.warning(
+                "[Blueprint] Nodo sin ID detectado. "
+                f"Se omite fórmula '{formula_name}'"
+            )
+            continue
+
+        key = (formula_name, element_id)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        fill_color, font_size, font_family = style_from_node(node)
+        formulas.append(
+            {
+                "name": formula_name,
+                "svg_element_id": element_id,
+                "fill_color": fill_color,
+                "font_size": font_size,
+                "font_family": font_family,
+            }
+        )
+
+    _logger.debug(
+        f"[Blueprint] Se encontraron {node_count} nodos con clase 'odoo-formula'"
+    )
+    return formulas
+
+
+def parse_blueprint_svg(job):
+    """
+    Analiza un SVG completo para importarlo como plano: etiquetas de fórmula,
+    copia optimizada y plantilla de renderizado precompilada.
+
+    Pensada para ejecutarse en un pool de procesos: recibe y devuelve solo
+    tipos serializables y nunca lanza excepciones, sino que informa del error.
+
+    Args:
+        job (tuple): (contenido del SVG en bytes, decimales de las coordenadas).
+
+    Returns:
+        dict: ``formulas``, ``optimized``, ``template``, ``checksum`` y
+        ``seconds``, o ``error`` y ``seconds`` si el SVG no es válido.
+    """
+    svg_data, precision = job
+    start = time.perf_counter()
+    try:
+        formulas = extract_formulas(io.BytesIO(svg_data))
+        optimized = optimize_svg(svg_data, precision)
+        template = compile_svg_template(optimized, formula_name_from_node)
+    except Exception as e:
+        return {"error": str(e), "seconds": time.perf_counter() - start}
+    return {
+        "formulas": formulas,
+        "optimized": optimized,
+        "template": dumps_template(template),
+        "checksum": hashlib.sha1(svg_data).hexdigest(),
+        "seconds": time.perf_counter() - start,
+    }
@@ -0,0 +1,367 @@
+import functools
+import logging
+import re
+
+from .svg_stream import (
+    SvgWriter,
+    attribute_prefix,
+    declared_namespaces,
+    iter_svg_events,
+    serialize_leaf,
+)
+
+_logger = logging.getLogger(__name__)
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+
+# Espacios de nombres de editores (Inkscape, Illustrator, Sketch...) que no
+# intervienen en el dibujo.
+EDITOR_NAMESPACES = (
+    "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+    "http://www.inkscape.org/namespaces/inkscape",
+    "http://ns.adobe.com/",
+    "http://www.bohemiancoding.com/sketch/ns",
+    "http://www.serif.com/",
+)
+
+NON_RENDERING_TAGS = {"metadata", "font", "font-face"}
+TEXT_CONTENT_TAGS = {"text", "tspan", "textPath", "style", "script"}
+GEOMETRY_ATTRIBUTES = {
+    "x",
+    "y",
+    "dx",
+    "dy",
+    "x1",
+    "y1",
+    "x2",
+    "y2",
+    "cx",
+    "cy",
+    "r",
+    "rx",
+    "ry",
+    "width",
+    "height",
+    "d",
+    "points",
+}
+# Las matrices y escalas de ``transform`` multiplican todo el dibujo, así que
+# se redondean con más decimales que las coordenadas (como hace svgo).
+TRANSFORM_ATTRIBUTES = {"transform", "gradientTransform", "patternTransform"}
+TRANSFORM_EXTRA_PRECISION = 2
+
+_NUMBER_RE = re.compile(r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?")
+_URL_REF_RE = re.compile(r"url\(\s*['\"]?#([^)'\"\s]+)")
+
+
+def _namespace(name):
+    return name[1:].split("}", 1)[0] if name.startswith("{") else ""
+
+
+def _local_name(name):
+    return name.rsplit("}", 1)[-1]
+
+
+@functools.lru_cache(maxsize=1024)
+def _is_editor_name(name):
+    namespace = _namespace(name)
+    return bool(namespace) and namespace.startswith(EDITOR_NAMESPACES)
+
+
+def _is_editor_content(elem):
+    """Nodos de editores o que no se dibujan (metadatos, fuentes SVG)."""
+    return _is_editor_name(elem.tag) or (
+        _namespace(elem.tag) in ("", SVG_NS)
+        and _local_name(elem.tag) in NON_RENDERING_TAGS
+    )
+
+
+def _is_formula(elem):
+    return "odoo-formula" in (elem.get("class") or "")
+
+
+def _format_number(value, precision):
+    text = f"{value:.{precision}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def round_numbers(value, precision):
+    """
+    Redondea los números decimales de un atributo a ``precision`` decimales.
+    Los enteros se dejan tal cual y se añade un separador cuando dos números
+    quedaban pegados (``1.5.5``).
+    """
+
+    def replace(match):
+        token = match.group(0)
+        if "." not in token and "e" not in token.lower():
+            return token
+        formatted = _format_number(float(token), precision)
+        start = match.start()
+        if start and (
+            match.string[start - 1].isdigit() or match.string[start - 1] == "."
+        ):
+            formatted = f" {formatted}"
+        return formatted
+
+    return _NUMBER_RE.sub(replace, value)
+
+
+def _round_geometry(attrib, precision):
+    for name in GEOMETRY_ATTRIBUTES.intersection(attrib):
+        value = attrib[name]
+        # Los arcos admiten banderas pegadas ("011") que no se pueden
+        # separar sin interpretar el comando completo.
+        if name == "d" and ("a" in value or "A" in value):
+            continue
+        attrib[name] = round_numbers(value, precision)
+    for name in TRANSFORM_ATTRIBUTES.intersection(attrib):
+        attrib[name] = round_numbers(
+            attrib[name], precision + TRANSFORM_EXTRA_PRECISION
+        )
+
+
+def _kept_attributes(elem):
+    return {
+        name: value for name, value in elem.attrib.items() if not _is_editor_name(name)
+    }
+
+
+def _references(name, value):
+    if name in (XLINK_HREF, "href") and value.startswith("#"):
+        return [value[1:]]
+    if "url(" in value:
+        return _URL_REF_RE.findall(value)
+    return []
+
+
+def _resolve_namespace(stack, prefix):
+    """Declaración (nodo, prefijo) a la que se refiere un prefijo en uso."""
+    for frame in reversed(stack):
+        if prefix in frame["namespaces"]:
+            return frame["ordinal"], prefix
+    return None
+
+
+def _analyze(source):
+    """
+    Primera pasada en streaming: decide qué se elimina sin construir el árbol.
+
+    Cada nodo de editor y cada definición con ID dentro de ``<defs>`` abre
+    una región con las referencias (``href`` y ``url(#...)``) y las
+    declaraciones de espacios de nombres que usan sus nodos. Las regiones
+    que contienen un nodo ``odoo-formula`` se conservan. Al terminar, las
+    definiciones sin referencias se eliminan hasta que no quede ninguna, como
+    con el árbol completo, pero recorriendo solo las regiones.
+
+    Returns:
+        tuple: (índices de los nodos eliminados, índices de los ancestros de
+        nodos de fórmula, declaraciones de espacios de nombres en uso y número
+        de definiciones eliminadas).
+    """
+    document = {"parent": None, "kind": None, "references": set(), "uses": set()}
+    regions = [document]
+    protected = set()
+    stack = []
+    ordinal = -1
+    formula_depth = 0
+    for event, elem in iter_svg_events(source, remove_comments=True):
+        if event == "start":
+            ordinal += 1
+            parent = stack[-1] if stack else None
+            region = parent["region"] if parent else 0
+            is_formula = _is_formula(elem)
+            if is_formula:
+                protected.update(frame["ordinal"] for frame in stack)
+            kind = None
+            if parent is not None and not formula_depth and not is_formula:
+                if _is_editor_content(elem):
+                    kind = "editor"
+                elif (
+                    parent["is_defs"]
+                    and elem.get("id")
+                    and _local_name(elem.tag) not in TEXT_CONTENT_TAGS
+                ):
+                    kind = "defs"
+            if kind:
+                regions.append(
+                    {
+                        "parent": region,
+                        "kind": kind,
+                        "ordinal": ordinal,
+                        "id": elem.get("id"),
+                        "references": set(),
+                        "uses": set(),
+                    }
+                )
+                region = len(regions) - 1
+            if is_formula:
+                formula_depth += 1
+            stack.append(
+                {
+                    "ordinal": ordinal,
+                    "region": region,
+                    "namespaces": declared_namespaces(elem),
+                    "is_defs": _local_name(elem.tag) == "defs"
+                    and _namespace(elem.tag) in ("", SVG_NS),
+                }
+            )
+
+            uses = regions[region]["uses"]
+            references = regions[region]["references"]
+            if _namespace(elem.tag):
+                uses.add(_resolve_namespace(stack, elem.prefix))
+            for name, value in _kept_attributes(elem).items():
+                if _namespace(name):
+                    uses.add(_resolve_namespace(stack, attribute_prefix(elem, name)))
+                references.update(_references(name, value))
+        elif event == "end":
+            frame = stack.pop()
+            region = regions[frame["region"]]
+            if _local_name(elem.tag) == "style" and elem.text:
+                region["references"].update(_URL_REF_RE.findall(elem.text))
+            if _is_formula(elem):
+                formula_depth -= 1
+            if (
+                region.get("ordinal") == frame["ordinal"]
+                and frame["ordinal"] in protected
+            ):
+                region["kind"] = None
+
+    removed = {
+        index for index, region in enumerate(regions) if region["kind"] == "editor"
+    }
+    removed_defs = 0
+    while True:
+        alive = []
+        for index, region in enumerate(regions):
+            parent = region["parent"]
+            alive.append(index not in removed and (parent is None or alive[parent]))
+        references = set().union(
+            *(
+                region["references"]
+                for index, region in enumerate(regions)
+                if alive[index]
+            )
+        )
+        unused = [
+            index
+            for index, region in enumerate(regions)
+            if alive[index]
+            and region["kind"] == "defs"
+            and region["id"] not in references
+        ]
+        if not unused:
+            break
+        removed.update(unused)
+        removed_defs += len(unused)
+
+    uses = set().union(
+        *(region["uses"] for index, region in enumerate(regions) if alive[index])
+    )
+    return (
+        {regions[index]["ordinal"] for index in removed},
+        protected,
+        uses,
+        removed_defs,
+    )
+
+
+def optimize_svg(source, precision=3):
+    """
+    Genera una copia ligera del SVG para renderizar.
+
+    Elimina el contenido que no se dibuja (metadatos, espacios de nombres y
+    atributos de editores, fuentes SVG incrustadas, comentarios, indentación
+    y definiciones sin referencias) y redondea las coordenadas a
+    ``precision`` decimales y las transformaciones a
+    ``precision + TRANSFORM_EXTRA_PRECISION``. Los nodos ``odoo-formula``,
+    sus descendientes y sus IDs se conservan intactos.
+
+    El SVG se lee dos veces en streaming (ver ``iter_svg_events``): la
+    primera pasada decide qué se elimina y la segunda escribe la copia, así
+    que la memoria no depende del tamaño del archivo sino de la copia
+    generada y del número de referencias entre definiciones.
+
+    Args:
+        source (bytes | str): Contenido del SVG original o ruta del archivo.
+        precision (int): Decimales de las coordenadas.
+
+    Returns:
+        bytes: SVG optimizado.
+    """
+    removed, protected, uses, removed_defs = _analyze(source)
+
+    writer = SvgWriter()
+    # Por cada nodo abierto: [índice, conserva los espacios, tiene hijos].
+    stack = []
+    pending = []
+    ordinal = -1
+    formula_depth = 0
+    skip = 0
+
+    def flush_text(frame, strip):
+        text = "".join(pending)
+        pending.clear()
+        if strip and not frame[1] and not text.strip():
+            return
+        writer.text(text)
+
+    for event, node in iter_svg_events(source, remove_comments=True):
+        if skip:
+            if event == "start":
+                ordinal += 1
+                skip += 1
+            elif event == "end":
+                skip -= 1
+            continue
+        if event == "text":
+            pending.append(node)
+            continue
+        if event == "end":
+            frame = stack.pop()
+            flush_text(frame, strip=frame[2])
+            writer.end(node)
+            if _is_formula(node):
+                formula_depth -= 1
+            continue
+
+        if event == "start":
+            ordinal += 1
+            if ordinal in removed:
+                skip = 1
+                continue
+        if stack:
+            flush_text(stack[-1], strip=True)
+            stack[-1][2] = True
+        if event == "leaf":
+            writer.raw(serialize_leaf(node))
+            continue
+
+        if _is_formula(node):
+            formula_depth += 1
+        attrib = _kept_attributes(node)
+        if stack and not formula_depth and ordinal not in protected:
+            _round_geometry(attrib, precision)
+        namespaces = {
+            prefix: uri
+            for prefix, uri in declared_namespaces(node).items()
+            if (ordinal, prefix) in uses
+        }
+        writer.start(node, namespaces, attrib)
+        keep_space = (stack and stack[-1][1]) or _local_name(
+            node.tag
+        ) in TEXT_CONTENT_TAGS
+        stack.append([ordinal, bool(keep_space), False])
+
+    optimized = b"<?xml version='1.0' encoding='utf-8'?>\n" + writer.take().encode(
+        "utf-8"
+    )
+    _logger.debug(
+        f"[Blueprint] SVG optimizado: {len(optimized)} bytes, "
+        f"{removed_defs} definiciones sin uso eliminadas."
+    )
+    return optimized
@@ -0,0 +1,306 @@
+import io
+import logging
+
+from lxml import etree
+
+_logger = logging.getLogger(__name__)
+
+FORMULA_CLASS = "odoo-formula"
+
+
+def open_source(source):
+    """Fuente para ``iterparse``: los ``bytes`` se envuelven en un buffer."""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+
+def _is_formula(elem):
+    return elem.get("class") == FORMULA_CLASS
+
+
+def _release(elem):
+    """Libera un subárbol ya procesado y los hermanos anteriores a él."""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is None:
+        return
+    while elem.getprevious() is not None:
+        del parent[0]
+
+
+def iter_formula_nodes(source):
+    """
+    Recorre un SVG en streaming y devuelve sus nodos ``odoo-formula``.
+
+    El documento se analiza con ``etree.iterparse``: solo se conserva el
+    subárbol del nodo de fórmula en curso y todo lo ya procesado se libera, de
+    modo que la memoria máxima depende del mayor nodo de fórmula y no del
+    tamaño del archivo. Los nodos se devuelven en orden de documento, igual
+    que ``//*[@class='odoo-formula']``, incluidos los anidados.
+
+    Cada nodo solo es válido hasta pedir el siguiente: se limpia en cuanto el
+    consumidor avanza.
+
+    Args:
+        source: Contenido en ``bytes``, ruta del archivo u objeto tipo
+            archivo abierto en binario.
+
+    Yields:
+        lxml.etree._Element: Nodo de fórmula con todos sus descendientes.
+    """
+    context = etree.iterparse(
+        open_source(source),
+        events=("start", "end"),
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+    )
+    open_formulas = 0
+    for event, elem in context:
+        if not isinstance(elem.tag, str):
+            continue
+        is_formula = _is_formula(elem)
+        if event == "start":
+            if is_formula:
+                open_formulas += 1
+            continue
+
+        if is_formula:
+            open_formulas -= 1
+            if open_formulas:
+                # Anidado: se devuelve junto a su nodo de fórmula exterior.
+                continue
+            yield from (
+                node for node in elem.iter(tag=etree.Element) if _is_formula(node)
+            )
+        elif open_formulas:
+            continue
+        _release(elem)
+    del context
+
+
+# --- Reescritura en streaming -----------------------------------------------
+
+XML_NS = "http://www.w3.org/XML/1998/namespace"
+
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\r": "&#13;"})
+_ATTRIBUTE_ESCAPES = str.maketrans(
+    {
+        "&": "&amp;",
+        "<": "&lt;",
+        ">": "&gt;",
+        '"': "&quot;",
+        "\n": "&#10;",
+        "\r": "&#13;",
+        "\t": "&#9;",
+    }
+)
+
+
+def declared_namespaces(elem):
+    """Espacios de nombres que declara el propio nodo: {prefijo: URI}."""
+    parent = elem.getparent()
+    inherited = parent.nsmap if parent is not None else {}
+    return {
+        prefix: uri
+        for prefix, uri in elem.nsmap.items()
+        if prefix not in inherited or inherited[prefix] != uri
+    }
+
+
+def attribute_prefix(elem, name):
+    """Prefijo con el que se escribe un atributo (``None`` si no tiene)."""
+    if not name.startswith("{"):
+        return None
+    uri = name[1:].split("}", 1)[0]
+    if uri == XML_NS:
+        return "xml"
+    for prefix, namespace in elem.nsmap.items():
+        if prefix and namespace == uri:
+            return prefix
+    return None
+
+
+def _qualified(prefix, name):
+    local = name.rsplit("}", 1)[-1]
+    return f"{prefix}:{local}" if prefix else local
+
+
+def element_name(elem):
+    return _qualified(elem.prefix, elem.tag)
+
+
+def start_tag(elem, namespaces, attrib):
+    """Etiqueta de apertura sin el ``>`` final."""
+    parts = [f"<{element_name(elem)}"]
+    for prefix, uri in namespaces.items():
+        name = f"xmlns:{prefix}" if prefix else "xmlns"
+        parts.append(f' {name}="{uri.translate(_ATTRIBUTE_ESCAPES)}"')
+    for name, value in attrib.items():
+        qualified = _qualified(attribute_prefix(elem, name), name)
+        parts.append(f' {qualified}="{value.translate(_ATTRIBUTE_ESCAPES)}"')
+    return "".join(parts)
+
+
+def serialize_leaf(node):
+    """Comentario o instrucción de procesamiento, sin su ``tail``."""
+    if node.tag is etree.Comment:
+        return f"<!--{node.text or ''}-->"
+    if node.tag is etree.ProcessingInstruction:
+        return f"<?{node.target} {node.text}?>" if node.text else f"<?{node.target}?>"
+    raise ValueError(f"Nodo no admitido: {node!r}")
+
+
+class SvgWriter:
+    """
+    Escritor incremental de XML. La etiqueta de apertura queda pendiente
+    hasta saber si el nodo tiene contenido, para cerrar los vacíos con
+    ``/>`` como ``etree.tostring``.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pending_start = False
+
+    def _close_start(self):
+        if self._pending_start:
+            self._chunks.append(">")
+            self._pending_start = False
+
+    def start(self, elem, namespaces, attrib):
+        self._close_start()
+        self._chunks.append(start_tag(elem, namespaces, attrib))
+        self._pending_start = True
+
+    def text(self, text):
+        if text:
+            self._close_start()
+            self._chunks.append(text.translate(_TEXT_ESCAPES))
+
+    def raw(self, markup):
+        self._close_start()
+        self._chunks.append(markup)
+
+    def end(self, elem):
+        if self._pending_start:
+            self._chunks.append("/>")
+            self._pending_start = False
+        else:
+            self._chunks.append(f"</{element_name(elem)}>")
+
+    def take(self):
+        """Devuelve lo escrito desde la última llamada y lo descarta."""
+        self._close_start()
+        output = "".join(self._chunks)
+        self._chunks = []
+        return output
+
+
+def serialize_element(elem):
+    """
+    Serializa un nodo completo (sin su ``tail``) en el contexto de su
+    documento: solo declara los espacios de nombres que no hereda.
+    """
+    writer = SvgWriter()
+    stack = [(elem, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            writer.end(node)
+            if node is not elem:
+                writer.text(node.tail)
+            continue
+        if not isinstance(node.tag, str):
+            writer.raw(serialize_leaf(node))
+            writer.text(node.tail)
+            continue
+        writer.start(node, declared_namespaces(node), node.attrib)
+        writer.text(node.text)
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(node))
+    return writer.take()
+
+
+def iter_svg_events(source, is_unit=None, remove_comments=False):
+    """
+    Recorre un SVG en streaming como una secuencia de eventos en orden de
+    documento, liberando cada nodo en cuanto se ha consumido su ``tail``, de
+    modo que la memoria no depende del tamaño del archivo.
+
+    Eventos:
+
+    * ``("start", elem)``: apertura de un nodo, con sus atributos.
+    * ``("text", texto)``: texto entre nodos (``text`` o ``tail``).
+    * ``("leaf", nodo)``: comentario, instrucción de procesamiento o nodo
+      completo para el que ``is_unit`` devuelve verdadero (con todos sus
+      descendientes, válido hasta pedir el siguiente evento).
+    * ``("end", elem)``: cierre de un nodo.
+
+    Se omiten los nodos fuera del elemento raíz.
+
+    Args:
+        source: Contenido en ``bytes``, ruta del archivo u objeto tipo
+            archivo abierto en binario.
+        is_unit (callable): Indica qué nodos se devuelven completos.
+        remove_comments (bool): Descarta los comentarios al analizar.
+    """
+    context = etree.iterparse(
+        open_source(source),
+        events=("start", "end", "comment", "pi"),
+        huge_tree=True,
+        resolve_entities=False,
+        no_network=True,
+        remove_comments=remove_comments,
+    )
+    # Por cada nodo abierto: [nodo, último hijo cuyo tail está pendiente].
+    stack = []
+    unit = None
+    unit_depth = 0
+
+    def pending_text(frame):
+        last = frame[1]
+        text = last.tail if last is not None else frame[0].text
+        if last is not None:
+            last.clear(keep_tail=False)
+            frame[0].remove(last)
+            frame[1] = None
+        return text
+
+    for event, node in context:
+        if unit is not None:
+            if event == "start":
+                unit_depth += 1
+            elif event == "end":
+                if unit_depth:
+                    unit_depth -= 1
+                    continue
+                yield "leaf", unit
+                stack[-1][1] = unit
+                unit = None
+            continue
+        if not stack and event != "start":
+            continue
+
+        if event == "end":
+            frame = stack.pop()
+            text = pending_text(frame)
+            if text:
+                yield "text", text
+            yield "end", node
+            if stack:
+                stack[-1][1] = node
+            continue
+
+        if stack:
+            text = pending_text(stack[-1])
+            if text:
+                yield "text", text
+        if event != "start":
+            yield "leaf", node
+            stack[-1][1] = node
+        elif stack and is_unit is not None and is_unit(node):
+            unit = node
+            unit_depth = 0
+        else:
+            yield "start", node
+            stack.append([node, None])
+    del context
@@ -0,0 +1,296 @@
+import json
+import logging
+from xml.sax.saxutils import escape
+
+from lxml import etree
+
+from .render_cache import BoundedLRUCache
+from .svg_stream import (
+    SvgWriter,
+    declared_namespaces,
+    iter_svg_events,
+    serialize_element,
+    serialize_leaf,
+)
+
+_logger = logging.getLogger(__name__)
+
+TEMPLATE_VERSION = 2
+
+ERROR_STYLE = """
+                .formula-eval-error {
+                    font-style: italic;
+                    text-decoration: underline;
+                }
+            """
+
+# Índices de renderizado por (plano, revisión del plano, versión de plantilla y
+# revisión de estilos).
+slot_index_cache = BoundedLRUCache("blueprint_slot_index", max_entries=256)
+
+
+def _escape_attr(value):
+    return escape(str(value), {'"': "&quot;"})
+
+
+def _node_style(elem):
+    """
+    Estilo propio del nodo (atributo ``style`` y, si faltan, atributos
+    directos ``fill``/``font-size``), tal y como lo interpretaba el renderizador.
+    """
+    font_size = None
+    fill_color = None
+    for attr in elem.get("style", "").split(";"):
+        if "font-size" in attr:
+            font_size = attr.split(":")[1].strip()
+        elif "fill" in attr:
+            fill_color = attr.split(":")[1].strip()
+    fill_color = fill_color or elem.get("fill")
+    font_size = font_size or elem.get("font-size")
+    return fill_color, font_size
+
+
+def _node_position(elem):
+    """Posición del nodo, usando el primer punto de ``d`` para los ``path``."""
+    x = elem.get("x", "0")
+    y = elem.get("y", "0")
+    if elem.tag.endswith("path") and "d" in elem.attrib:
+        try:
+            path_commands = elem.attrib["d"].split(" ")
+            coords = (
+                path_commands[1].split(",") if len(path_commands) > 1 else ["0", "0"]
+            )
+            x = coords[0]
+            y = coords[1]
+        except Exception:
+            _logger.debug(
+                f"[Blueprint] No se pudo obtener la posición de "
+                f"{elem.get('id', 'sin ID')}, usando (0,0)"
+            )
+    return x, y
+
+
+def _warning_markup(elem):
+    try:
+        x_float = float(elem.get("x", "0"))
+        y_float = float(elem.get("y", "0"))
+    except Exception:
+        x_float = 0
+        y_float = 0
+    return (
+        f'<text x="{x_float + 10}" y="{y_float}" fill="red" font-size="10px" '
+        'font-weight="bold">!</text>'
+    )
+
+
+def _is_formula(elem):
+    return "odoo-formula" in (elem.get("class") or "")
+
+
+def _error_style_element():
+    style_element = etree.Element("style")
+    style_element.text = ERROR_STYLE
+    return style_element
+
+
+def compile_svg_template(source, name_getter):
+    """
+    Precompila un SVG en una plantilla de huecos (slots).
+
+    El SVG se recorre una sola vez en streaming (ver ``iter_svg_events``) y
+    se escribe partido alrededor de cada nodo ``odoo-formula``, sin construir
+    el árbol completo: solo se conserva en memoria el nodo de fórmula en
+    curso. Para cada hueco se guardan el ID del elemento, el nombre de la
+    fórmula, la posición resuelta, el estilo propio del nodo y el marcado
+    original (normal y marcado como error), de forma que el renderizado
+    posterior sea un simple empalme de cadenas.
+
+    Args:
+        source (bytes | str): Contenido del SVG o ruta del archivo.
+        name_getter (callable): Devuelve el nombre de fórmula de un nodo.
+
+    Returns:
+        dict: Plantilla serializable a JSON.
+    """
+    writer = SvgWriter()
+    parts = []
+    slots = []
+    # Por cada nodo abierto: huecos de fórmula que son hijos directos suyos.
+    stack = []
+    style_pending = False
+
+    def flush_literal():
+        literal = writer.take()
+        if literal:
+            parts.append(literal)
+
+    # Los nodos anidados dentro de otro nodo de fórmula viajan con su padre.
+    for event, node in iter_svg_events(source, is_unit=_is_formula):
+        if event == "text":
+            writer.text(node)
+            continue
+        if style_pending and len(stack) == 1:
+            writer.raw(serialize_element(_error_style_element()))
+            style_pending = False
+
+        if event == "start":
+            writer.start(node, declared_namespaces(node), node.attrib)
+            stack.append([])
+            style_pending = len(stack) == 1
+        elif event == "end":
+            for index in stack.pop():
+                flush_literal()
+                parts.append(["warn", index])
+            writer.end(node)
+        elif not isinstance(node.tag, str):
+            writer.raw(serialize_leaf(node))
+        else:
+            index = len(slots)
+            fill_color, font_size = _node_style(node)
+            x, y = _node_position(node)
+            markup = serialize_element(node)
+            existing_class = node.get("class", "")
+            node.set("class", f"{existing_class} formula-eval-error".strip())
+            slots.append(
+                {
+                    "id": node.get("id", "sin ID"),
+                    "name": name_getter(node),
+                    "x": x,
+                    "y": y,
+                    "transform": node.get("transform", ""),
+                    "fill_color": fill_color,
+                    "font_size": font_size,
+                    "warning": _warning_markup(node),
+                    "markup": markup,
+                    "error_markup": serialize_element(node),
+                }
+            )
+            flush_literal()
+            parts.append(["elem", index])
+            stack[-1].append(index)
+    flush_literal()
+
+    _logger.debug(
+        f"[Blueprint] Plantilla compilada con {len(slots)} huecos y "
+        f"{len(parts)} fragmentos."
+    )
+    return {"version": TEMPLATE_VERSION, "parts": parts, "slots": slots}
+
+
+def dumps_template(template):
+    return json.dumps(template, separators=(",", ":"))
+
+
+def loads_template(template_json):
+    template = json.loads(template_json) if template_json else None
+    if not template or template.get("version") != TEMPLATE_VERSION:
+        return None
+    return template
+
+
+def format_value(value):
+    """Redondea el valor evaluado como lo muestra el plano."""
+    try:
+        return str(round(float(value)))
+    except (ValueError, OverflowError):
+        return str(value)
+
+
+def build_slot_index(template, formula_styles):
+    """
+    Índice de renderizado de un plano: resuelve de una vez, para cada hueco,
+    el estilo final (configurado en la fórmula o propio del nodo) y la
+    etiqueta ``<text>`` de apertura, de modo que renderizar cada nodo sea
+    una consulta de diccionario y un empalme de cadenas.
+
+    El índice solo depende de la plantilla y de los estilos de las
+    fórmulas, así que puede reutilizarse mientras no cambie la revisión del
+    plano.
+
+    Args:
+        template (dict): Plantilla devuelta por ``compile_svg_template``.
+        formula_styles (dict): {ID de nodo SVG: (fill_color, font_size)}
+            configurados en las fórmulas del plano.
+
+    Returns:
+        dict: ``parts`` de la plantilla y ``slots`` con ``open_tag``.
+    """
+    slots = []
+    for slot in template["slots"]:
+        configured_fill, configured_size = formula_styles.get(slot["id"], (None, None))
+        font_size = configured_size or slot["font_size"] or "12px"
+        fill_color = configured_fill or slot["fill_color"] or "#000000"
+        final_style = f"fill:{fill_color}; font-size:{font_size};"
+        slots.append(
+            {
+                "name": slot["name"],
+                "markup": slot["markup"],
+                "error_markup": slot["error_markup"],
+                "warning": slot["warning"],
+                "open_tag": (
+                    f'<text x="{_escape_attr(slot["x"])}" '
+                    f'y="{_escape_attr(slot["y"])}" '
+                    f'style="{_escape_attr(final_style)}" '
+                    f'transform="{_escape_attr(slot["transform"])}">'
+                ),
+            }
+        )
+    return {"parts": template["parts"], "slots": slots}
+
+
+def render_slot_index(index, evaluated_values):
+    """
+    Empalma los valores evaluados en un índice de ``build_slot_index``.
+
+    Args:
+        index (dict): Índice de renderizado del plano.
+        evaluated_values (dict): {nombre de fórmula: valor evaluado}.
+
+    Returns:
+        str: SVG evaluado.
+    """
+    slot_output = []
+    warnings = []
+    for slot in index["slots"]:
+        name = slot["name"]
+        if name not in evaluated_values:
+            slot_output.append(slot["markup"])
+            warnings.append("")
+            continue
+
+        rounded_value = format_value(evaluated_values[name])
+        if rounded_value.lower() == "error":
+            slot_output.append(slot["error_markup"])
+            warnings.append(slot["warning"])
+            continue
+
+        slot_output.append(f"{slot['open_tag']}{escape(rounded_value)}</text>")
+        warnings.append("")
+
+    output = []
+    for part in index["parts"]:
+        if isinstance(part, str):
+            output.append(part)
+        elif part[0] == "elem":
+            output.append(slot_output[part[1]])
+        else:
+            output.append(warnings[part[1]])
+    return "".join(output)
+
+
+def render_svg_template(template, evaluated_values, formula_styles):
+    """
+    Empalma los valores evaluados en una plantilla compilada.
+
+    Args:
+        template (dict): Plantilla devuelta por ``compile_svg_template``.
+        evaluated_values (dict): {nombre de fórmula: valor evaluado}.
+        formula_styles (dict): {ID de nodo SVG: (fill_color, font_size)}
+            configurados en las fórmulas del plano.
+
+    Returns:
+        str: SVG evaluado.
+    """
+    return render_slot_index(
+        build_slot_index(template, formula_styles), evaluated_values
+    )
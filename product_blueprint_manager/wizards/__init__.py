@@ -0,0 +1 @@
+from . import product_blueprint_import
@@ -0,0 +1,382 @@
+import base64
+import csv
+import io
+import logging
+import os
+import posixpath
+import time
+import zipfile
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+from odoo import Command, _, api, fields, models
+from odoo.exceptions import UserError
+
+from ..tools.process_pool import map_in_process_pool
+from ..tools.standalone import STANDALONE_INITIALIZER, load_standalone_tools
+from ..tools.svg_formulas import parse_blueprint_svg
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = {"file", "product"}
+VALUE_SEPARATOR = "|"
+
+
+class ProductBlueprintImport(models.TransientModel):
+    _name = "product.blueprint.import"
+    _description = "Importación Masiva de Planos"
+
+    zip_file = fields.Binary(
+        "Archivo ZIP",
+        required=True,
+        help=(
+            "ZIP con los SVG y un manifest.csv con las columnas: file, product "
+            "(referencia interna o nombre de la plantilla), y opcionalmente "
+            "name, type_blueprint, render_mode, attribute y attribute_values "
+            "(valores separados por '|')."
+        ),
+    )
+    zip_filename = fields.Char("Nombre del Archivo")
+    workers = fields.Integer(
+        "Procesos",
+        default=lambda self: self._get_max_workers(),
+        help=(
+            "Procesos en paralelo para analizar los SVG (0 o 1 = en serie). "
+            "Nunca se usan más de los indicados en el parámetro "
+            "product_blueprint_manager.import_workers ni más que CPUs."
+        ),
+    )
+    state = fields.Selection(
+        [("draft", "Borrador"), ("done", "Importado")],
+        default="draft",
+        required=True,
+    )
+    imported_count = fields.Integer("Planos Importados", readonly=True)
+    error_count = fields.Integer("Archivos con Errores", readonly=True)
+    result_log = fields.Text("Resultado", readonly=True)
+
+    def _open_archive(self):
+        try:
+            return zipfile.ZipFile(io.BytesIO(base64.b64decode(self.zip_file)))
+        except zipfile.BadZipFile as e:
+            raise UserError(_("El archivo no es un ZIP válido.")) from e
+
+    def _get_max_member_bytes(self):
+        """Tamaño máximo descomprimido de cada archivo del ZIP, en bytes."""
+        try:
+            max_mb = float(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("product_blueprint_manager.import_max_member_mb", 500)
+            )
+        except ValueError:
+            _logger.warning(
+                "[Blueprint][Import] Tamaño máximo de los archivos del ZIP no "
+                "válido, se usan 500 MB."
+            )
+            max_mb = 500
+        return int(max_mb * 1024 * 1024)
+
+    def _read_member(self, archive, name):
+        """
+        Contenido de un archivo del ZIP, rechazando los que superan
+        ``product_blueprint_manager.import_max_member_mb`` antes de
+        descomprimirlos.
+
+        Raises:
+            UserError: Si el archivo es demasiado grande.
+        """
+        max_bytes = self._get_max_member_bytes()
+        info = archive.getinfo(name)
+        if info.file_size > max_bytes:
+            raise UserError(
+                _(
+                    "El archivo ocupa %(size).1f MB descomprimido y el máximo "
+                    "permitido es %(max).1f MB.",
+                    size=info.file_size / 1024 / 1024,
+                    max=max_bytes / 1024 / 1024,
+                )
+            )
+        return archive.read(info)
+
+    @api.model
+    def _get_max_workers(self):
+        """
+        Procesos máximos para analizar el ZIP: el parámetro
+        ``product_blueprint_manager.import_workers``, sin superar las CPUs.
+        """
+        try:
+            workers = int(
+                self.env["ir.config_parameter"]
+                .sudo()
+                .get_param("product_blueprint_manager.import_workers", 4)
+            )
+        except ValueError:
+            _logger.warning(
+                "[Blueprint][Import] Número de procesos no válido, se analiza "
+                "en serie."
+            )
+            workers = 0
+        return max(min(workers, os.cpu_count() or 1), 0)
+
+    def _get_parse_settings(self):
+        """Procesos y tiempo máximo por SVG para analizar el ZIP."""
+        _workers, timeout = self.env["sale.order"]._get_raster_settings()
+        return min(self.workers, self._get_max_workers()), timeout
+
+    def _read_manifest(self, archive):
+        """Filas del manifiesto, con las claves y valores sin espacios."""
+        members = [
+            name
+            for name in archive.namelist()
+            if posixpath.basename(name).lower() == MANIFEST_NAME
+        ]
+        if not members:
+            raise UserError(_("El ZIP no contiene el manifiesto %s.", MANIFEST_NAME))
+        content = self._read_member(archive, min(members, key=len)).decode("utf-8-sig")
+        reader = csv.DictReader(io.StringIO(content))
+        missing = MANIFEST_COLUMNS - set(reader.fieldnames or [])
+        if missing:
+            raise UserError(
+                _(
+                    "Faltan columnas en el manifiesto: %s",
+                    ", ".join(sorted(missing)),
+                )
+            )
+        return [
+            {(key or "").strip(): (value or "").strip() for key, value in row.items()}
+            for row in reader
+        ]
+
+    def _resolve_references(self, rows):
+        """
+        Resuelve en bloque las plantillas de producto, atributos y valores
+        citados en el manifiesto, y los planos que ya existen.
+        """
+        product_refs = {row["product"] for row in rows if row["product"]}
+        templates = self.env["product.template"].search(
+            [
+                "|",
+                ("default_code", "in", list(product_refs)),
+                ("name", "in", list(product_refs)),
+            ]
+        )
+        products = {}
+        for template in templates:
+            products.setdefault(template.name, template)
+        for template in templates.filtered("default_code"):
+            products[template.default_code] = template
+
+        attribute_names = {row.get("attribute") for row in rows} - {"", None}
+        attributes = {
+            attribute.name: attribute
+            for attribute in self.env["product.attribute"].search(
+                [("name", "in", list(attribute_names))]
+            )
+        }
+        values = {
+            (value.attribute_id.id, value.name): value
+            for value in self.env["product.attribute.value"].search(
+                [("attribute_id", "in", [a.id for a in attributes.values()])]
+            )
+        }
+        existing = {
+            (blueprint.product_id.id, blueprint.name)
+            for blueprint in self.env["product.blueprint"].search(
+                [("product_id", "in", templates.ids)]
+            )
+        }
+        return products, attributes, values, existing
+
+    def _prepare_blueprint_vals(self, row, references, seen):
+        """
+        Valores de creación del plano de una fila del manifiesto.
+
+        Raises:
+            UserError: Si la fila no es válida.
+        """
+        products, attributes, values, existing = references
+        Blueprint = self.env["product.blueprint"]
+
+        product = products.get(row["product"])
+        if not product:
+            raise UserError(_("Producto no encontrado: %s", row["product"]))
+
+        name = row.get("name") or posixpath.splitext(posixpath.basename(row["file"]))[0]
+        key = (product.id, name)
+        if key in existing or key in seen:
+            raise UserError(
+                _("Ya existe un plano '%s' para el producto %s.", name, product.name)
+            )
+
+        type_blueprint = row.get("type_blueprint") or "manufacturing"
+        render_mode = row.get("render_mode") or "vector"
+        for field_name, value in (
+            ("type_blueprint", type_blueprint),
+            ("render_mode", render_mode),
+        ):
+            allowed = Blueprint._fields[field_name].get_values(self.env)
+            if value not in allowed:
+                raise UserError(
+                    _(
+                        "Valor '%(value)s' no válido para %(field)s.",
+                        value=value,
+                        field=field_name,
+                    )
+                )
+
+        vals = {
+            "name": name,
+            "product_id": product.id,
+            "type_blueprint": type_blueprint,
+            "render_mode": render_mode,
+        }
+        if row.get("attribute"):
+            attribute = attributes.get(row["attribute"])
+            if not attribute:
+                raise UserError(_("Atributo no encontrado: %s", row["attribute"]))
+            value_ids = []
+            for value_name in filter(
+                None,
+                (
+                    v.strip()
+                    for v in row.get("attribute_values", "").split(VALUE_SEPARATOR)
+                ),
+            ):
+                value = values.get((attribute.id, value_name))
+                if not value:
+                    raise UserError(
+                        _(
+                            "Valor '%(value)s' no encontrado en el atributo "
+                            "%(attribute)s.",
+                            value=value_name,
+                            attribute=attribute.name,
+                        )
+                    )
+                value_ids.append(value.id)
+            vals["attribute_filter_id"] = attribute.id
+            vals["attribute_value_ids"] = [Command.set(value_ids)]
+        seen.add(key)
+        return vals
+
+    def action_import(self):
+        """
+        Importa los planos del ZIP: valida el manifiesto, analiza los SVG (en
+        serie o, si se configura, en un pool de procesos) y crea planos y
+        etiquetas de fórmula con ``create`` por lotes en la misma transacción.
+        """
+        self.ensure_one()
+        start = time.perf_counter()
+        archive = self._open_archive()
+        rows = self._read_manifest(archive)
+        references = self._resolve_references(rows)
+        member_names = set(archive.namelist())
+
+        log_lines = []
+        errors = 0
+        jobs = []
+        seen = set()
+        for row in rows:
+            file_name = row["file"]
+            try:
+                if file_name not in member_names:
+                    raise UserError(_("El archivo no está en el ZIP."))
+                svg_data = self._read_member(archive, file_name)
+                vals = self._prepare_blueprint_vals(row, references, seen)
+            except UserError as e:
+                errors += 1
+                log_lines.append(f"{file_name}: ERROR - {e.args[0]}")
+                continue
+            jobs.append((file_name, vals, svg_data))
+
+        precision = self.env["product.blueprint"]._get_svg_precision()
+        workers, timeout = self._get_parse_settings()
+        parse = parse_blueprint_svg
+        if workers > 1 and len(jobs) > 1:
+            # Los hijos arrancan con "spawn" y cargan solo el paquete tools,
+            # sin Odoo, así que no heredan hilos, bloqueos ni cursores.
+            parse = load_standalone_tools().svg_formulas.parse_blueprint_svg
+        parse_start = time.perf_counter()
+        try:
+            results = map_in_process_pool(
+                parse,
+                [(svg_data, precision) for _name, _vals, svg_data in jobs],
+                workers=workers,
+                timeout=timeout,
+                initializer=STANDALONE_INITIALIZER[0],
+                initargs=STANDALONE_INITIALIZER[1],
+            )
+        except FuturesTimeoutError as e:
+            raise UserError(
+                _(
+                    "El análisis de un SVG superó %s segundos. Revisa los "
+                    "archivos del ZIP o aumenta "
+                    "product_blueprint_manager.raster_timeout.",
+                    timeout,
+                )
+            ) from e
+        parse_seconds = time.perf_counter() - parse_start
+
+        blueprint_vals = []
+        formulas_by_index = []
+        for (file_name, vals, svg_data), result in zip(jobs, results):
+            if result.get("error"):
+                errors += 1
+                log_lines.append(
+                    f"{file_name}: ERROR - SVG no válido: {result['error']} "
+                    f"({result['seconds']:.3f} s)"
+                )
+                continue
+            vals.update(
+                {
+                    "file": base64.b64encode(svg_data),
+                    "optimized_file": base64.b64encode(result["optimized"]),
+                    "render_template": result["template"],
+                    # Con el checksum ya guardado, ``create`` no vuelve a
+                    # extraer las fórmulas del SVG.
+                    "file_checksum": result["checksum"],
+                }
+            )
+            blueprint_vals.append(vals)
+            formulas_by_index.append(result["formulas"])
+            log_lines.append(
+                f"{file_name}: OK - {len(result['formulas'])} etiquetas "
+                f"({result['seconds']:.3f} s)"
+            )
+
+        blueprints = self.env["product.blueprint"].create(blueprint_vals)
+        self.env["product.blueprint.formula.name"].create(
+            [
+                {
+                    "name": formula["name"],
+                    "svg_element_id": formula["svg_element_id"],
+                    "blueprint_id": blueprint.id,
+                    "fill_color": formula["fill_color"],
+                    "font_size": formula["font_size"],
+                }
+                for blueprint, formulas in zip(blueprints, formulas_by_index)
+                for formula in formulas
+            ]
+        )
+
+        total_seconds = time.perf_counter() - start
+        summary = (
+            f"{len(blueprints)} planos importados, {errors} con errores. "
+            f"Análisis: {parse_seconds:.2f} s, total: {total_seconds:.2f} s."
+        )
+        _logger.info(f"[Blueprint][Import] {summary}")
+        self.write(
+            {
+                "state": "done",
+                "imported_count": len(blueprints),
+                "error_count": errors,
+                "result_log": "\n".join([summary, ""] + log_lines),
+            }
+        )
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": self.id,
+            "view_mode": "form",
+            "target": "new",
+        }
@@ -0,0 +1,45 @@
+from odoo import _, http
+from odoo.exceptions import UserError
+from odoo.http import request
+
+
+class AttributePriceQuoteController(http.Controller):
+    @http.route(
+        "/product_configurator_attribute_price/quote",
+        type="json",
+        auth="user",
+        methods=["POST"],
+    )
+    def quote_configured_prices(self, configurations):
+        """
+        Precios de una lista de configuraciones, sin crear líneas de pedido.
+
+        Args:
+            configurations (list): Diccionarios con ``product_id``,
+                ``custom_values`` ({id de valor de atributo de plantilla:
+                valor personalizado}) y ``no_variant_value_ids``.
+
+        Returns:
+            dict: ``{"prices": [...]}`` en el mismo orden.
+
+        Raises:
+            UserError: Si ``configurations`` no es una lista de diccionarios.
+        """
+        if not isinstance(configurations, list) or not all(
+            isinstance(configuration, dict) for configuration in configurations
+        ):
+            raise UserError(
+                _("Las configuraciones deben ser una lista de diccionarios.")
+            )
+        return {
+            "prices": request.env["product.product"].quote_configured_prices(
+                [
+                    (
+                        configuration.get("product_id"),
+                        configuration.get("custom_values"),
+                        configuration.get("no_variant_value_ids"),
+                    )
+                    for configuration in configurations
+                ]
+            )
+        }
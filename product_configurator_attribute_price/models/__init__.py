@@ -1 +1,6 @@
-from . import product_template_attribute_value, sale_order_line
+from . import (
+    product_product,
+    product_template,
+    product_template_attribute_value,
+    sale_order_line,
+)
@@ -0,0 +1,90 @@
+import logging
+
+from odoo import _, api, models
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductProduct(models.Model):
+    _inherit = "product.product"
+
+    @api.model
+    def quote_configured_prices(self, configurations):
+        """
+        Calcula en bloque el precio de varias configuraciones de producto sin
+        crear líneas de pedido, con el mismo cálculo que ``price_unit``.
+
+        Los productos y valores de atributo de todas las configuraciones se
+        leen de una vez y las fórmulas compiladas se comparten entre ellas.
+
+        Args:
+            configurations (list): Tuplas (id de producto, {id de valor de
+                atributo de plantilla: valor personalizado}, [ids de valores
+                de atributo sin variante]).
+
+        Returns:
+            list: Precio de cada configuración, en el mismo orden, o None si
+            el producto no existe.
+
+        Raises:
+            UserError: Si alguna configuración no tiene el formato esperado.
+        """
+        parsed = []
+        product_ids = set()
+        value_ids = set()
+        try:
+            for product_id, custom_values, no_variant_value_ids in configurations:
+                custom = {
+                    int(value_id): value
+                    for value_id, value in (custom_values or {}).items()
+                }
+                no_variant = [int(value_id) for value_id in no_variant_value_ids or []]
+                parsed.append((int(product_id), custom, no_variant))
+                product_ids.add(int(product_id))
+                value_ids.update(custom, no_variant)
+        except (TypeError, ValueError, AttributeError) as e:
+            raise UserError(_("Configuración de producto no válida: %s", e)) from e
+
+        # Precarga en bloque de todo lo que se lee después por configuración
+        products = self.browse(sorted(product_ids)).exists()
+        products.mapped("lst_price")
+        PriceAttributeValue = self.env["product.template.attribute.value"]
+        attribute_values = PriceAttributeValue.browse(sorted(value_ids)).exists()
+        attribute_values.mapped("product_tmpl_id")
+        # Un plan de precios por plantilla para todo el lote.
+        plans = products.product_tmpl_id._get_pricing_plans()
+
+        products_by_id = {product.id: product for product in products}
+        values_by_id = {value.id: value for value in attribute_values}
+        prices = []
+        for product_id, custom, no_variant in parsed:
+            product = products_by_id.get(product_id)
+            if not product:
+                prices.append(None)
+                continue
+            template_id = product.product_tmpl_id.id
+            prices.append(
+                PriceAttributeValue._get_configured_price(
+                    product.product_tmpl_id,
+                    product.lst_price,
+                    [
+                        (values_by_id[value_id], value)
+                        for value_id, value in custom.items()
+                        if value_id in values_by_id
+                        and values_by_id[value_id].product_tmpl_id.id == template_id
+                    ],
+                    PriceAttributeValue.browse(
+                        [
+                            value_id
+                            for value_id in no_variant
+                            if value_id in values_by_id
+                            and values_by_id[value_id].product_tmpl_id.id == template_id
+                        ]
+                    ),
+                    label=f"[Quote {product_id}]",
+                    plan=plans[template_id],
+                )
+            )
+        _logger.debug(f"Precios calculados para {len(prices)} configuraciones")
+        return prices
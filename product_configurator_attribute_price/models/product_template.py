@@ -0,0 +1,140 @@
+import logging
+
+from odoo import models, tools
+
+from .product_template_attribute_value import (
+    STEP_CUSTOM_EXTRA,
+    STEP_CUSTOM_FORMULA,
+    STEP_EXTRA,
+    STEP_RUNNING_FORMULA,
+    formula_variables,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductTemplate(models.Model):
+    _inherit = "product.template"
+
+    def _get_pricing_plan(self):
+        """
+        Plan de precios compilado de la plantilla: la lista ordenada de pasos
+        que ``_get_configured_price`` aplica en una sola pasada.
+
+        Cada paso es una tupla (tipo, id del valor de atributo, nombre,
+        fórmula compilada, price_extra). Las fórmulas se clasifican según las
+        variables que usan de verdad (AST), no por búsqueda de texto:
+
+        - ``STEP_CUSTOM_FORMULA``: usan ``custom_value``; se aplican a los
+          valores personalizados de la configuración.
+        - ``STEP_RUNNING_FORMULA``: usan ``price_so_far`` pero no
+          ``custom_value``; se aplican a los valores sin variante.
+        - ``STEP_CUSTOM_EXTRA`` / ``STEP_EXTRA``: ``price_extra`` de los
+          valores personalizados y de los valores sin variante.
+
+        El plan se cachea por plantilla y firma de sus valores de atributo
+        (ver ``_get_pricing_plan_signatures``), así que crear, borrar o
+        cambiar la fórmula o el incremento fijo de un valor da una clave nueva
+        sin vaciar ninguna caché.
+
+        Para calcular muchos precios, ``_get_pricing_plans`` resuelve los
+        planes de todas las plantillas con una sola consulta.
+
+        Returns:
+            tuple: Pasos del plan.
+        """
+        self.ensure_one()
+        return self._get_pricing_plans()[self.id]
+
+    def _get_pricing_plans(self):
+        """
+        Planes de precios de estas plantillas (ver ``_get_pricing_plan``),
+        con una sola consulta de firmas para todas.
+
+        Returns:
+            dict: {id de plantilla: pasos del plan}
+        """
+        signatures = self._get_pricing_plan_signatures()
+        return {
+            template.id: template._build_pricing_plan(signatures[template.id])
+            for template in self
+        }
+
+    def _get_pricing_plan_signatures(self):
+        """
+        Firma barata de los valores de atributo de cada plantilla: cuántos
+        hay, su última modificación y un resumen de sus fórmulas e
+        incrementos fijos (que cubre también los cambios hechos en la misma
+        transacción).
+
+        Returns:
+            dict: {id de plantilla: firma de sus valores de atributo}
+        """
+        signatures = dict.fromkeys(self.ids, (0, None, None))
+        if not self.ids:
+            return signatures
+        self.env["product.template.attribute.value"].flush_model(
+            ["product_tmpl_id", "price_formula", "price_extra"]
+        )
+        self.env.cr.execute(
+            """
+            SELECT product_tmpl_id,
+                   count(*),
+                   max(write_date),
+                   md5(string_agg(
+                       id || ':' || coalesce(price_formula, '') || ':'
+                           || coalesce(price_extra, 0),
+                       ',' ORDER BY id
+                   ))
+            FROM product_template_attribute_value
+            WHERE product_tmpl_id IN %s
+            GROUP BY product_tmpl_id
+            """,
+            (tuple(self.ids),),
+        )
+        for template_id, *signature in self.env.cr.fetchall():
+            signatures[template_id] = tuple(signature)
+        return signatures
+
+    @tools.ormcache("self.id", "signature")
+    def _build_pricing_plan(self, signature):
+        """Construye el plan de ``_get_pricing_plan`` para una firma dada."""
+        values = (
+            self.env["product.template.attribute.value"]
+            .sudo()
+            .with_context(active_test=False)
+            .search([("product_tmpl_id", "=", self.id)])
+        )
+        custom_formulas = []
+        running_formulas = []
+        for value in values.filtered("price_formula"):
+            try:
+                variables = formula_variables(value.price_formula)
+                code = value._compile_price_formula(value.price_formula)
+            except SyntaxError as e:
+                _logger.warning(
+                    f"Invalid price formula for attribute '{value.name}' "
+                    f"ignored: {e}"
+                )
+                continue
+            step = (value.id, value.name, code, 0.0)
+            if "custom_value" in variables:
+                custom_formulas.append((STEP_CUSTOM_FORMULA, *step))
+            elif "price_so_far" in variables:
+                running_formulas.append((STEP_RUNNING_FORMULA, *step))
+
+        extras = values.filtered("price_extra")
+        plan = (
+            custom_formulas
+            + running_formulas
+            + [
+                (STEP_CUSTOM_EXTRA, value.id, value.name, None, value.price_extra)
+                for value in extras
+            ]
+            + [
+                (STEP_EXTRA, value.id, value.name, None, value.price_extra)
+                for value in extras
+            ]
+        )
+        _logger.debug(f"Pricing plan for template {self.id}: {len(plan)} steps")
+        return tuple(plan)
@@ -2,11 +2,35 @@ import ast
 import logging
 import math
 
-from odoo import _, fields, models
+from odoo import _, api, fields, models, tools
 from odoo.exceptions import ValidationError
 
 _logger = logging.getLogger(__name__)
 
+# Names available to price formulas: both ``math.ceil(...)`` and ``ceil(...)``
+# are accepted. Built once and shared by every evaluation.
+PRICE_FORMULA_GLOBALS = {
+    "__builtins__": {},
+    "math": math,
+    **{k: v for k, v in math.__dict__.items() if not k.startswith("__")},
+}
+
+# Pasos de un plan de precios (ver ``product.template._get_pricing_plan``),
+# en el orden en que se aplican.
+STEP_CUSTOM_FORMULA = "custom_formula"
+STEP_RUNNING_FORMULA = "running_formula"
+STEP_CUSTOM_EXTRA = "custom_extra"
+STEP_EXTRA = "extra"
+
+
+def formula_variables(expression):
+    """Nombres de variable que usa una fórmula de precio, según su AST."""
+    return frozenset(
+        node.id
+        for node in ast.walk(ast.parse(expression, mode="eval"))
+        if isinstance(node, ast.Name)
+    )
+
 
 class ProductTemplateAttributeValue(models.Model):
     """
@@ -25,16 +49,118 @@ class ProductTemplateAttributeValue(models.Model):
         ),
     )
 
+    @api.constrains("price_formula")
+    def _check_price_formula(self):
+        for value in self.filtered("price_formula"):
+            try:
+                value._compile_price_formula(value.price_formula)
+            except SyntaxError as e:
+                raise ValidationError(
+                    _(
+                        "Invalid price formula for attribute '%(name)s': %(error)s",
+                        name=value.name,
+                        error=e,
+                    )
+                ) from e
+
+    @tools.ormcache("self.id", "expression")
+    def _compile_price_formula(self, expression):
+        """Compile the formula once per attribute value and formula text."""
+        _logger.debug(f"Compiling price formula for attribute {self.name}")
+        tree = ast.parse(expression, mode="eval")
+        return compile(tree, "<price_formula>", "eval")
+
     def _safe_eval(self, expression, variables):
         """Evaluate the formula expression in a safe environment."""
-        allowed_names = {
-            k: v for k, v in math.__dict__.items() if not k.startswith("__")
+        code = self._compile_price_formula(expression)
+        return eval(code, PRICE_FORMULA_GLOBALS, dict(variables))
+
+    @api.model
+    def _get_configured_price(
+        self,
+        product_template,
+        base_price,
+        custom_values,
+        no_variant_values,
+        label="",
+        plan=None,
+    ):
+        """
+        Calcula el precio de una configuración de producto aplicando en una
+        sola pasada el plan de precios de su plantilla: fórmulas sobre
+        ``custom_value``, fórmulas sobre ``price_so_far`` e incrementos fijos
+        (``price_extra``), en este orden.
+
+        Es el mismo cálculo para las líneas de pedido y para los presupuestos
+        en bloque, y no escribe nada.
+
+        Args:
+            product_template (product.template): Plantilla del producto.
+            base_price (float): Precio inicial (``lst_price`` del producto).
+            custom_values (list): Pares (valor de atributo de plantilla,
+                valor personalizado introducido).
+            no_variant_values (recordset): Valores de atributo sin variante.
+            label (str): Prefijo de los mensajes de log (p. ej. la línea).
+            plan (tuple): Plan de precios de la plantilla, si el llamador ya
+                lo ha resuelto para todo el lote (ver
+                ``product.template._get_pricing_plans``).
+
+        Returns:
+            float: Precio final.
+        """
+        custom_by_value = {
+            attribute_value.id: custom_value
+            for attribute_value, custom_value in custom_values
+            if attribute_value
         }
-        allowed_names.update(variables)
+        no_variant_ids = set(no_variant_values.ids)
+        price_so_far = base_price
+        if plan is None:
+            plan = product_template._get_pricing_plan()
+
+        for kind, value_id, name, code, price_extra in plan:
+            if kind == STEP_CUSTOM_EXTRA or kind == STEP_EXTRA:
+                selected = (
+                    custom_by_value if kind == STEP_CUSTOM_EXTRA else no_variant_ids
+                )
+                if value_id in selected:
+                    price_so_far += price_extra
+                    _logger.debug(
+                        "%s Incremento por price_extra (%s): %s",
+                        label,
+                        name,
+                        price_extra,
+                    )
+                continue
+
+            if kind == STEP_CUSTOM_FORMULA and value_id not in custom_by_value:
+                continue
+            if kind == STEP_RUNNING_FORMULA and value_id not in no_variant_ids:
+                continue
+            try:
+                variables = {"price_so_far": price_so_far}
+                if kind == STEP_CUSTOM_FORMULA:
+                    variables["custom_value"] = float(custom_by_value[value_id] or 0)
+                increment = eval(code, PRICE_FORMULA_GLOBALS, variables)
+                if increment < 0:
+                    increment = 0
+                price_so_far += increment
+                _logger.debug(
+                    "%s Incremento por %s (%s): %s",
+                    label,
+                    "custom_value" if kind == STEP_CUSTOM_FORMULA else "price_so_far",
+                    name,
+                    increment,
+                )
+            except Exception as e:
+                _logger.exception(
+                    "%s Error al evaluar la fórmula para %s: %s",
+                    label,
+                    name,
+                    e,
+                )
 
-        tree = ast.parse(expression, mode="eval")
-        compiled = compile(tree, "<string>", "eval")
-        return eval(compiled, {"__builtins__": {}}, allowed_names)
+        return price_so_far
 
     def calculate_price_increment(self, custom_value, price_so_far):
         """
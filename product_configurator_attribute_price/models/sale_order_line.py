@@ -1,5 +1,4 @@
 import logging
-import math
 
 from odoo import api, fields, models
 
@@ -30,7 +29,23 @@ class SaleOrderLine(models.Model):
         """
         Calcula el precio unitario, aplicando fórmulas y ajustes específicos
         para atributos configurables.
+
+        Las líneas con la misma configuración (producto, valores
+        personalizados, valores sin variante y precio de partida) se calculan
+        una sola vez y comparten el resultado.
         """
+        PriceAttributeValue = self.env["product.template.attribute.value"]
+        # 🔹 Precarga en bloque de todo lo que se lee después por línea
+        lines = self.filtered("product_id")
+        lines.product_id.mapped("lst_price")
+        lines.product_id.mapped("product_tmpl_id")
+        custom_attributes = lines.product_custom_attribute_value_ids
+        custom_attributes.mapped("custom_value")
+        custom_attributes.mapped("custom_product_template_attribute_value_id")
+        # Un plan de precios por plantilla para todo el lote.
+        plans = lines.product_id.product_tmpl_id._get_pricing_plans()
+
+        prices = {}
         for line in self:
             if not line.product_id:
                 _logger.warning(
@@ -38,112 +53,43 @@ class SaleOrderLine(models.Model):
                 )
                 continue
 
-            # Precio inicial basado en el precio del producto
-            price_so_far = line.product_id.lst_price
-            _logger.debug(f"[Line {line.id}] Precio inicial: {price_so_far}")
-
-            # Procesar atributos de tipo "medida" (custom_value)
-            for custom_attribute in line.product_custom_attribute_value_ids:
-                attribute_value = (
-                    custom_attribute.custom_product_template_attribute_value_id
+            custom_values = [
+                (
+                    custom_attribute.custom_product_template_attribute_value_id,
+                    custom_attribute.custom_value,
                 )
-
-                if (
-                    attribute_value
-                    and attribute_value.price_formula
-                    and "custom_value" in attribute_value.price_formula
-                ):
-                    try:
-                        custom_value = float(custom_attribute.custom_value or 0)
-                        # Evaluar la formula de manera segura:
-                        increment = eval(
-                            attribute_value.price_formula,
-                            {
-                                "__builtins__": None
-                            },  # Evitar el uso de funciones incorporadas peligrosas
-                            {
-                                "custom_value": custom_value,
-                                "price_so_far": price_so_far,
-                                "math": math,
-                            },
-                        )
-
-                        if increment < 0:
-                            increment = 0
-                        price_so_far += increment
-                        _logger.debug(
-                            "[Line %s] Incremento por custom_value (%s): %s",
-                            line.id,
-                            attribute_value.name,
-                            increment,
-                        )
-                    except Exception as e:
-                        _logger.exception(
-                            "[Line %s] Error al evaluar la fórmula para %s: %s",
-                            line.id,
-                            attribute_value.name,
-                            e,
-                        )
-                        continue
-
-            # Procesar atributos de tipo "price_so_far"
-            for no_variant_attribute in line.product_no_variant_attribute_value_ids:
-                if (
-                    no_variant_attribute
-                    and no_variant_attribute.price_formula
-                    and "price_so_far" in no_variant_attribute.price_formula
-                ):
-                    try:
-                        increment = eval(
-                            no_variant_attribute.price_formula,
-                            {"__builtins__": None},
-                            {"price_so_far": price_so_far, "math": math},
-                        )
-                        if increment < 0:
-                            increment = 0
-                        price_so_far += increment
-                        _logger.debug(
-                            "[Line %s] Incremento por price_so_far (%s): %s",
-                            line.id,
-                            no_variant_attribute.name,
-                            increment,
-                        )
-                    except Exception as e:
-                        _logger.exception(
-                            "[Line %s] Error al evaluar la fórmula para %s: %s",
-                            line.id,
-                            no_variant_attribute.name,
-                            e,
-                        )
-                        continue
-
-            # Aplicar price_extra después de procesar las fórmulas
-            for custom_attribute in line.product_custom_attribute_value_ids:
-                attribute_value = (
-                    custom_attribute.custom_product_template_attribute_value_id
+                for custom_attribute in line.product_custom_attribute_value_ids
+            ]
+            no_variant_values = line.product_no_variant_attribute_value_ids
+            # El plan de precios fija el orden de los pasos, así que el orden
+            # de los valores en la línea no cambia el resultado.
+            key = (
+                line.product_id.id,
+                frozenset(
+                    (value.id, custom_value) for value, custom_value in custom_values
+                ),
+                frozenset(no_variant_values.ids),
+                line.product_id.lst_price,
+            )
+            if key not in prices:
+                _logger.debug(
+                    f"[Line {line.id}] Precio inicial: {line.product_id.lst_price}"
                 )
-                if attribute_value and attribute_value.price_extra:
-                    price_so_far += attribute_value.price_extra
-                    _logger.debug(
-                        "[Line %s] Incremento por price_extra (%s): %s",
-                        line.id,
-                        attribute_value.name,
-                        attribute_value.price_extra,
-                    )
-
-            for no_variant_attribute in line.product_no_variant_attribute_value_ids:
-                if no_variant_attribute and no_variant_attribute.price_extra:
-                    price_so_far += no_variant_attribute.price_extra
-                    _logger.debug(
-                        "[Line %s] Incremento por price_extra (%s): %s",
-                        line.id,
-                        no_variant_attribute.name,
-                        no_variant_attribute.price_extra,
-                    )
+                prices[key] = PriceAttributeValue._get_configured_price(
+                    line.product_id.product_tmpl_id,
+                    line.product_id.lst_price,
+                    custom_values,
+                    no_variant_values,
+                    label=f"[Line {line.id}]",
+                    plan=plans[line.product_id.product_tmpl_id.id],
+                )
+            line.price_unit = prices[key]
+            _logger.debug(f"[Line {line.id}] Precio final calculado: {line.price_unit}")
 
-            # Asignar precio final al campo price_unit
-            line.price_unit = price_so_far
-            _logger.info(f"[Line {line.id}] Precio final calculado: {line.price_unit}")
+        _logger.info(
+            f"Precio calculado para {len(lines)} líneas "
+            f"({len(prices)} configuraciones distintas)"
+        )
 
     @api.depends("price_unit")
     def _compute_price_modified(self):
@@ -0,0 +1,277 @@
+import math
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.tests import TransactionCase
+
+
+def baseline_price(line):
+    """
+    Precio de una línea con el cálculo original (cuatro bucles y detección de
+    variables por texto), como referencia para el plan de precios.
+    """
+    price_so_far = line.product_id.lst_price
+    custom_values = [
+        (custom.custom_product_template_attribute_value_id, custom.custom_value)
+        for custom in line.product_custom_attribute_value_ids
+    ]
+    no_variant_values = line.product_no_variant_attribute_value_ids
+
+    def increment(formula, variables):
+        try:
+            result = eval(formula, {"__builtins__": None}, {**variables, "math": math})
+        except Exception:
+            return 0
+        return max(result, 0)
+
+    for value, custom_value in custom_values:
+        if value.price_formula and "custom_value" in value.price_formula:
+            price_so_far += increment(
+                value.price_formula,
+                {
+                    "custom_value": float(custom_value or 0),
+                    "price_so_far": price_so_far,
+                },
+            )
+    for value in no_variant_values:
+        if value.price_formula and "price_so_far" in value.price_formula:
+            price_so_far += increment(
+                value.price_formula, {"price_so_far": price_so_far}
+            )
+    for value, _custom_value in custom_values:
+        price_so_far += value.price_extra
+    for value in no_variant_values:
+        price_so_far += value.price_extra
+    return price_so_far
+
+
+class TestPricingPlan(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Attribute = cls.env["product.attribute"]
+        cls.width_attribute = Attribute.create(
+            {
+                "name": "Ancho",
+                "create_variant": "no_variant",
+                "value_ids": [Command.create({"name": "mmAncho", "is_custom": True})],
+            }
+        )
+        cls.height_attribute = Attribute.create(
+            {
+                "name": "Alto",
+                "create_variant": "no_variant",
+                "value_ids": [Command.create({"name": "mmAlto", "is_custom": True})],
+            }
+        )
+        cls.finish_attribute = Attribute.create(
+            {
+                "name": "Acabado",
+                "create_variant": "no_variant",
+                "value_ids": [
+                    Command.create({"name": "Lacado"}),
+                    Command.create({"name": "Anodizado"}),
+                    Command.create({"name": "Bruto"}),
+                ],
+            }
+        )
+        cls.template = cls.env["product.template"].create(
+            {
+                "name": "Mampara",
+                "list_price": 100.0,
+                "attribute_line_ids": [
+                    Command.create(
+                        {
+                            "attribute_id": attribute.id,
+                            "value_ids": [Command.set(attribute.value_ids.ids)],
+                        }
+                    )
+                    for attribute in (
+                        cls.width_attribute,
+                        cls.height_attribute,
+                        cls.finish_attribute,
+                    )
+                ],
+            }
+        )
+        cls.product = cls.template.product_variant_id
+        values = cls.template.attribute_line_ids.product_template_value_ids
+        by_name = {value.name: value for value in values}
+        cls.width = by_name["mmAncho"]
+        cls.height = by_name["mmAlto"]
+        cls.lacquered = by_name["Lacado"]
+        cls.anodized = by_name["Anodizado"]
+        cls.raw = by_name["Bruto"]
+
+        # Fórmula sobre custom_value, con incremento fijo.
+        cls.width.write(
+            {"price_formula": "math.ceil(custom_value / 50) * 4", "price_extra": 10}
+        )
+        # Fórmula que usa las dos variables.
+        cls.height.price_formula = "custom_value * 0.01 + price_so_far * 0.1"
+        # Fórmula sobre price_so_far, con incremento fijo.
+        cls.lacquered.write({"price_formula": "price_so_far * 0.2", "price_extra": 5})
+        # Incremento negativo, que se recorta a 0.
+        cls.anodized.price_formula = "price_so_far * -1"
+        cls.partner = cls.env["res.partner"].create({"name": "Cliente"})
+
+    def _line_vals(self, width, height, no_variant_values):
+        return {
+            "product_id": self.product.id,
+            "product_uom_qty": 1,
+            "product_custom_attribute_value_ids": [
+                Command.create(
+                    {
+                        "custom_product_template_attribute_value_id": self.width.id,
+                        "custom_value": width,
+                    }
+                ),
+                Command.create(
+                    {
+                        "custom_product_template_attribute_value_id": self.height.id,
+                        "custom_value": height,
+                    }
+                ),
+            ],
+            "product_no_variant_attribute_value_ids": [
+                Command.set((self.width | self.height | no_variant_values).ids)
+            ],
+        }
+
+    def _create_order(self, *line_vals):
+        return self.env["sale.order"].create(
+            {
+                "partner_id": self.partner.id,
+                "order_line": [Command.create(vals) for vals in line_vals],
+            }
+        )
+
+    def _set_invalid_formula(self, value, formula):
+        """Guarda una fórmula inválida saltándose la restricción."""
+        value.flush_recordset()
+        self.env.cr.execute(
+            "UPDATE product_template_attribute_value SET price_formula = %s "
+            "WHERE id = %s",
+            (formula, value.id),
+        )
+        value.invalidate_recordset(["price_formula"])
+
+    def test_plan_matches_baseline(self):
+        self._set_invalid_formula(self.raw, "price_so_far *")
+        order = self._create_order(
+            self._line_vals("1210", "2000", self.lacquered),
+            self._line_vals("980", "1500", self.anodized),
+            self._line_vals("0", "", self.raw),
+            self._line_vals("1210", "2000", self.lacquered | self.anodized),
+        )
+        for line in order.order_line:
+            self.assertAlmostEqual(line.price_unit, baseline_price(line), places=2)
+
+    def test_plan_steps(self):
+        self._set_invalid_formula(self.raw, "price_so_far *")
+        plan = self.template._get_pricing_plan()
+        steps = [(kind, value_id) for kind, value_id, _name, _code, _extra in plan]
+        self.assertEqual(
+            steps,
+            [
+                ("custom_formula", self.width.id),
+                ("custom_formula", self.height.id),
+                ("running_formula", self.lacquered.id),
+                ("running_formula", self.anodized.id),
+                ("custom_extra", self.width.id),
+                ("custom_extra", self.lacquered.id),
+                ("extra", self.width.id),
+                ("extra", self.lacquered.id),
+            ],
+            "La fórmula inválida se omite y la que usa las dos variables se "
+            "aplica sobre el valor personalizado",
+        )
+        self.assertIs(self.template._get_pricing_plan(), plan)
+
+    def test_formula_steps(self):
+        order = self._create_order(self._line_vals("1210", "2000", self.lacquered))
+        # 100 + 100 (ancho) + 40 (alto) + 48 (lacado) + 10 + 10 + 5 (extras)
+        self.assertAlmostEqual(order.order_line.price_unit, 313.0, places=2)
+
+    def test_negative_increment_is_clamped(self):
+        order = self._create_order(self._line_vals("0", "0", self.anodized))
+        # 100 + 0 (ancho) + 10 (alto) + 0 (anodizado) + 10 + 10 (extras)
+        self.assertAlmostEqual(order.order_line.price_unit, 130.0, places=2)
+
+    def test_plan_follows_changes_without_clearing_caches(self):
+        order = self._create_order(self._line_vals("1210", "2000", self.lacquered))
+        line = order.order_line
+        before = line.price_unit
+        with patch.object(type(self.env.registry), "clear_cache") as clear_cache:
+            self.lacquered.price_extra = 25
+            line._compute_price_unit()
+            self.assertAlmostEqual(line.price_unit, before + 20, places=2)
+            self.lacquered.price_formula = False
+            line._compute_price_unit()
+            self.assertAlmostEqual(line.price_unit, before + 20 - 48, places=2)
+        clear_cache.assert_not_called()
+
+    def test_identical_lines_are_priced_once(self):
+        order = self._create_order(
+            self._line_vals("1210", "2000", self.lacquered),
+            self._line_vals("1210", "2000", self.lacquered),
+            self._line_vals("980", "2000", self.lacquered),
+        )
+        PriceValue = type(self.env["product.template.attribute.value"])
+        with patch.object(
+            PriceValue,
+            "_get_configured_price",
+            autospec=True,
+            side_effect=PriceValue._get_configured_price,
+        ) as get_price:
+            order.order_line._compute_price_unit()
+        self.assertEqual(get_price.call_count, 2)
+        first, second, third = order.order_line
+        self.assertEqual(first.price_unit, second.price_unit)
+        self.assertNotEqual(first.price_unit, third.price_unit)
+        for line in order.order_line:
+            self.assertAlmostEqual(line.price_unit, baseline_price(line), places=2)
+
+    def test_plan_is_resolved_once_per_batch(self):
+        order = self._create_order(
+            self._line_vals("1210", "2000", self.lacquered),
+            self._line_vals("980", "1500", self.anodized),
+            self._line_vals("0", "", self.raw),
+        )
+        Template = type(self.template)
+        with patch.object(
+            Template,
+            "_get_pricing_plan_signatures",
+            autospec=True,
+            side_effect=Template._get_pricing_plan_signatures,
+        ) as get_signatures:
+            order.order_line._compute_price_unit()
+        self.assertEqual(get_signatures.call_count, 1)
+        for line in order.order_line:
+            self.assertAlmostEqual(line.price_unit, baseline_price(line), places=2)
+
+    def test_quote_matches_price_unit(self):
+        order = self._create_order(
+            self._line_vals("1210", "2000", self.lacquered),
+            self._line_vals("980", "1500", self.anodized),
+        )
+        quotes = self.env["product.product"].quote_configured_prices(
+            [
+                (
+                    line.product_id.id,
+                    {
+                        custom.custom_product_template_attribute_value_id.id: (
+                            custom.custom_value
+                        )
+                        for custom in line.product_custom_attribute_value_ids
+                    },
+                    line.product_no_variant_attribute_value_ids.ids,
+                )
+                for line in order.order_line
+            ]
+            + [(0, {}, [])]
+        )
+        self.assertEqual(len(quotes), 3)
+        for line, quote in zip(order.order_line, quotes):
+            self.assertAlmostEqual(quote, line.price_unit, places=2)
+        self.assertIsNone(quotes[2], "Un producto inexistente no tiene precio")